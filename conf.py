@@ -306,13 +306,19 @@ from dockertest.documentation import PretestDoc
 from dockertest.documentation import IntratestDoc
 from dockertest.documentation import PosttestDoc
 open('defaults.rst', 'w+').write(str(DefaultDoc('config_defaults/defaults.ini')))
-open('subtests.rst', 'w+').write(str(SubtestDocs()))
+# Only re-render tests whose sources changed, remaining ones in parallel
+# ('make clean' removes the cache along with everything else built).
+doc_cache_dir = os.path.join('docs_build', 'doccache')
+open('subtests.rst', 'w+').write(str(SubtestDocs(cache_dir=doc_cache_dir,
+                                                 processes=None)))
 additional = open('additional.rst', 'w+')
 # Only include contents block once for all three types
 include_contents = True
 for cls in (PretestDoc, IntratestDoc, PosttestDoc):
     additional.write(str(SubtestDocs(subtestdocclass=cls,
-                                     contents=include_contents)))
+                                     contents=include_contents,
+                                     cache_dir=doc_cache_dir,
+                                     processes=None)))
     additional.write('\n\n')
     if include_contents:
         include_contents = False
@@ -0,0 +1,291 @@
+"""
+Copy many files out of a container, verifying each while copying
+
+Two modes are supported, ``cli`` runs one ``docker cp`` per file (spread
+over ``workers`` parallel processes), for exercising ``docker cp`` itself.
+The ``archive`` mode streams the container filesystem once as a tar
+archive, extracting only the wanted files.  Either way, files land under
+the destination directory at their container path, and every file's size
+and md5 are recorded (and compared against expected values, if given).
+Every docker command's output is checked with ``OutputNotBad``.
+"""
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import collections
+import hashlib
+import os
+import os.path
+import shutil
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .dockercmd import DockerCmd, StreamDockerCmd
+from .output import OutputNotBad
+from .xceptions import DockerValueError
+
+
+class CopyResult(collections.namedtuple('CopyResult',
+                                        ['container_path', 'host_path',
+                                         'size', 'md5', 'error'])):
+
+    """
+    Outcome of copying one file, ``error`` is None on success
+
+    :param container_path: Absolute path of file inside container
+    :param host_path: Absolute path to copied file on host
+    :param size: Number of bytes copied, or None if unknown
+    :param md5: Hex digest of copied content, or None if unknown
+    :param error: String describing problem, or None
+    """
+
+    def __bool__(self):
+        return self.error is None
+
+
+def md5_file(path, chunk_size=65536):
+    """
+    Return tuple of size and hex md5 digest of file at path
+    """
+    md5 = hashlib.md5()
+    size = 0
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b''):
+            md5.update(chunk)
+            size += len(chunk)
+    return size, md5.hexdigest()
+
+
+class BulkCopy(object):
+
+    """
+    Copy files from container into destdir, recording result of each
+
+    :param subtest: A subtest.SubBase or subclass instance
+    :param container: Name or ID of container to copy from
+    :param destdir: Host directory to copy files under
+    :param mode: ``cli`` (``docker cp`` per file) or ``archive``
+    :param workers: Number of ``docker cp`` processes to run in parallel
+    :param expected: Optional mapping of container path to (size, md5)
+    :raise DockerValueError: On unknown mode or workers < 1
+    """
+
+    #: Supported copy modes
+    modes = ('cli', 'archive')
+
+    #: Bytes read at a time while extracting and hashing
+    chunk_size = 65536
+
+    def __init__(self, subtest, container, destdir, mode='cli', workers=1,
+                 expected=None):
+        if mode not in self.modes:
+            raise DockerValueError("Unknown copy mode %s, expected one of %s"
+                                   % (mode, self.modes))
+        if int(workers) < 1:
+            raise DockerValueError("Number of workers must be at least 1")
+        self.subtest = subtest
+        self.container = container
+        self.destdir = destdir
+        self.mode = mode
+        self.workers = int(workers)
+        if expected is None:
+            expected = {}
+        self.expected = expected
+        #: Mapping of container path to ``CopyResult``, filled by ``copy()``
+        self.results = collections.OrderedDict()
+        #: Private, hard-linked paths to copy individually after extraction
+        self._linked = []
+        #: Private, exception which ended archive extraction, or None
+        self._extract_error = None
+
+    def host_path(self, container_path):
+        """
+        Return host path where container_path is copied to
+        """
+        return os.path.join(self.destdir, container_path.lstrip('/'))
+
+    def verify(self, container_path, size, md5):
+        """
+        Return ``CopyResult`` for copied file, checking against expected
+        """
+        error = None
+        if container_path in self.expected:
+            exp_size, exp_md5 = self.expected[container_path]
+            if exp_size is not None and size != exp_size:
+                error = "size %d, expected %d" % (size, exp_size)
+            elif exp_md5 is not None and md5 != exp_md5:
+                error = "md5 %s, expected %s" % (md5, exp_md5)
+        return CopyResult(container_path, self.host_path(container_path),
+                          size, md5, error)
+
+    def copy(self, paths):
+        """
+        Copy all paths, return mapping of each to it's ``CopyResult``
+
+        :param paths: Iterable of absolute file paths inside container
+        """
+        paths = list(paths)
+        self.results = collections.OrderedDict((path, None)
+                                               for path in paths)
+        if self.mode == 'archive':
+            self.copy_archive(paths)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for result in executor.map(self.copy_cli, paths):
+                    self.results[result.container_path] = result
+        return self.results
+
+    @property
+    def failures(self):
+        """
+        List of ``CopyResult`` for each file not copied successfully
+        """
+        return [result for result in list(self.results.values())
+                if result is not None and not result]
+
+    def copy_cli(self, container_path):
+        """
+        Copy one file with ``docker cp``, return it's ``CopyResult``
+        """
+        host_path = self.host_path(container_path)
+        host_dir = os.path.dirname(host_path)
+        os.makedirs(host_dir, exist_ok=True)
+        dkrcmd = DockerCmd(self.subtest, 'cp',
+                           ["%s:%s" % (self.container, container_path),
+                            host_dir])
+        dkrcmd.quiet = True
+        cmdresult = dkrcmd.execute()
+        notbad = OutputNotBad(cmdresult, ignore_error=True)
+        if not notbad:
+            return CopyResult(container_path, host_path, None, None,
+                              "docker cp output bad: %s" % notbad)
+        if cmdresult.exit_status != 0:
+            return CopyResult(container_path, host_path, None, None,
+                              "docker cp exit %d: %s"
+                              % (cmdresult.exit_status,
+                                 cmdresult.stderr.strip()))
+        if not os.path.isfile(host_path):
+            return CopyResult(container_path, host_path, None, None,
+                              "Not a file: '%s'" % host_path)
+        return self.verify(container_path, *md5_file(host_path,
+                                                     self.chunk_size))
+
+    def copy_archive(self, paths):
+        """
+        Stream container filesystem once, extracting only paths
+        """
+        readfd, writefd = os.pipe()
+        reader = os.fdopen(readfd, 'rb')
+        wanted = set(paths)
+        self._linked = []
+        self._extract_error = None
+        extractor = threading.Thread(target=self.extract,
+                                     args=(reader, wanted))
+        extractor.start()
+        writer = os.fdopen(writefd, 'wb')
+        dkrcmd = StreamDockerCmd(self.subtest, 'export', [self.container],
+                                 sink=writer, preview_size=0)
+        dkrcmd.quiet = True
+        try:
+            cmdresult = dkrcmd.execute()
+        finally:
+            writer.close()
+            extractor.join()
+            reader.close()
+        notbad = OutputNotBad(cmdresult, ignore_error=True,
+                              scanners=dkrcmd.scanners)
+        # Link targets not extracted, content only available individually
+        for path in self._linked:
+            if self.results[path] is None:
+                self.results[path] = self.copy_cli(path)
+        for path in paths:
+            if self.results[path] is not None:
+                continue
+            if not notbad:
+                error = "docker export output bad: %s" % notbad
+            elif cmdresult.exit_status != 0:
+                error = ("docker export exit %d: %s"
+                         % (cmdresult.exit_status, cmdresult.stderr.strip()))
+            elif self._extract_error is not None:
+                error = "Extracting container archive: %s" % (
+                    self._extract_error)
+            else:
+                error = "Not found in container archive"
+            self.results[path] = CopyResult(path, self.host_path(path),
+                                            None, None, error)
+
+    @staticmethod
+    def member_path(name):
+        """
+        Return absolute container path of archive member name
+        """
+        if name.startswith('./'):
+            name = name[2:]
+        return '/' + name.lstrip('/')
+
+    def extract(self, fileobj, wanted):
+        """
+        Extract and verify wanted regular files from tar stream in fileobj
+        """
+        try:
+            with tarfile.open(fileobj=fileobj, mode='r|') as archive:
+                for member in archive:
+                    path = self.member_path(member.name)
+                    if path not in wanted:
+                        continue
+                    if member.islnk():
+                        self.results[path] = self.extract_link(member, path)
+                    elif not member.isfile():
+                        self.results[path] = CopyResult(
+                            path, self.host_path(path), None, None,
+                            "Not a regular file in container")
+                    else:
+                        self.results[path] = self.extract_member(archive,
+                                                                 member,
+                                                                 path)
+        # Runs in separate thread, any problem is reported by copy_archive()
+        # pylint: disable=W0703
+        except Exception as xcept:
+            self.subtest.logwarning("Reading container archive: %s", xcept)
+            self._extract_error = xcept
+        finally:
+            # Never block the writer, consume anything after end of archive
+            for _ in iter(lambda: fileobj.read(self.chunk_size), b''):
+                pass
+
+    def extract_link(self, member, path):
+        """
+        Return ``CopyResult`` of hard-link member, None to copy it later
+
+        Content of hard-links in a tar stream is only in the member linked
+        to, which was only kept if it was wanted too.
+        """
+        target = self.results.get(self.member_path(member.linkname))
+        if not target:  # Not wanted, or not copied successfully
+            self._linked.append(path)
+            return None
+        host_path = self.host_path(path)
+        os.makedirs(os.path.dirname(host_path), exist_ok=True)
+        shutil.copyfile(target.host_path, host_path)
+        return self.verify(path, target.size, target.md5)
+
+    def extract_member(self, archive, member, path):
+        """
+        Write content of member to host, return it's ``CopyResult``
+        """
+        host_path = self.host_path(path)
+        os.makedirs(os.path.dirname(host_path), exist_ok=True)
+        md5 = hashlib.md5()
+        size = 0
+        infile = archive.extractfile(member)
+        with open(host_path, 'wb') as outfile:
+            for chunk in iter(lambda: infile.read(self.chunk_size), b''):
+                outfile.write(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+        if size != member.size:
+            return CopyResult(path, host_path, size, md5.hexdigest(),
+                              "Copied %d bytes, archive says %d"
+                              % (size, member.size))
+        return self.verify(path, size, md5.hexdigest())
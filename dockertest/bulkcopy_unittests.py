@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import unittest
+
+
+# DO NOT allow this function to get loose in the wild!
+def mock(mod_path):
+    """
+    Recursivly inject tree of mocked modules from entire mod_path
+    """
+    name_list = mod_path.split('.')
+    child_name = name_list.pop()
+    child_mod = sys.modules.get(mod_path, types.ModuleType(child_name))
+    if len(name_list) == 0:  # child_name is left-most basic module
+        if child_name not in sys.modules:
+            sys.modules[child_name] = child_mod
+        return sys.modules[child_name]
+    else:
+        # New or existing child becomes parent
+        recurse_path = ".".join(name_list)
+        parent_mod = mock(recurse_path)
+        if not hasattr(sys.modules[recurse_path], child_name):
+            setattr(parent_mod, child_name, child_mod)
+            # full-name also points at child module
+            sys.modules[mod_path] = child_mod
+        return sys.modules[mod_path]
+
+
+# Just pack whatever args received into attributes
+class FakeCmdResult(object):
+
+    def __init__(self, **dargs):
+        for key, val in list(dargs.items()):
+            setattr(self, key, val)
+
+
+# Actually run the command, it's only ever the fake docker script
+def run(command, *_args, **_dargs):
+    start = time.time()
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    return FakeCmdResult(command=command, stdout=stdout, stderr=stderr,
+                         exit_status=proc.returncode,
+                         duration=time.time() - start)
+
+setattr(mock('autotest.client.utils'), 'run', run)
+setattr(mock('autotest.client.utils'), 'CmdResult', FakeCmdResult)
+setattr(mock('autotest.client.shared.error'), 'CmdError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestFail', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestNAError', Exception)
+setattr(mock('autotest.client.shared.error'), 'AutotestError', Exception)
+
+#: Handles only 'cp' and 'export' subcommands, $ROOT is container filesystem
+FAKE_DOCKER = r'''
+case "$1" in
+    cp) case "$2" in *panicky) echo "panic: runtime error" >&2 ;; esac
+        cp "$ROOT${2#*:}" "$3" ;;
+    export) tar -C "$ROOT" --sort=name -cf - . ;;
+esac
+'''
+
+
+class BulkCopyTest(unittest.TestCase):
+
+    files = {'/etc/hosts': b'127.0.0.1 localhost\n',
+             '/usr/bin/.hidden': b'\0' * 200000,
+             '/usr/lib/foo/hosts': b'not the same hosts'}
+
+    def setUp(self):
+        from dockertest import subtestbase
+        from dockertest import bulkcopy
+        self.bulkcopy = bulkcopy
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        root = os.path.join(self.tmpdir, 'root')
+        for path, content in list(self.files.items()):
+            os.makedirs(os.path.dirname(root + path), exist_ok=True)
+            with open(root + path, 'wb') as outfile:
+                outfile.write(content)
+        os.symlink('hosts', os.path.join(root, 'etc/link'))
+        # Hard-links to a wanted and to an unwanted file, archived after
+        # the file (first name) they link to.
+        os.link(os.path.join(root, 'etc/hosts'),
+                os.path.join(root, 'etc/hostslink'))
+        with open(os.path.join(root, 'etc/data'), 'wb') as outfile:
+            outfile.write(b'unwanted')
+        os.link(os.path.join(root, 'etc/data'),
+                os.path.join(root, 'etc/panicky'))
+        script = os.path.join(self.tmpdir, 'docker.sh')
+        with open(script, 'w') as outfile:
+            outfile.write(FAKE_DOCKER)
+        self.destdir = os.path.join(self.tmpdir, 'dest')
+
+        class FakeSubtest(subtestbase.SubBase):
+            config = {'docker_path': 'ROOT=%s /bin/sh %s' % (root, script),
+                      'docker_options': '',
+                      'docker_timeout': 60.0}
+            logdebug = loginfo = logwarning = lambda *_a, **_d: None
+
+        self.fake_subtest = FakeSubtest()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def bulk_copy(self, mode, workers=1, expected=None):
+        bulk = self.bulkcopy.BulkCopy(self.fake_subtest, 'foo',
+                                      self.destdir, mode, workers, expected)
+        return bulk, bulk.copy(sorted(self.files) + ['/etc/link',
+                                                     '/nonexisting'])
+
+    def check_results(self, bulk, results):
+        self.assertEqual(len(results), 5)
+        for path, content in list(self.files.items()):
+            result = results[path]
+            self.assertTrue(result, result.error)
+            self.assertEqual(result.size, len(content))
+            self.assertEqual(result.md5, hashlib.md5(content).hexdigest())
+            with open(result.host_path, 'rb') as infile:
+                self.assertEqual(infile.read(), content)
+        self.assertFalse(results['/nonexisting'])
+        failed = sorted(result.container_path for result in bulk.failures)
+        self.assertTrue('/nonexisting' in failed)
+
+    def test_cli(self):
+        self.check_results(*self.bulk_copy('cli'))
+
+    def test_cli_parallel(self):
+        self.check_results(*self.bulk_copy('cli', 4))
+
+    def test_archive(self):
+        bulk, results = self.bulk_copy('archive')
+        self.check_results(bulk, results)
+        self.assertEqual(results['/etc/link'].error,
+                         "Not a regular file in container")
+
+    def test_archive_hardlinks(self):
+        expected = {'/etc/hostslink': (20, None)}
+        bulk = self.bulkcopy.BulkCopy(self.fake_subtest, 'foo',
+                                      self.destdir, 'archive',
+                                      expected=expected)
+        results = bulk.copy(['/etc/hosts', '/etc/hostslink',
+                             '/etc/panicky'])
+        self.assertTrue(results['/etc/hostslink'],
+                        results['/etc/hostslink'].error)
+        self.assertEqual(results['/etc/hostslink'].md5,
+                         results['/etc/hosts'].md5)
+        # Target not wanted, copied individually with bad output detected
+        self.assertTrue(results['/etc/panicky'].error
+                        .startswith('docker cp output bad'))
+
+    def test_archive_extract_error(self):
+        bulk = self.bulkcopy.BulkCopy(self.fake_subtest, 'foo',
+                                      self.destdir, 'archive')
+
+        def broken(*_args):
+            raise OSError(28, 'No space left on device')
+        bulk.extract_member = broken
+        results = bulk.copy(['/usr/bin/.hidden'])
+        self.assertTrue('No space left'
+                        in results['/usr/bin/.hidden'].error)
+
+    def test_expected(self):
+        expected = {'/etc/hosts': (3, None),
+                    '/usr/bin/.hidden': (None, 'bad'),
+                    '/usr/lib/foo/hosts': (18, None)}
+        for mode in self.bulkcopy.BulkCopy.modes:
+            _, results = self.bulk_copy(mode, 2, expected)
+            self.assertEqual(results['/etc/hosts'].error,
+                             'size 20, expected 3')
+            self.assertTrue(results['/usr/bin/.hidden'].error
+                            .startswith('md5 '))
+            self.assertTrue(results['/usr/lib/foo/hosts'])
+
+    def test_bad_args(self):
+        from dockertest.xceptions import DockerValueError
+        self.assertRaises(DockerValueError, self.bulkcopy.BulkCopy,
+                          self.fake_subtest, 'foo', self.destdir, 'bogus')
+        self.assertRaises(DockerValueError, self.bulkcopy.BulkCopy,
+                          self.fake_subtest, 'foo', self.destdir, 'cli', 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
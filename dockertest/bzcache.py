@@ -0,0 +1,136 @@
+"""
+Disk cache of the Bugzilla exclusion filter's subthing to bug mapping
+
+Querying Bugzilla at every job start blocks the run on a remote service.
+Instead, the mapping of subthing names to blocking bug numbers is kept
+in a JSON file, keyed by everything which affects the query.  Fresh
+entries are used as-is.  Otherwise a single query is started in a
+background thread: a stale entry is used right away (the refreshed one
+serves the next job), without one the query is waited for, up to a
+timeout.
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+def cache_key(*settings):
+    """
+    Return hex digest identifying a query by all it's (JSON-able) settings
+    """
+    text = json.dumps(settings, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class BugCache(object):
+
+    """
+    Subthing to bug number mappings, with the time each was queried
+
+    :param path: Path to JSON cache file, created on ``put()``
+    :param ttl: Seconds a mapping stays fresh
+    """
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as cache_file:
+                return json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        """
+        Return tuple of mapping (None if absent) and it's age in seconds
+        """
+        with self._lock:
+            entry = self._read().get(key)
+        if entry is None:
+            return None, None
+        return entry['subthings'], time.time() - entry['time']
+
+    def fresh(self, age):
+        """
+        Return True if a mapping age seconds old needs no refresh
+        """
+        return age is not None and 0 <= age < self.ttl
+
+    def put(self, key, subthings):
+        """
+        Atomically store mapping of subthing names to bug numbers for key
+        """
+        with self._lock:
+            content = self._read()
+            content[key] = {'time': time.time(), 'subthings': subthings}
+            tmp_path = '%s.%d' % (self.path, os.getpid())
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(content, cache_file, indent=1, sort_keys=True)
+            os.rename(tmp_path, self.path)
+
+
+class Refresher(threading.Thread):
+
+    """
+    Run query in background, storing it's result into cache
+
+    :param cache: ``BugCache`` instance
+    :param key: Cache key of query
+    :param query: Callable returning mapping, or None on failure
+    """
+
+    def __init__(self, cache, key, query):
+        super(Refresher, self).__init__(name='bzcache-refresh')
+        self.daemon = True  # Never hold up end of job
+        self.cache = cache
+        self.key = key
+        self.query = query
+        #: Mapping returned by query, None until (successfully) done
+        self.result = None
+
+    def run(self):
+        result = self.query()
+        if result is None:
+            return
+        # Usable by waiting caller even if it can't be cached
+        self.result = result
+        try:
+            self.cache.put(self.key, result)
+        except (IOError, OSError) as xcept:
+            logging.warning("Could not write Bugzilla cache %s: %s",
+                            self.cache.path, xcept)
+
+
+def subthings_to_bugs(cache, key, query, timeout=10):
+    """
+    Return cached mapping for key, refreshing it with query when stale
+
+    :param cache: ``BugCache`` instance
+    :param key: Cache key of query
+    :param query: Callable returning mapping, or None on failure
+    :param timeout: Seconds to wait for query without a cached mapping
+    :return: Tuple of mapping (None if unavailable) and description of
+             where it came from
+    """
+    subthings, age = cache.get(key)
+    if cache.fresh(age):
+        return subthings, 'cache (%d seconds old)' % age
+    refresher = Refresher(cache, key, query)
+    refresher.start()
+    if subthings is not None:
+        return subthings, ('stale cache (%d seconds old), refreshing in '
+                           'background' % age)
+    refresher.join(timeout)
+    if refresher.result is None:
+        return None, 'no cache, query failed or exceeded %s seconds' % timeout
+    return refresher.result, 'query'
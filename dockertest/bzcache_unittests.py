@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+BUGS = [{'bug_id': 1, 'status': 'NEW',
+         'status_whiteboard': 'docker-autotest:docker_cli/run'},
+        {'bug_id': 2, 'status': 'CLOSED',
+         'status_whiteboard': 'docker-autotest:docker_cli/build'},
+        {'bug_id': 3, 'status': 'ASSIGNED',
+         'status_whiteboard': 'other-project:docker_cli/attach'}]
+
+
+class FakeBugzillaTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import fake_bugzilla
+        self.fake_bugzilla = fake_bugzilla
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.url = os.path.join(self.tmpdir, 'bugs.json')
+        with open(self.url, 'w') as bugs:
+            json.dump(BUGS, bugs)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_query(self):
+        bz = self.fake_bugzilla.Bugzilla(url=self.url)
+        bz.login(user='someone', password='secret')
+        query = bz.build_query(status_whiteboard='docker-autotest',
+                               status=['NEW', 'ASSIGNED'])
+        self.assertEqual([bug.bug_id for bug in bz.query(query)], [1])
+        self.assertEqual(len(bz.query({})), 3)
+        self.assertEqual(bz.queries, 2)
+
+    def test_fault(self):
+        bz = self.fake_bugzilla.Bugzilla(url=self.url + '.missing')
+        self.assertRaises(self.fake_bugzilla.Fault, bz.query, {})
+
+
+class BugCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import bzcache
+        self.bzcache = bzcache
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.cache = bzcache.BugCache(os.path.join(self.tmpdir, 'bz.json'),
+                                      ttl=60)
+        self.key = bzcache.cache_key('url', {'status': ['NEW']})
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def query(self):
+        self.calls += 1
+        return {'docker_cli/run': [1]}
+
+    @staticmethod
+    def join_refreshers():
+        for thread in threading.enumerate():
+            if thread.name == 'bzcache-refresh':
+                thread.join(5)
+
+    def age(self, seconds):
+        with open(self.cache.path) as cache_file:
+            content = json.load(cache_file)
+        content[self.key]['time'] -= seconds
+        with open(self.cache.path, 'w') as cache_file:
+            json.dump(content, cache_file)
+
+    def test_key(self):
+        self.assertEqual(self.key,
+                         self.bzcache.cache_key('url', {'status': ['NEW']}))
+        self.assertNotEqual(self.key,
+                            self.bzcache.cache_key('url', {'status': []}))
+
+    def test_miss_then_fresh(self):
+        result, _ = self.bzcache.subthings_to_bugs(self.cache, self.key,
+                                                   self.query)
+        self.assertEqual(result, {'docker_cli/run': [1]})
+        result, source = self.bzcache.subthings_to_bugs(self.cache, self.key,
+                                                        self.query)
+        self.assertEqual(result, {'docker_cli/run': [1]})
+        self.assertTrue(source.startswith('cache'))
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_refreshed_in_background(self):
+        self.cache.put(self.key, {'docker_cli/old': [9]})
+        self.age(120)
+        release = threading.Event()
+
+        def slow_query():
+            release.wait(5)
+            return self.query()
+        result, source = self.bzcache.subthings_to_bugs(self.cache, self.key,
+                                                        slow_query)
+        # Stale result returned without waiting for query
+        self.assertEqual(result, {'docker_cli/old': [9]})
+        self.assertTrue(source.startswith('stale'))
+        release.set()
+        self.join_refreshers()
+        subthings, age = self.cache.get(self.key)
+        self.assertEqual(subthings, {'docker_cli/run': [1]})
+        self.assertTrue(self.cache.fresh(age))
+
+    def test_unreachable(self):
+        result, _ = self.bzcache.subthings_to_bugs(self.cache, self.key,
+                                                   lambda: None)
+        self.assertEqual(result, None)
+        self.assertEqual(self.cache.get(self.key), (None, None))
+
+    def test_unwritable(self):
+        cache = self.bzcache.BugCache(os.path.join(self.tmpdir, 'missing',
+                                                   'bz.json'))
+        result, source = self.bzcache.subthings_to_bugs(cache, self.key,
+                                                        self.query)
+        self.assertEqual(result, {'docker_cli/run': [1]})
+        self.assertEqual(source, 'query')
+        self.assertEqual(cache.get(self.key), (None, None))
+
+    def test_timeout(self):
+        release = threading.Event()
+
+        def slow_query():
+            release.wait(5)
+            return self.query()
+        result, _ = self.bzcache.subthings_to_bugs(self.cache, self.key,
+                                                   slow_query, timeout=0.01)
+        self.assertEqual(result, None)
+        release.set()
+        # Result still cached for next time
+        self.join_refreshers()
+        self.assertEqual(self.cache.get(self.key)[0], {'docker_cli/run': [1]})
+
+
+if __name__ == '__main__':
+    unittest.main()
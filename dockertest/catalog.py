@@ -0,0 +1,291 @@
+"""
+Precomputed catalog of every test module, it's sub-subtests and config.
+
+Walking the test module trees, parsing every module's docstring and every
+``config_defaults`` ini file is only needed when something changed.  The
+results are kept in a JSON catalog file, along with the modification time
+and size of every directory and file they came from.  ``load()`` only has
+to ``stat()`` those, rebuilding the catalog when any differ.
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!
+"""
+
+import ast
+import configparser
+import json
+import os
+
+#: Name of catalog file, in base directory (the one holding control file)
+FILENAME = '.test_catalog.json'
+
+#: Default directory names of each kind of test module
+KINDS = ('pretests', 'subtests', 'intratests', 'posttests')
+
+#: Directory holding default configuration, under base directory
+CONFIG_DIR = 'config_defaults'
+
+#: Bumped whenever content format changes, older catalogs are rebuilt
+FORMAT = 1
+
+
+def module_docstring(path):
+    """
+    Return docstring of python module at path, without importing it
+    """
+    with open(path, 'rb') as module:
+        source = module.read()
+    try:
+        return ast.get_docstring(ast.parse(source, path, 'exec'))
+    except SyntaxError:
+        return None
+
+
+def summary(docstring):
+    """
+    Return first paragraph of docstring's ``Summary`` section (or at all)
+    """
+    if not docstring:
+        return ''
+    paragraphs = [paragraph.strip()
+                  for paragraph in docstring.split('\n\n')
+                  if paragraph.strip()]
+    for index, paragraph in enumerate(paragraphs[:-1]):
+        if paragraph.split('\n')[0].strip() == 'Summary':
+            paragraphs = paragraphs[index + 1:]
+            break
+    return ' '.join(paragraphs[0].split()) if paragraphs else ''
+
+
+def get_as_list(value):
+    """
+    Return list of stripped, non-empty items from CSV value
+    """
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Catalog(object):
+
+    """
+    Test modules, sub-subtests and config. sections found under base_path
+
+    :param base_path: Directory holding test module and config directories
+    :param kinds: Directory names of each kind of test module
+    """
+
+    def __init__(self, base_path, kinds=KINDS):
+        self.base_path = os.path.abspath(base_path)
+        self.kinds = list(kinds)
+        #: Mapping of kind to mapping of test name to it's details
+        self.tests = dict((kind, {}) for kind in self.kinds)
+        #: Mapping of subtest name (config section) to sub-subtest names
+        self.subsubtests = {}
+        #: Mapping of config section to ini file (relative to base_path)
+        self.sections = {}
+        #: Relative paths of ini files under ``CONFIG_DIR``
+        self.inis = []
+        #: Mapping of relative path to [mtime (ns), size] of it's source
+        self.mtimes = {}
+        self._by_dir = None
+
+    def _record(self, path):
+        stat = os.stat(path)
+        self.mtimes[os.path.relpath(path, self.base_path)] = [
+            stat.st_mtime_ns, stat.st_size]
+
+    def scan(self):
+        """
+        (Re)build entire catalog by searching base_path
+        """
+        self.__init__(self.base_path, self.kinds)
+        for kind in self.kinds:
+            kind_path = os.path.join(self.base_path, kind)
+            if not os.path.isdir(kind_path):
+                continue
+            for dirpath, dirnames, filenames in os.walk(kind_path,
+                                                        followlinks=True):
+                # Byte-code caches change all the time, never hold tests
+                dirnames[:] = sorted(dirname for dirname in dirnames
+                                     if dirname != '__pycache__')
+                self._record(dirpath)
+                if dirpath == kind_path:
+                    continue  # Skip top-level
+                # test.test class must be in module named same as directory
+                modname = os.path.basename(dirpath) + '.py'
+                if modname not in filenames:
+                    continue
+                module = os.path.join(dirpath, modname)
+                self._record(module)
+                docstring = module_docstring(module)
+                name = os.path.relpath(dirpath, kind_path)
+                self.tests[kind][name] = {
+                    'module': os.path.relpath(module, self.base_path),
+                    'kind': kind,
+                    'summary': summary(docstring),
+                    'docstring': docstring}
+        self.scan_config()
+        return self
+
+    def scan_config(self):
+        """
+        Record every config section & sub-subtest names from their ini files
+        """
+        config_path = os.path.join(self.base_path, CONFIG_DIR)
+        if not os.path.isdir(config_path):
+            return
+        for dirpath, _, filenames in os.walk(config_path, followlinks=True):
+            self._record(dirpath)
+            for filename in sorted(filenames):
+                if filename.startswith('.') or not filename.endswith('.ini'):
+                    continue
+                ini_path = os.path.join(dirpath, filename)
+                self._record(ini_path)
+                relpath = os.path.relpath(ini_path, self.base_path)
+                if filename != 'defaults.ini':
+                    self.inis.append(relpath)
+                parser = configparser.RawConfigParser(allow_no_value=True,
+                                                      strict=False)
+                try:
+                    parser.read(ini_path)
+                except configparser.Error:
+                    continue  # Problems reported when config is loaded
+                for section in parser.sections():
+                    self.sections[section] = relpath
+                    if parser.has_option(section, 'subsubtests'):
+                        value = parser.get(section, 'subsubtests') or ''
+                        self.subsubtests[section] = get_as_list(value)
+
+    def stale(self):
+        """
+        Return True if any directory or file catalog came from changed
+        """
+        if not self.mtimes:
+            return True
+        for relpath, (mtime, size) in self.mtimes.items():
+            try:
+                stat = os.stat(os.path.join(self.base_path, relpath))
+            except OSError:
+                return True
+            if stat.st_mtime_ns != mtime or stat.st_size != size:
+                return True
+        return False
+
+    def save(self, path):
+        """
+        Atomically write catalog as JSON to path
+        """
+        tmp_path = '%s.%d' % (path, os.getpid())
+        with open(tmp_path, 'w') as catalog:
+            json.dump({'format': FORMAT, 'kinds': self.kinds,
+                       'tests': self.tests, 'subsubtests': self.subsubtests,
+                       'sections': self.sections, 'inis': self.inis,
+                       'mtimes': self.mtimes}, catalog, sort_keys=True)
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def read(cls, base_path, path):
+        """
+        Return catalog read from JSON at path
+
+        :raise IOError: If path can't be read
+        :raise ValueError: If content isn't a catalog of current format
+        """
+        with open(path) as catalog_file:
+            content = json.load(catalog_file)
+        if not isinstance(content, dict) or content.get('format') != FORMAT:
+            raise ValueError("Catalog %s has wrong format" % path)
+        catalog = cls(base_path, content['kinds'])
+        for attr in ('tests', 'subsubtests', 'sections', 'inis', 'mtimes'):
+            setattr(catalog, attr, content[attr])
+        return catalog
+
+    def names(self, kind):
+        """
+        Return sorted list of test names of kind
+        """
+        return sorted(self.tests.get(kind, {}))
+
+    def module(self, kind, name):
+        """
+        Return absolute path to module of test name of kind, or None
+        """
+        details = self.tests.get(kind, {}).get(name)
+        if details is None:
+            return None
+        return os.path.join(self.base_path, details['module'])
+
+    def modules(self, kind):
+        """
+        Return tuple of absolute paths to all modules of kind, by name
+        """
+        return tuple(self.module(kind, name) for name in self.names(kind))
+
+    def name_of(self, path):
+        """
+        Return (kind, name) of test with module (or it's directory) at path
+
+        :return: Tuple, or None if path isn't a cataloged test module
+        """
+        if self._by_dir is None:
+            self._by_dir = {}
+            for kind, tests in self.tests.items():
+                for name, details in tests.items():
+                    module_dir = os.path.dirname(details['module'])
+                    self._by_dir[module_dir] = (kind, name)
+        path = os.path.abspath(path)
+        if path.endswith('.py'):
+            path = os.path.dirname(path)
+        return self._by_dir.get(os.path.relpath(path, self.base_path))
+
+    def ini(self, section):
+        """
+        Return absolute path to ini file defining config. section, or None
+        """
+        relpath = self.sections.get(section)
+        if relpath is None:
+            return None
+        return os.path.join(self.base_path, relpath)
+
+    def ini_filenames(self):
+        """
+        Return tuple of absolute paths to all ini files except defaults.ini
+        """
+        return tuple(os.path.join(self.base_path, relpath)
+                     for relpath in self.inis)
+
+
+#: Private, per-process catalogs by base path, use ``load()`` to access
+_catalogs = {}
+
+
+def load(base_path, kinds=KINDS, path=None):
+    """
+    Return up to date catalog for base_path, rebuilding it when stale
+
+    :param base_path: Directory holding test module and config directories
+    :param kinds: Directory names of each kind of test module
+    :param path: Catalog file, None for ``FILENAME`` under base_path.  It's
+                 fine if it can't be written, catalog is rebuilt next time.
+    """
+    base_path = os.path.abspath(base_path)
+    if path is None:
+        path = os.path.join(base_path, FILENAME)
+    catalog = _catalogs.get(base_path)
+    if catalog is None:
+        try:
+            catalog = Catalog.read(base_path, path)
+        except (IOError, OSError, ValueError, KeyError):
+            catalog = None
+    if (catalog is None or not set(kinds) <= set(catalog.kinds) or
+            catalog.stale()):
+        if catalog is not None:
+            # Keep any other kinds requested earlier
+            kinds = catalog.kinds + [kind for kind in kinds
+                                     if kind not in catalog.kinds]
+        catalog = Catalog(base_path, kinds).scan()
+        try:
+            catalog.save(path)
+        except (IOError, OSError):
+            pass
+    _catalogs[base_path] = catalog
+    return catalog
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import shutil
+import tempfile
+import unittest
+
+MODULE = '''r"""
+Summary
+-------
+
+Test the %s
+thing.
+
+Operational Summary
+-------------------
+
+#. Something
+"""
+'''
+
+INI = '''[docker_cli/run]
+subsubtests = run_true, run_false,
+    run_names
+
+[docker_cli/run/run_true]
+cmd = /bin/true
+'''
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import catalog
+        self.catalog = catalog
+        catalog._catalogs.clear()
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        for kind, name in (('subtests', 'docker_cli/run'),
+                           ('subtests', 'docker_cli/version'),
+                           ('intratests', 'garbage_check')):
+            self.write_module(kind, name)
+        os.makedirs(os.path.join(self.tmpdir, 'subtests', 'docker_cli',
+                                 'not_a_test'))
+        config = os.path.join(self.tmpdir, 'config_defaults', 'subtests',
+                              'docker_cli')
+        os.makedirs(config)
+        with open(os.path.join(config, 'run.ini'), 'w') as ini:
+            ini.write(INI)
+        with open(os.path.join(self.tmpdir, 'config_defaults',
+                               'defaults.ini'), 'w') as ini:
+            ini.write('[DEFAULTS]\ndocker_path = /usr/bin/docker\n')
+
+    def tearDown(self):
+        self.catalog._catalogs.clear()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write_module(self, kind, name, docstring=None):
+        module_dir = os.path.join(self.tmpdir, kind, name)
+        if not os.path.isdir(module_dir):
+            os.makedirs(module_dir)
+        basename = os.path.basename(name)
+        if docstring is None:
+            docstring = MODULE % basename
+        path = os.path.join(module_dir, basename + '.py')
+        with open(path, 'w') as module:
+            module.write(docstring)
+        return path
+
+    def test_scan(self):
+        catalog = self.catalog.load(self.tmpdir)
+        self.assertEqual(catalog.names('subtests'),
+                         ['docker_cli/run', 'docker_cli/version'])
+        self.assertEqual(catalog.names('intratests'), ['garbage_check'])
+        self.assertEqual(catalog.names('pretests'), [])
+        self.assertEqual(catalog.tests['subtests']['docker_cli/run']
+                         ['summary'], 'Test the run thing.')
+        self.assertEqual(catalog.subsubtests['docker_cli/run'],
+                         ['run_true', 'run_false', 'run_names'])
+        ini = os.path.join(self.tmpdir, 'config_defaults', 'subtests',
+                           'docker_cli', 'run.ini')
+        self.assertEqual(catalog.ini('docker_cli/run/run_true'), ini)
+        self.assertEqual(catalog.ini_filenames(), (ini,))
+
+    def test_name_of(self):
+        catalog = self.catalog.load(self.tmpdir)
+        module = catalog.module('subtests', 'docker_cli/version')
+        self.assertEqual(catalog.name_of(module),
+                         ('subtests', 'docker_cli/version'))
+        self.assertEqual(catalog.name_of(os.path.dirname(module)),
+                         ('subtests', 'docker_cli/version'))
+        self.assertEqual(catalog.name_of(self.tmpdir), None)
+
+    def test_reused_until_changed(self):
+        catalog = self.catalog.load(self.tmpdir)
+        self.assertFalse(catalog.stale())
+        # Read back from file by another process
+        self.catalog._catalogs.clear()
+        reread = self.catalog.load(self.tmpdir)
+        self.assertEqual(reread.tests, catalog.tests)
+        self.assertEqual(reread.mtimes, catalog.mtimes)
+        self.write_module('subtests', 'docker_cli/version',
+                          '"""\nChanged summary, longer than before\n"""\n')
+        self.assertTrue(reread.stale())
+        changed = self.catalog.load(self.tmpdir)
+        self.assertEqual(changed.tests['subtests']['docker_cli/version']
+                         ['summary'], 'Changed summary, longer than before')
+
+    def test_new_module(self):
+        self.catalog.load(self.tmpdir)
+        self.write_module('subtests', 'docker_cli/build')
+        catalog = self.catalog.load(self.tmpdir)
+        self.assertTrue('docker_cli/build' in catalog.names('subtests'))
+
+    def test_unwritable(self):
+        catalog = self.catalog.load(self.tmpdir,
+                                    path=os.path.join(self.tmpdir, 'no',
+                                                      'such', 'dir'))
+        self.assertEqual(len(catalog.names('subtests')), 2)
+
+    def test_other_kinds(self):
+        self.catalog.load(self.tmpdir)
+        self.write_module('checks', 'sanity')
+        catalog = self.catalog.load(self.tmpdir, ['checks'])
+        self.assertEqual(catalog.names('checks'), ['sanity'])
+        # Kinds loaded earlier are kept
+        self.assertEqual(len(catalog.names('subtests')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,266 @@
+"""
+Periodic sampling of container memory and CPU usage, directly from cgroupfs
+
+Reading cgroup files costs no docker commands, so usage can be sampled
+at a high rate while containers run, e.g. to verify CPU share ratios or
+memory limits are actually enforced under load.  Both the v1 (per-controller
+hierarchies) and v2 (unified hierarchy) layouts are supported, under either
+the ``cgroupfs`` (``docker/<id>``) or ``systemd`` (``docker-<id>.scope``)
+cgroup drivers.  Samples are kept in compact ``array`` instances.
+"""
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import array
+import os.path
+import threading
+import time
+from .xceptions import DockerIOError
+
+#: Container cgroup directory names, relative to a hierarchy, by driver
+CGROUP_DIRS = ('docker/%s', 'system.slice/docker-%s.scope')
+
+#: Limits at or above this (page-rounded LONG_MAX) mean no limit (cgroup v1)
+UNLIMITED = 0x7FFFFFFFFFFF0000
+
+
+def cgroup_version(root='/sys/fs/cgroup'):
+    """
+    Return 2 if root is a unified (v2) hierarchy mount, otherwise 1
+    """
+    if os.path.isfile(os.path.join(root, 'cgroup.controllers')):
+        return 2
+    return 1
+
+
+def read_int(path):
+    """
+    Return integer content of cgroup file, None for ``max`` (no limit)
+
+    :raise IOError: If path can't be read
+    """
+    with open(path) as cgfile:
+        value = cgfile.read().strip()
+    if value == 'max':
+        return None
+    return int(value)
+
+
+def read_usage_usec(path):
+    """
+    Return ``usage_usec`` from cgroup v2 ``cpu.stat`` file at path
+    """
+    with open(path) as cgfile:
+        for line in cgfile:
+            key, _, value = line.partition(' ')
+            if key == 'usage_usec':
+                return int(value)
+    raise IOError("No usage_usec in %s" % path)
+
+
+class CgroupPaths(object):
+
+    """
+    Locate cgroup files of one container, under v1 or v2 hierarchy
+
+    :param long_id: Long ID of running container
+    :param root: Path where cgroupfs hierarchies are mounted
+    :raise DockerIOError: If container cgroup directory isn't found
+    """
+
+    def __init__(self, long_id, root='/sys/fs/cgroup'):
+        self.long_id = long_id
+        self.root = root
+        self.version = cgroup_version(root)
+        if self.version == 2:
+            unified = self.find(root)
+            self.memory_usage = os.path.join(unified, 'memory.current')
+            self.memory_limit = os.path.join(unified, 'memory.max')
+            self.cpu_usage = os.path.join(unified, 'cpu.stat')
+        else:
+            memory = self.find(os.path.join(root, 'memory'))
+            cpuacct = self.find(os.path.join(root, 'cpuacct'))
+            self.memory_usage = os.path.join(memory, 'memory.usage_in_bytes')
+            self.memory_limit = os.path.join(memory, 'memory.limit_in_bytes')
+            self.cpu_usage = os.path.join(cpuacct, 'cpuacct.usage')
+
+    def find(self, hierarchy):
+        """
+        Return container's cgroup directory under hierarchy
+        """
+        for cgroup_dir in CGROUP_DIRS:
+            path = os.path.join(hierarchy, cgroup_dir % self.long_id)
+            if os.path.isdir(path):
+                return path
+        raise DockerIOError("Cgroup of container %s not found under %s"
+                            % (self.long_id, hierarchy))
+
+    def read(self):
+        """
+        Return tuple of memory usage, limit (None if unlimited) and cpu ns
+
+        :raise IOError: If container's cgroup has gone (container exited)
+        """
+        limit = read_int(self.memory_limit)
+        if limit is not None and limit >= UNLIMITED:
+            limit = None
+        if self.version == 2:
+            cpu_ns = read_usage_usec(self.cpu_usage) * 1000
+        else:
+            cpu_ns = read_int(self.cpu_usage)
+        return read_int(self.memory_usage), limit, cpu_ns
+
+
+class CgroupSamples(object):
+
+    """
+    Time series of one container's usage, in compact arrays
+
+    :param long_id: Long ID of container sampled
+    """
+
+    def __init__(self, long_id):
+        self.long_id = long_id
+        #: time.time() of each sample
+        self.times = array.array('d')
+        #: Memory usage bytes of each sample
+        self.memory = array.array('q')
+        #: Cumulative CPU nanoseconds of each sample
+        self.cpu_ns = array.array('q')
+        #: Last memory limit seen, None if unlimited
+        self.limit = None
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, stamp, memory, limit, cpu_ns):
+        """
+        Add one sample taken at stamp
+        """
+        self.times.append(stamp)
+        self.memory.append(memory)
+        self.cpu_ns.append(cpu_ns)
+        self.limit = limit
+
+    @property
+    def seconds(self):
+        """
+        Seconds between first and last sample
+        """
+        if len(self) < 2:
+            return 0.0
+        return self.times[-1] - self.times[0]
+
+    @property
+    def cpu_used(self):
+        """
+        CPU seconds used between first and last sample
+        """
+        if len(self) < 2:
+            return 0.0
+        return (self.cpu_ns[-1] - self.cpu_ns[0]) / 1e9
+
+    def summary(self):
+        """
+        Return dictionary of summary statistics over all samples
+        """
+        count = len(self)
+        result = dict(samples=count, seconds=self.seconds,
+                      cpu_seconds=self.cpu_used, memory_limit=self.limit,
+                      memory_max=None, memory_mean=None, cpu_rate=None)
+        if count:
+            result['memory_max'] = max(self.memory)
+            result['memory_mean'] = sum(self.memory) / float(count)
+        if result['seconds']:
+            # Average number of CPUs kept busy
+            result['cpu_rate'] = result['cpu_seconds'] / result['seconds']
+        return result
+
+
+class CgroupSampler(object):
+
+    """
+    Sample memory and CPU usage of containers every interval
+
+    Usable as a context manager, sampling in a thread while in context.
+    Containers are no longer sampled once their cgroup goes away.
+
+    :param long_ids: Iterable of long IDs of running containers
+    :param interval: Seconds between samples
+    :param root: Path where cgroupfs hierarchies are mounted
+    :raise DockerIOError: If any container's cgroup isn't found
+    """
+
+    def __init__(self, long_ids, interval=0.1, root='/sys/fs/cgroup'):
+        self.interval = interval
+        self.paths = dict((long_id, CgroupPaths(long_id, root))
+                          for long_id in long_ids)
+        #: Mapping of long ID to it's ``CgroupSamples``
+        self.samples = dict((long_id, CgroupSamples(long_id))
+                            for long_id in self.paths)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def sample(self):
+        """
+        Take one sample of every container still running
+        """
+        for long_id, paths in list(self.paths.items()):
+            try:
+                values = paths.read()
+            except (IOError, OSError, ValueError):
+                del self.paths[long_id]
+                continue
+            self.samples[long_id].append(time.time(), *values)
+
+    def _run(self):
+        while self.paths:
+            self.sample()
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        """
+        Start sampling in a background thread
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling, taking one last sample
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+
+    def summary(self):
+        """
+        Return mapping of long ID to ``CgroupSamples.summary()``
+        """
+        return dict((long_id, samples.summary())
+                    for long_id, samples in list(self.samples.items()))
+
+    def cpu_shares(self):
+        """
+        Return mapping of long ID to it's fraction of all CPU time used
+        """
+        used = dict((long_id, samples.cpu_used)
+                    for long_id, samples in list(self.samples.items()))
+        total = sum(used.values())
+        if not total:
+            return dict((long_id, 0.0) for long_id in used)
+        return dict((long_id, cpu / total)
+                    for long_id, cpu in list(used.items()))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+
+# DO NOT allow this function to get loose in the wild!
+def mock(mod_path):
+    """
+    Recursivly inject tree of mocked modules from entire mod_path
+    """
+    name_list = mod_path.split('.')
+    child_name = name_list.pop()
+    child_mod = sys.modules.get(mod_path, types.ModuleType(child_name))
+    if len(name_list) == 0:  # child_name is left-most basic module
+        if child_name not in sys.modules:
+            sys.modules[child_name] = child_mod
+        return sys.modules[child_name]
+    else:
+        # New or existing child becomes parent
+        recurse_path = ".".join(name_list)
+        parent_mod = mock(recurse_path)
+        if not hasattr(sys.modules[recurse_path], child_name):
+            setattr(parent_mod, child_name, child_mod)
+            # full-name also points at child module
+            sys.modules[mod_path] = child_mod
+        return sys.modules[mod_path]
+
+setattr(mock('autotest.client.shared.error'), 'CmdError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestFail', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestNAError', Exception)
+setattr(mock('autotest.client.shared.error'), 'AutotestError', Exception)
+
+ID_ONE = 'a' * 64
+ID_TWO = 'b' * 64
+
+
+class CgroupSamplerTestBase(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import cgroupsampler
+        from dockertest import xceptions
+        self.cgroupsampler = cgroupsampler
+        self.xceptions = xceptions
+        self.root = tempfile.mkdtemp(self.__class__.__name__)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, relpath, content):
+        path = os.path.join(self.root, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as cgfile:
+            cgfile.write(content)
+
+
+class CgroupV1Test(CgroupSamplerTestBase):
+
+    def set_usage(self, long_id, memory, cpu_ns,
+                  limit=0x7FFFFFFFFFFFF000):
+        self.write('memory/docker/%s/memory.usage_in_bytes' % long_id,
+                   '%d\n' % memory)
+        self.write('memory/docker/%s/memory.limit_in_bytes' % long_id,
+                   '%d\n' % limit)
+        self.write('cpuacct/docker/%s/cpuacct.usage' % long_id,
+                   '%d\n' % cpu_ns)
+
+    def test_paths(self):
+        self.set_usage(ID_ONE, 1000, 5)
+        paths = self.cgroupsampler.CgroupPaths(ID_ONE, self.root)
+        self.assertEqual(paths.version, 1)
+        self.assertEqual(paths.read(), (1000, None, 5))
+        self.assertRaises(self.xceptions.DockerIOError,
+                          self.cgroupsampler.CgroupPaths, ID_TWO, self.root)
+
+    def test_sample(self):
+        self.set_usage(ID_ONE, 1000, 0, limit=4096)
+        self.set_usage(ID_TWO, 2000, 0)
+        sampler = self.cgroupsampler.CgroupSampler([ID_ONE, ID_TWO],
+                                                   root=self.root)
+        sampler.sample()
+        self.set_usage(ID_ONE, 3000, 1000000000, limit=4096)
+        self.set_usage(ID_TWO, 2000, 3000000000)
+        sampler.sample()
+        # Container exited, it's cgroup is removed
+        shutil.rmtree(os.path.join(self.root, 'memory/docker', ID_TWO))
+        sampler.sample()
+        self.assertEqual(list(sampler.paths), [ID_ONE])
+        self.assertEqual(len(sampler.samples[ID_ONE]), 3)
+        self.assertEqual(len(sampler.samples[ID_TWO]), 2)
+        summary = sampler.summary()[ID_ONE]
+        self.assertEqual(summary['memory_max'], 3000)
+        self.assertEqual(summary['memory_limit'], 4096)
+        self.assertEqual(summary['cpu_seconds'], 1.0)
+        shares = sampler.cpu_shares()
+        self.assertAlmostEqual(shares[ID_ONE], 0.25)
+        self.assertAlmostEqual(shares[ID_TWO], 0.75)
+
+    def test_thread(self):
+        self.set_usage(ID_ONE, 1000, 0)
+        with self.cgroupsampler.CgroupSampler([ID_ONE], 0.01,
+                                              self.root) as sampler:
+            self.cgroupsampler.time.sleep(0.05)
+        # At least one from thread plus final sample
+        self.assertTrue(len(sampler.samples[ID_ONE]) >= 2)
+
+
+class CgroupV2Test(CgroupSamplerTestBase):
+
+    def setUp(self):
+        super(CgroupV2Test, self).setUp()
+        self.write('cgroup.controllers', 'cpu memory\n')
+        base = 'system.slice/docker-%s.scope/' % ID_ONE
+        self.write(base + 'memory.current', '1234\n')
+        self.write(base + 'memory.max', 'max\n')
+        self.write(base + 'cpu.stat', 'usage_usec 42\nuser_usec 40\n')
+
+    def test_paths(self):
+        paths = self.cgroupsampler.CgroupPaths(ID_ONE, self.root)
+        self.assertEqual(paths.version, 2)
+        self.assertEqual(paths.read(), (1234, None, 42000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Host-side index of process IDs to running container IDs
+
+A process inside a container is resolved by reading it's
+``/proc/<pid>/cgroup``, which names the container's scope.  That ID is
+only trusted when docker reports a running container with it, and it
+isn't the container this process itself runs in (e.g. when autotest
+runs inside a container).  Otherwise, the process is matched against the
+main PID of every running container, all found with one ``docker ps``
+and one batched ``docker inspect``.  That mapping is only refreshed on a
+miss, and then at most once every ``max_age`` seconds.  PIDs reused
+since the last refresh (their start time changed) are misses.
+"""
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import re
+import time
+from autotest.client import utils
+
+#: Container IDs in cgroup paths, e.g. ``/docker/<id>`` or
+#: ``/system.slice/docker-<id>.scope``
+CGROUP_ID_REGEX = re.compile(r'(?:^|[/-])([0-9a-f]{64})(?:\.scope)?$')
+
+
+def cgroup_container_id(pid, proc='/proc'):
+    """
+    Return long ID of container pid runs inside, from it's cgroups, or None
+
+    :param pid: Process ID on host
+    :param proc: Path to procfs mount
+    """
+    try:
+        with open('%s/%d/cgroup' % (proc, int(pid))) as cgroup:
+            lines = cgroup.read().splitlines()
+    except (IOError, OSError, ValueError):
+        return None
+    for line in lines:
+        # hierarchy-ID:controller-list:cgroup-path
+        mobj = CGROUP_ID_REGEX.search(line.split(':', 2)[-1])
+        if mobj is not None:
+            return mobj.group(1)
+    return None
+
+
+def process_start(pid, proc='/proc'):
+    """
+    Return start time of pid in clock ticks after boot, or None if unknown
+
+    :param pid: Process ID on host
+    :param proc: Path to procfs mount
+    """
+    try:
+        with open('%s/%d/stat' % (proc, int(pid))) as stat:
+            # Command name (2nd field) is parenthesized, may contain spaces
+            fields = stat.read().rsplit(')', 1)[-1].split()
+        return int(fields[19])  # 22nd field, starttime
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
+class ContainerIndex(object):
+
+    """
+    Lazily refreshed mapping of process IDs to running container IDs
+
+    :param docker_command: Docker client command
+    :param max_age: Minimum seconds between refreshes of the PID mapping
+    :param proc: Path to procfs mount
+    """
+
+    def __init__(self, docker_command='docker', max_age=1.0, proc='/proc'):
+        self.docker_command = docker_command
+        self.max_age = max_age
+        self.proc = proc
+        #: Mapping of container main PID to long container ID
+        self.by_pid = {}
+        #: Mapping of container main PID to it's ``process_start()``
+        self.started = {}
+        #: Set of long IDs of all running containers
+        self.running = set()
+        #: Long ID of container this process runs inside, or None
+        self.own_id = cgroup_container_id(os.getpid(), proc)
+        #: time.time() of last refresh(), None if never
+        self.refreshed = None
+
+    def refresh(self):
+        """
+        Rebuild PID mapping for all running containers
+        """
+        self.refreshed = time.time()
+        cids = utils.run('%s ps -q --no-trunc' % self.docker_command,
+                         verbose=False,
+                         ignore_status=True).stdout.split()
+        self.by_pid = {}
+        self.started = {}
+        self.running = set(cids)
+        if not cids:
+            return
+        cmdresult = utils.run("%s inspect --format '{{.Id}} {{.State.Pid}}' %s"
+                              % (self.docker_command, ' '.join(cids)),
+                              verbose=False, ignore_status=True)
+        for line in cmdresult.stdout.splitlines():
+            fields = line.split()
+            # Containers which exited since ps have PID 0
+            if len(fields) == 2 and fields[1].isdigit() and int(fields[1]):
+                pid = int(fields[1])
+                self.by_pid[pid] = fields[0]
+                self.started[pid] = process_start(pid, self.proc)
+
+    @property
+    def stale(self):
+        """
+        True when PID mapping is older than max_age (or was never built)
+        """
+        return (self.refreshed is None or
+                time.time() - self.refreshed >= self.max_age)
+
+    def lookup(self, pid):
+        """
+        Return long ID of container pid belongs to, or None if unknown
+
+        :param pid: Process ID on host
+        """
+        pid = int(pid)
+        cid = cgroup_container_id(pid, self.proc)
+        if cid is not None and cid != self.own_id:
+            if cid not in self.running and self.stale:
+                self.refresh()
+            if cid in self.running:
+                return cid
+        if (pid in self.by_pid and
+                self.started.get(pid) != process_start(pid, self.proc)):
+            del self.by_pid[pid]  # PID was reused
+        if pid not in self.by_pid and self.stale:
+            self.refresh()
+        return self.by_pid.get(pid)
+
+
+#: Private, run-wide index instance per docker command, use ``index()``
+_indexes = {}
+
+
+def index(docker_command='docker'):
+    """
+    Return the run-wide ``ContainerIndex`` for docker_command
+
+    :param docker_command: Docker client command including options, e.g.
+                           ``-H`` of a private daemon instance.
+    """
+    if docker_command not in _indexes:
+        _indexes[docker_command] = ContainerIndex(docker_command)
+    return _indexes[docker_command]
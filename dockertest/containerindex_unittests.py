@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+
+# DO NOT allow this function to get loose in the wild!
+def mock(mod_path):
+    """
+    Recursivly inject tree of mocked modules from entire mod_path
+    """
+    name_list = mod_path.split('.')
+    child_name = name_list.pop()
+    child_mod = sys.modules.get(mod_path, types.ModuleType(child_name))
+    if len(name_list) == 0:  # child_name is left-most basic module
+        if child_name not in sys.modules:
+            sys.modules[child_name] = child_mod
+        return sys.modules[child_name]
+    else:
+        # New or existing child becomes parent
+        recurse_path = ".".join(name_list)
+        parent_mod = mock(recurse_path)
+        if not hasattr(sys.modules[recurse_path], child_name):
+            setattr(parent_mod, child_name, child_mod)
+            # full-name also points at child module
+            sys.modules[mod_path] = child_mod
+        return sys.modules[mod_path]
+
+
+class FakeCmdResult(object):
+
+    def __init__(self, **dargs):
+        for key, val in list(dargs.items()):
+            setattr(self, key, val)
+
+ID_ONE = 'a' * 64
+ID_TWO = 'b' * 64
+ID_SCOPE = 'c' * 64
+ID_GONE = 'd' * 64
+
+#: Commands "run", for checking
+COMMANDS = []
+
+
+def run(command, *_args, **_dargs):
+    COMMANDS.append(command)
+    if ' ps ' in command:
+        stdout = "%s\n%s\n%s\n" % (ID_ONE, ID_TWO, ID_SCOPE)
+    elif ' inspect ' in command:
+        stdout = "%s 1234\n%s 0\n%s 4242\n" % (ID_ONE, ID_TWO, ID_SCOPE)
+    else:
+        stdout = ''
+    return FakeCmdResult(command=command, stdout=stdout, stderr='',
+                         exit_status=0, duration=0)
+
+setattr(mock('autotest.client.utils'), 'run', run)
+
+
+class ContainerIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import containerindex
+        self.containerindex = containerindex
+        self.proc = tempfile.mkdtemp(self.__class__.__name__)
+        self.write_cgroup(42, "12:memory:/system.slice/docker-%s.scope\n"
+                          "1:name=systemd:/system.slice/docker-%s.scope\n"
+                          % (ID_SCOPE, ID_SCOPE))
+        self.write_cgroup(43, "0::/docker/%s\n" % ID_SCOPE)
+        self.write_cgroup(44, "0::/docker/%s\n" % ID_GONE)
+        self.write_cgroup(1234, "0::/user.slice/user-0.slice/session-1.scope\n")
+        del COMMANDS[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.proc, ignore_errors=True)
+
+    def write_cgroup(self, pid, content):
+        os.mkdir(os.path.join(self.proc, str(pid)))
+        with open(os.path.join(self.proc, str(pid), 'cgroup'), 'w') as cgf:
+            cgf.write(content)
+
+    def write_stat(self, pid, start):
+        with open(os.path.join(self.proc, str(pid), 'stat'), 'w') as stat:
+            stat.write("%d (cmd with) spaces) S 1 %d %s\n"
+                       % (pid, pid, ' '.join(['0'] * 16 + [str(start), '0'])))
+
+    def test_cgroup(self):
+        cgroup_container_id = self.containerindex.cgroup_container_id
+        self.assertEqual(cgroup_container_id(42, self.proc), ID_SCOPE)
+        self.assertEqual(cgroup_container_id(43, self.proc), ID_SCOPE)
+        self.assertEqual(cgroup_container_id(1234, self.proc), None)
+        self.assertEqual(cgroup_container_id(99, self.proc), None)
+
+    def test_process_start(self):
+        process_start = self.containerindex.process_start
+        self.write_stat(1234, 5678)
+        self.assertEqual(process_start(1234, self.proc), 5678)
+        self.assertEqual(process_start(42, self.proc), None)
+
+    def test_lookup_cgroup(self):
+        index = self.containerindex.ContainerIndex(proc=self.proc,
+                                                   max_age=3600)
+        self.assertEqual(index.lookup(42), ID_SCOPE)
+        self.assertEqual(len(COMMANDS), 2)  # Confirmed by ps
+        self.assertEqual(index.lookup(43), ID_SCOPE)
+        self.assertEqual(len(COMMANDS), 2)
+
+    def test_lookup_cgroup_unconfirmed(self):
+        index = self.containerindex.ContainerIndex(proc=self.proc)
+        # Not a running container
+        self.assertEqual(index.lookup(44), None)
+        # Container autotest runs inside
+        index.own_id = ID_SCOPE
+        self.assertEqual(index.lookup(42), None)
+
+    def test_lookup_reused(self):
+        index = self.containerindex.ContainerIndex(proc=self.proc,
+                                                   max_age=3600)
+        self.write_stat(1234, 100)
+        self.assertEqual(index.lookup(1234), ID_ONE)
+        self.write_stat(1234, 200)
+        self.assertEqual(index.lookup(1234), None)
+        self.assertEqual(len(COMMANDS), 2)
+        index.refreshed -= 3600
+        self.assertEqual(index.lookup(1234), ID_ONE)
+        self.assertEqual(index.started[1234], 200)
+
+    def test_lookup_pid(self):
+        index = self.containerindex.ContainerIndex(proc=self.proc,
+                                                   max_age=3600)
+        self.assertEqual(index.lookup(1234), ID_ONE)
+        self.assertEqual(len(COMMANDS), 2)  # ps + one inspect
+        self.assertTrue(ID_ONE in COMMANDS[1] and ID_TWO in COMMANDS[1])
+        self.assertEqual(index.lookup('1234'), ID_ONE)
+        # Misses don't refresh again until max_age passes
+        self.assertEqual(index.lookup(999), None)
+        self.assertEqual(len(COMMANDS), 2)
+        index.refreshed -= 3600
+        self.assertEqual(index.lookup(999), None)
+        self.assertEqual(len(COMMANDS), 4)
+        self.assertEqual(index.by_pid, {1234: ID_ONE, 4242: ID_SCOPE})
+
+    def test_index_per_command(self):
+        instance = 'docker -H unix:///run/instance.sock'
+        index = self.containerindex.index(instance)
+        self.assertTrue(self.containerindex.index(instance) is index)
+        self.assertFalse(self.containerindex.index() is index)
+        index.proc = self.proc
+        index.lookup(999)
+        self.assertTrue(COMMANDS[0].startswith(instance + ' ps '))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,12 +23,20 @@ Where/when ***possible***, both parameters and return values follow this order:
 # Pylint runs from another directory, ignore relative import warnings
 # pylint: disable=W0403
 
+import contextlib
 import json
+import random
+import shlex
+import threading
+import time
 from autotest.client import utils
 from autotest.client.shared import error
 from .output import OutputGood
 from .output import TextTable
 from .config import get_as_list
+from . import names
+from .dockercmd import DockerCmd, DockerCmdEngine
+from .images import DockerImage, intern_str
 from .subtestbase import SubBase
 from .xceptions import DockerTestError
 
@@ -38,6 +46,10 @@ class DockerContainer(object):  # pylint: disable=R0902
 
     """
     Represent a container, image, and command as a set of instance attributes.
+
+    Attributes are write-once: any still None may be assigned, but never
+    changed afterwards.  Instances hash by (immutable) ``container_name`` so
+    collections of them may be sets.  Repeated strings are interned.
     """
 
     #: There will likely be many instances, limit memory consumption.
@@ -51,7 +63,10 @@ class DockerContainer(object):  # pylint: disable=R0902
     __slots__ = ["image_name", "command", "ports", "container_name",
                  "long_id", "created", "status", "size", "links"]
 
-    def __init__(self, image_name, command, ports=None, container_name=None):
+    # Many arguments are simply required here
+    # pylint: disable=R0913
+    def __init__(self, image_name, command, ports=None, container_name=None,
+                 long_id=None, created=None, status=None, size=None):
         """
         Create a new container representation based on parameter content.
 
@@ -61,21 +76,32 @@ class DockerContainer(object):  # pylint: disable=R0902
         :param container_name: String representing name of container
                                optionally prefixed by CSV
                                <child>/<alias> format link strings
-        """
-        self.image_name = image_name
-        self.command = command
+        :param long_id: String of container's long ID, if known
+        :param created: String of creation time, if known
+        :param status: String of container status, if known
+        :param size: String of container size, if known
+        """
+        setattr_ = super(DockerContainer, self).__setattr__
+        setattr_('image_name', intern_str(image_name))
+        setattr_('command', command)
         if ports is None:
-            self.ports = ''
-        else:
-            self.ports = ports
-        pcn = self.parse_container_name
-        self.container_name, self.links = pcn(container_name)
-
+            ports = ''
+        setattr_('ports', intern_str(ports))
+        container_name, links = self.parse_container_name(container_name)
+        setattr_('container_name', container_name)
+        setattr_('links', links)
         #: These are typically all generated at runtime
-        self.long_id = None
-        self.created = None
-        self.status = None
-        self.size = None
+        setattr_('long_id', long_id)
+        setattr_('created', intern_str(created))
+        setattr_('status', intern_str(status))
+        setattr_('size', intern_str(size))
+
+    def __setattr__(self, name, value):
+        if getattr(self, name, None) is not None:
+            raise AttributeError("%s.%s is already set, instances are "
+                                 "write-once" % (self.__class__.__name__,
+                                                 name))
+        super(DockerContainer, self).__setattr__(name, intern_str(value))
 
     def __eq__(self, other):
         """
@@ -83,13 +109,16 @@ class DockerContainer(object):  # pylint: disable=R0902
 
         :param other: An instance of this class (or subclass) for comparison.
         """
-        self_val = [getattr(self, name) for name in self.__slots__]
-        other_val = [getattr(other, name) for name in self.__slots__]
-        for _self, _other in zip(self_val, other_val):
-            if _self != _other:
+        if self is other:
+            return True
+        for name in self.__slots__:
+            if getattr(self, name) != getattr(other, name):
                 return False
         return True
 
+    def __hash__(self):
+        return hash(self.container_name)
+
     def __str__(self):
         """
         Represent instance in a human-readable form
@@ -196,6 +225,17 @@ class DockerContainers(object):
     #: Extra arguments to use with remove methods
     remove_args = None
 
+    #: Docker subcommands which never change any container
+    readonly_subcommands = ('ps', 'inspect', 'events', 'logs', 'top', 'port',
+                            'diff', 'export', 'images', 'info', 'version')
+
+    #: Docker subcommands which may change containers they don't name
+    bulk_subcommands = ('container', 'system')
+
+    #: Minimum seconds between ``docker events`` checks for changes to
+    #: containers cached by ``inspect_many()``, 0 to check on every call
+    inspect_sync_interval = 2.0
+
     def __init__(self, subtest, timeout=None, verbose=False):
         if timeout is None:
             # Defined in [DEFAULTS] guaranteed to exist
@@ -217,6 +257,12 @@ class DockerContainers(object):
                                   % subtest.__class__.__name__)
         else:
             self.subtest = subtest
+        # Long ID to inspect JSON object, see inspect_many()
+        self._inspect_cache = {}
+        # Name/ID given to inspect_many() to long ID
+        self._inspect_aliases = {}
+        # Time of last check for container events invalidating cache
+        self._inspect_synced = None
 
     # private methods don't need docstrings
     def _dc_from_row(self, row):  # pylint: disable=C0111
@@ -224,17 +270,16 @@ class DockerContainers(object):
         command = row['COMMAND']
         ports = row['PORTS']
         container_name = row['NAMES']
-        dcntr = DockerContainer(image_name, command, ports, container_name)
-        dcntr.long_id = row['CONTAINER ID']
-        dcntr.created = row['CREATED']
-        dcntr.status = row['STATUS']
+        size = None
         if self.get_size:
             # Raise documented get_container_list() exception
             try:
-                dcntr.size = row['SIZE']  # throw
+                size = row['SIZE']  # throw
             except KeyError:
                 raise ValueError("No size data present in table!")
-        return dcntr
+        return DockerContainer(image_name, command, ports, container_name,
+                               row['CONTAINER ID'], row['CREATED'],
+                               row['STATUS'], size)
 
     # private methods don't need docstrings
     def _parse_lines(self, stdout_strip):  # pylint: disable=C0111
@@ -251,6 +296,8 @@ class DockerContainers(object):
         """
         docker_cmd = ("%s %s" % (self.subtest.config['docker_path'],
                                  cmd))
+        if cmd.split(None, 1)[0] not in self.readonly_subcommands:
+            self._invalidate_cmd(cmd)
         if timeout is None:
             timeout = self.timeout
         return utils.run(docker_cmd,
@@ -353,6 +400,129 @@ class DockerContainers(object):
                                   str(details))
             return None
 
+    def invalidate(self, ids=None):
+        """
+        Forget cached ``inspect_many()`` results for ids, or all if None
+
+        :param ids: Iterable of container names/IDs as given to inspect_many
+        """
+        if ids is None:
+            self._inspect_cache = {}
+            self._inspect_aliases = {}
+            self._inspect_synced = None
+            return
+        for cid in ids:
+            long_id = self._inspect_aliases.pop(str(cid), str(cid))
+            self._inspect_cache.pop(long_id, None)
+
+    def _invalidate_cmd(self, cmd):  # pylint: disable=C0111
+        # Forget cached results for containers cmd may change
+        try:
+            args = shlex.split(cmd)
+        except ValueError:
+            args = []
+        if not args or args[0] in self.bulk_subcommands:
+            self.invalidate()
+            return
+        words = set()
+        for arg in args[1:]:
+            words.update(word for word in arg.split('=') if word)
+        self.invalidate(word for word in words
+                        if word in self._inspect_aliases)
+        for long_id, item in list(self._inspect_cache.items()):
+            if any(self._inspect_match(word, item) for word in words):
+                del self._inspect_cache[long_id]
+
+    def _sync_inspect_cache(self):  # pylint: disable=C0111
+        # Drop cached results for containers with any event since last sync
+        now = time.time()
+        try:
+            cmdresult = self.docker_cmd("events --since=%0.9f --until=%0.9f "
+                                        "--filter=type=container"
+                                        % (self._inspect_synced, now),
+                                        self.timeout)
+        except error.CmdError:
+            cmdresult = None
+        if cmdresult is None or cmdresult.exit_status != 0:
+            self.invalidate()
+            return
+        # <timestamp> container <action> <long ID> (<attributes>)
+        changed = set(line.split()[3] for line in cmdresult.stdout.splitlines()
+                      if len(line.split()) > 3)
+        for long_id in changed:
+            self._inspect_cache.pop(long_id, None)
+        self._inspect_synced = now
+
+    def _inspect(self, ids):  # pylint: disable=C0111
+        # One docker inspect for all ids, return list of JSON objects found
+        args = " ".join('"%s"' % cid for cid in ids)
+        try:
+            cmdresult = self.docker_cmd('inspect --type=container %s' % args,
+                                        self.timeout)
+            # Non-zero exit if any id not found, rest are still output
+            _json = json.loads(cmdresult.stdout.strip() or '[]')
+        except (TypeError, ValueError, error.CmdError) as details:
+            self.subtest.logdebug("docker inspect %s raised: %s: %s",
+                                  args, details.__class__.__name__,
+                                  str(details))
+            return []
+        # No items in _json list should be empty
+        return [item for item in _json if item]
+
+    def inspect_many(self, ids):
+        """
+        Return mapping of container names/IDs to inspect JSON object for each
+
+        Only containers not already cached are inspected, all in a single
+        docker command.  Unlike ``get_container_metadata()`` (and the
+        ``json_by_*()`` methods), results may be cached, use only where
+        changes made through another instance don't matter.  Cached results are kept until this instance runs a
+        docker command naming the container (or any changing command in
+        ``bulk_subcommands``), ``invalidate()`` is called, or ``docker
+        events`` reports a change to the container.  Events are checked at
+        most once every ``inspect_sync_interval`` seconds.
+
+        :param ids: Iterable of container names, long or short IDs
+        :return: Dictionary of each of ids to JSON object, None if not found
+        """
+        ids = [str(cid) for cid in ids]
+        if (self._inspect_cache and time.time() - self._inspect_synced >=
+                self.inspect_sync_interval):
+            self._sync_inspect_cache()
+        results = {}
+        missing = []
+        for cid in ids:
+            long_id = self._inspect_aliases.get(cid)
+            if long_id in self._inspect_cache:
+                results[cid] = self._inspect_cache[long_id]
+            else:
+                missing.append(cid)
+        if not missing:
+            return results
+        if self._inspect_synced is None:
+            self._inspect_synced = time.time()
+        found = self._inspect(missing)
+        if len(found) == len(missing):  # output is in argument order
+            pairs = list(zip(missing, found))
+        else:  # some weren't found, match up the rest
+            pairs = [(cid, item) for cid in missing for item in found
+                     if self._inspect_match(cid, item)]
+        for cid in missing:
+            results[cid] = None
+        for cid, item in pairs:
+            # Very old docker versions used 'ID' instead of 'Id'
+            long_id = item.get('Id', item.get('ID'))
+            self._inspect_cache[long_id] = item
+            self._inspect_aliases[cid] = long_id
+            results[cid] = item
+        return results
+
+    @staticmethod
+    def _inspect_match(cid, item):  # pylint: disable=C0111
+        long_id = item.get('Id', item.get('ID', ''))
+        return (long_id.startswith(cid) or
+                item.get('Name', '').lstrip('/') == cid.lstrip('/'))
+
     def json_by_long_id(self, long_id):
         """
         Return json-object for container with long_id
@@ -393,16 +563,17 @@ class DockerContainers(object):
         :param prefix: Name prefix string
         :param suffix: Name suffix string
         :param length: Length of random string (greater than 1)
-        :return: Container name guaranteed to not be in-use.
+        :return: Container name, unique to this run without listing
+                 containers (see ``names`` module)
         """
         assert length > 1
         if prefix:
             prefix = "%s-%s" % (self.subtest.__class__.__name__, prefix)
         else:
             prefix = self.subtest.__class__.__name__
-        all_containers = [_.container_name for _ in self.list_containers()]
-        check = lambda name: name not in all_containers
-        return utils.get_unique_name(check, prefix, suffix, length)
+        if suffix:
+            suffix = "_%s" % suffix
+        return names.registry().new_name('container', prefix, suffix, length)
 
     def kill_container_by_long_id(self, long_id):
         """
@@ -552,7 +723,7 @@ class DockerContainers(object):
 
     def clean_all(self, containers):
         """
-        Remove all containers not configured to preserve
+        Remove all containers not configured to preserve, nor idle in pool
 
         :param containers: Iterable sequence of container **names**
         """
@@ -575,7 +746,8 @@ class DockerContainers(object):
                 if name == None:
                     continue
                 name = name.strip()
-                if name in preserve_cnames_set:
+                if (name in preserve_cnames_set or
+                        ContainerPool.is_idle_name(name)):
                     continue
                 try:
                     self.subtest.logdebug("Cleaning %s", name)
@@ -585,3 +757,229 @@ class DockerContainers(object):
                     continue
         finally:
             self.verbose = DockerContainers.verbose
+
+
+class ContainerPool(object):
+
+    """
+    Lease running default-image containers, started ahead of demand
+
+    Idle containers are named ``<name_prefix>idle_<random>`` and renamed to
+    ``<name_prefix>leased_<random>`` while leased, so the pool is shared
+    by all subtests of a run (and every instance of this class).  Idle
+    containers are preserved by ``DockerContainers.clean_all()`` and not
+    considered leftovers by ``garbage_check``.  Leased containers are
+    ordinary garbage, if never released.  The ``container_pool_close``
+    posttest removes every pooled container at the end of the run.
+
+    :param subtest: A subtest.SubBase subclass instance
+    :param size: Number of idle containers to keep running, None for
+                 ``container_pool_size`` config. option.  When 0,
+                 containers are only started on demand.
+    :param run_options: List of ``docker run`` options, None for
+                        ``container_pool_run_options`` config. option (CSV)
+    :param command: Command run by containers, None for
+                    ``container_pool_command`` config. option
+    """
+
+    #: Prefix of all pooled container names
+    name_prefix = 'dockertest_pool_'
+
+    def __init__(self, subtest, size=None, run_options=None, command=None):
+        config = subtest.config
+        if size is None:
+            size = config.get('container_pool_size', 0)
+        if run_options is None:
+            run_options = get_as_list(config.get('container_pool_run_options',
+                                                 ''))
+        if command is None:
+            command = config.get('container_pool_command',
+                                 "/bin/sh -c 'while :; do sleep 1; done'")
+        self.subtest = subtest
+        self.size = int(size)
+        self.run_options = run_options
+        self.command = command
+        self.image = DockerImage.full_name_from_defaults(config)
+        self.dc = DockerContainers(subtest)
+        self._refill = None
+
+    @classmethod
+    def is_idle_name(cls, name):
+        """
+        Return True if name is that of an idle pooled container
+        """
+        return str(name).startswith(cls.name_prefix + 'idle_')
+
+    @classmethod
+    def new_name(cls, state):
+        """
+        Return new, unique name of pooled container in state (idle/leased)
+        """
+        return "%s%s_%012x" % (cls.name_prefix, state, random.getrandbits(48))
+
+    @staticmethod
+    def is_running(cntr):
+        """
+        Return True if DockerContainer-like instance cntr is running, unpaused
+        """
+        status = str(cntr.status)
+        return status.startswith('Up') and '(Paused)' not in status
+
+    def pooled(self):
+        """
+        Return list of DockerContainer-like instances of all pooled containers
+        """
+        return [cntr for cntr in self.dc.list_containers()
+                if str(cntr.container_name).startswith(self.name_prefix)]
+
+    def idle_names(self):
+        """
+        Return list of all running, idle pooled container names
+        """
+        return [cntr.container_name for cntr in self.pooled()
+                if self.is_idle_name(cntr.container_name) and
+                self.is_running(cntr)]
+
+    def start(self, count, state='idle'):
+        """
+        Concurrently start count containers, return list of names started
+        """
+        dkrcmds = []
+        for _ in range(count):
+            subargs = (['--detach', '--name', self.new_name(state)] +
+                       self.run_options + [self.image, self.command])
+            dkrcmd = DockerCmd(self.subtest, 'run', subargs)
+            dkrcmd.quiet = True
+            dkrcmds.append(dkrcmd)
+        names = []
+        for dkrcmd, cmdresult in zip(dkrcmds,
+                                     DockerCmdEngine().execute(dkrcmds)):
+            if cmdresult.exit_status == 0:
+                names.append(dkrcmd.subargs[2])
+            else:
+                self.subtest.logwarning("Starting pooled container: %s",
+                                        cmdresult)
+        return names
+
+    def fill(self):
+        """
+        Start containers until there are ``size`` idle, removing dead ones
+        """
+        running = 0
+        for cntr in self.pooled():
+            if not self.is_idle_name(cntr.container_name):
+                continue
+            if self.is_running(cntr):
+                running += 1
+            else:
+                self.destroy(cntr.container_name)
+        missing = self.size - running
+        if missing > 0:
+            self.start(missing)
+
+    def fill_background(self):
+        """
+        Run ``fill()`` in a thread, unless already running
+        """
+        if self.size < 1:
+            return
+        if self._refill is not None and self._refill.is_alive():
+            return
+        self._refill = threading.Thread(target=self.fill)
+        self._refill.daemon = True
+        self._refill.start()
+
+    def _wait_refill(self):  # pylint: disable=C0111
+        if self._refill is not None:
+            self._refill.join()
+            self._refill = None
+
+    def _rename(self, name, new_name):  # pylint: disable=C0111
+        try:
+            self.dc.docker_cmd("rename %s %s" % (name, new_name))
+        except error.CmdError:
+            return False  # e.g. leased by someone else first
+        return True
+
+    def _take_idle(self):  # pylint: disable=C0111
+        for name in self.idle_names():
+            leased = name.replace('_idle_', '_leased_', 1)
+            if not self._rename(name, leased):
+                continue
+            _json = self.dc.inspect_many([leased])[leased]
+            if _json is not None and _json['State']['Running']:
+                return leased
+            self.destroy(leased)
+        return None
+
+    def lease(self):
+        """
+        Return name of a running container, exclusively for the caller
+
+        :raises DockerTestError: If no container could be started
+        """
+        leased = self._take_idle()
+        if leased is None and self._refill is not None:
+            self._wait_refill()
+            leased = self._take_idle()
+        if leased is None:
+            names = self.start(1, 'leased')
+            if not names:
+                raise DockerTestError("Could not start container for lease")
+            leased = names[0]
+        self.subtest.logdebug("Leased pooled container %s", leased)
+        self.fill_background()
+        return leased
+
+    def destroy(self, name):
+        """
+        Remove pooled container name
+        """
+        try:
+            self.dc.docker_cmd("rm --force --volumes %s" % name)
+        except error.CmdError:
+            pass  # Removal was the goal
+
+    def release(self, name, recycle=False):
+        """
+        Return leased container, destroying it unless recycle is True
+
+        :param name: Name returned by ``lease()``
+        :param recycle: When True, and container is still running and
+                        the pool isn't full, keep it for another lease.
+        """
+        if recycle and len(self.idle_names()) < self.size:
+            _json = self.dc.inspect_many([name])[name]
+            if (_json is not None and _json['State']['Running'] and
+                    self._rename(name, name.replace('_leased_', '_idle_', 1))):
+                return
+        self.destroy(name)
+        self.fill_background()
+
+    @contextlib.contextmanager
+    def leased(self, recycle=False):
+        """
+        Context manager giving name of leased container, released on exit
+        """
+        name = self.lease()
+        try:
+            yield name
+        finally:
+            self.release(name, recycle)
+
+    def close(self, leased=False):
+        """
+        Remove all idle pooled containers, running or not
+
+        :param leased: Also remove leased containers, only when nothing
+                       could still be using them (i.e. end of run)
+        :return: List of names removed
+        """
+        self._wait_refill()
+        removed = []
+        for cntr in self.pooled():
+            name = cntr.container_name
+            if leased or self.is_idle_name(name):
+                self.destroy(name)
+                removed.append(name)
+        return removed
@@ -63,6 +63,19 @@ class DockerContainerTest(ContainersTestBase):
         self.assertFalse(dc3 == dc1)
         self.assertFalse(dc3 == dc2)
 
+    def test_write_once_hashable(self):
+        dc1 = self.DC("fedora", "/bin/true", "", "foobar", long_id="1234")
+        dc2 = self.DC("fedora", "/bin/true", "", "foobar", long_id="1234")
+        dc1.status = "Up 42 hours"
+        self.assertRaises(AttributeError, setattr, dc1, 'status', 'Exited')
+        self.assertRaises(AttributeError, setattr, dc1, 'long_id', '5678')
+        self.assertRaises(AttributeError, setattr, dc1, 'container_name',
+                          'barfoo')
+        self.assertNotEqual(dc1, dc2)
+        dc2.status = "Up 42 hours"
+        self.assertEqual(dc1, dc2)
+        self.assertEqual(len(set([dc1, dc2])), 1)
+
     def test_output(self):
         foo = object()
         dc = self.DC(foo, r"/bin/echo -ne 'hello world\n'", "foobar")
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+
+"""
+Run-wide background sampling of docker daemon resource usage
+
+A detached sampler process reads ``/proc/<pid>/status``, ``/proc/<pid>/stat``
+and ``/proc/<pid>/fd`` of the docker daemon every ``interval`` seconds,
+appending one CSV row per sample.  Since every test step runs in it's own
+process, the sampler can't be told about steps directly.  Instead, ``note()``
+records the running step in a small file, which tags each following sample.
+Should the daemon restart, the sampler follows the new ``dockerd`` process.
+The step and PID files live in the directory given to ``configure()``,
+normally the job's results directory, so concurrent jobs don't share them.
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!
+"""
+
+import argparse
+import collections
+import csv
+import errno
+import os
+import signal
+import subprocess
+import sys
+import time
+
+#: Columns of sample CSV, all but time and step are integers
+FIELDS = ('time', 'step', 'rss_kb', 'vm_kb', 'threads', 'fds',
+          'utime', 'stime')
+
+#: Integer columns which are differenced between steps
+COUNTERS = FIELDS[2:]
+
+#: Name of file holding PID of running sampler process
+PID_FILENAME = 'daemon_sampler.pid'
+
+#: Name of file holding label of currently running step
+STEP_FILENAME = 'daemon_sampler.step'
+
+#: Private, directory holding PID and step files, set by ``configure()``
+_directory = None
+
+
+def configure(directory):
+    """
+    Set directory holding PID and step files, e.g. job's results directory
+    """
+    global _directory  # pylint: disable=W0603
+    _directory = directory
+
+
+def _path(path, filename):  # pylint: disable=C0111
+    # path if given, otherwise filename in configured directory (or None)
+    if path is None and _directory is not None:
+        path = os.path.join(_directory, filename)
+    return path
+
+
+def read_sample(pid, proc='/proc'):
+    """
+    Return tuple of ints in ``COUNTERS`` order for pid, or None if gone
+
+    :param pid: Process ID of docker daemon
+    :param proc: Path to procfs mount
+    """
+    base = '%s/%d' % (proc, int(pid))
+    try:
+        status = {}
+        with open(base + '/status') as status_file:
+            for line in status_file:
+                key, _, value = line.partition(':')
+                status[key] = value.split()
+        with open(base + '/stat') as stat_file:
+            # Command name may contain spaces, fields follow last ')'
+            stat = stat_file.read().rpartition(')')[2].split()
+        fds = len(os.listdir(base + '/fd'))
+    except (IOError, OSError):
+        return None
+    # Kernel threads have no memory sizes
+    rss_kb = int(status.get('VmRSS', ['0'])[0])
+    vm_kb = int(status.get('VmSize', ['0'])[0])
+    # utime and stime are fields 14 and 15 (clock ticks)
+    return (rss_kb, vm_kb, int(status['Threads'][0]), fds,
+            int(stat[11]), int(stat[12]))
+
+
+def find_pid(name='dockerd', proc='/proc'):
+    """
+    Return lowest PID of process with command name, or None if not running
+
+    :param name: Command name, as in ``/proc/<pid>/comm``
+    :param proc: Path to procfs mount
+    """
+    for entry in sorted((int(entry) for entry in os.listdir(proc)
+                         if entry.isdigit())):
+        try:
+            with open('%s/%d/comm' % (proc, entry)) as comm:
+                if comm.read().strip() == name:
+                    return entry
+        except (IOError, OSError):
+            continue
+    return None
+
+
+def note(label, step_file=None, pid_file=None):
+    """
+    Record label as the step now running, if a sampler is running
+
+    :param step_file: Path to step file, None for configured one
+    :param pid_file: Path to PID file, None for configured one
+    """
+    step_file = _path(step_file, STEP_FILENAME)
+    pid_file = _path(pid_file, PID_FILENAME)
+    if pid_file is None or not os.path.isfile(pid_file):
+        return
+    # Rename is atomic, sampler never reads a partial label
+    tmp_file = '%s.%d' % (step_file, os.getpid())
+    try:
+        with open(tmp_file, 'w') as step:
+            step.write(label)
+        os.rename(tmp_file, step_file)
+    except (IOError, OSError):
+        pass
+
+
+def current_step(step_file=None):
+    """
+    Return label of step now running, or empty string if unknown
+
+    :param step_file: Path to step file, None for configured one
+    """
+    step_file = _path(step_file, STEP_FILENAME)
+    if step_file is None:
+        return ''
+    try:
+        with open(step_file) as step:
+            return step.read().strip()
+    except (IOError, OSError):
+        return ''
+
+
+class DaemonSampler(object):
+
+    """
+    Append docker daemon resource samples as CSV rows to output
+
+    :param pid: Process ID of docker daemon, None to find by name
+    :param output: File-like object opened for writing text
+    :param interval: Seconds between samples
+    :param step_file: File holding label of currently running step
+    :param proc: Path to procfs mount
+    """
+
+    #: Command name followed when daemon process goes away
+    name = 'dockerd'
+
+    def __init__(self, pid, output, interval=1.0, step_file=None,
+                 proc='/proc'):
+        if pid is None:
+            pid = find_pid(self.name, proc)
+        self.pid = pid
+        self.interval = interval
+        self.step_file = step_file
+        self.proc = proc
+        self.writer = csv.writer(output, lineterminator='\n')
+        self.output = output
+        self.stopping = False
+
+    def sample(self):
+        """
+        Write one row for current time and step, return it (None if no daemon)
+        """
+        values = None
+        if self.pid is not None:
+            values = read_sample(self.pid, self.proc)
+        if values is None:  # daemon restarted or stopped
+            self.pid = find_pid(self.name, self.proc)
+            if self.pid is None:
+                return None
+            values = read_sample(self.pid, self.proc)
+            if values is None:
+                return None
+        row = ('%.3f' % time.time(), current_step(self.step_file)) + values
+        self.writer.writerow(row)
+        self.output.flush()
+        return row
+
+    def stop(self, *_args):
+        """
+        Stop sampling after current sample, usable as a signal handler
+        """
+        self.stopping = True
+
+    def run(self):
+        """
+        Sample every interval until ``stop()`` is called
+        """
+        self.writer.writerow(FIELDS)
+        while not self.stopping:
+            started = time.time()
+            self.sample()
+            remaining = self.interval - (time.time() - started)
+            if remaining > 0 and not self.stopping:
+                time.sleep(remaining)
+
+
+def step_deltas(rows):
+    """
+    Return list of per-step dictionaries summarizing sample rows
+
+    Consecutive samples sharing a step are one period, changes of each
+    counter are measured from the last sample before the period (or it's
+    first sample) to the last sample of the period.
+
+    :param rows: Iterable of sample dicts (e.g. from ``csv.DictReader``)
+    :return: List of dicts with step, samples, seconds and each counter
+    """
+    periods = []
+    before = None
+    for row in rows:
+        values = dict((field, int(row[field])) for field in COUNTERS)
+        stamp = float(row['time'])
+        if not periods or periods[-1]['step'] != row['step']:
+            if before is None:
+                before = (stamp, values)
+            periods.append(dict(step=row['step'], samples=0,
+                                start=before, last=None))
+        periods[-1]['samples'] += 1
+        periods[-1]['last'] = (stamp, values)
+        before = (stamp, values)
+    results = []
+    for period in periods:
+        (start, first), (end, last) = period['start'], period['last']
+        result = collections.OrderedDict(step=period['step'])
+        result['samples'] = period['samples']
+        result['seconds'] = '%.3f' % (end - start)
+        for field in COUNTERS:
+            result[field] = last[field] - first[field]
+        results.append(result)
+    return results
+
+
+def write_step_deltas(samples_path, deltas_path):
+    """
+    Summarize samples CSV at samples_path into deltas CSV at deltas_path
+    """
+    with open(samples_path) as samples:
+        deltas = step_deltas(csv.DictReader(samples))
+    with open(deltas_path, 'w') as output:
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(('step', 'samples', 'seconds') + COUNTERS)
+        for delta in deltas:
+            writer.writerow(list(delta.values()))
+    return deltas
+
+
+def running(pid_file=None):
+    """
+    Return PID of running sampler process, or None
+
+    :param pid_file: Path to PID file, None for configured one
+    """
+    pid_file = _path(pid_file, PID_FILENAME)
+    if pid_file is None:
+        return None
+    try:
+        with open(pid_file) as pidf:
+            pid = int(pidf.read().strip())
+        os.kill(pid, 0)
+    except (IOError, OSError, ValueError):
+        return None
+    return pid
+
+
+def start(output_path, pid=None, interval=1.0, pid_file=None,
+          step_file=None):
+    """
+    Start detached sampler process writing to output_path, return it's PID
+
+    :param output_path: Path to samples CSV file
+    :param pid: Process ID of docker daemon, None to find by name
+    :param interval: Seconds between samples
+    :param pid_file: Path to PID file, None for configured one
+    :param step_file: Path to step file, None for configured one
+    :raises ValueError: If no path given nor directory configured
+    """
+    pid_file = _path(pid_file, PID_FILENAME)
+    step_file = _path(step_file, STEP_FILENAME)
+    if pid_file is None or step_file is None:
+        raise ValueError("No daemon sampler directory configured")
+    args = [sys.executable, os.path.abspath(__file__),
+            '--output', output_path, '--interval', str(interval),
+            '--step-file', step_file]
+    if pid is not None:
+        args += ['--pid', str(pid)]
+    # Must outlive the step process which started it
+    with open(os.devnull, 'r+') as devnull:
+        sampler = subprocess.Popen(args, close_fds=True, stdin=devnull,
+                                   stdout=devnull, stderr=devnull,
+                                   start_new_session=True)
+    with open(pid_file, 'w') as pidf:
+        pidf.write('%d\n' % sampler.pid)
+    return sampler.pid
+
+
+def stop(timeout=10, pid_file=None, step_file=None):
+    """
+    Stop running sampler process, return True if it was running
+
+    :param pid_file: Path to PID file, None for configured one
+    :param step_file: Path to step file, None for configured one
+    """
+    pid_file = _path(pid_file, PID_FILENAME)
+    step_file = _path(step_file, STEP_FILENAME)
+    pid = running(pid_file)
+    for path in (pid_file, step_file):
+        if path is None:
+            continue
+        try:
+            os.unlink(path)
+        except OSError as xcept:
+            if xcept.errno != errno.ENOENT:
+                raise
+    if pid is None:
+        return False
+    os.kill(pid, signal.SIGTERM)
+    endtime = time.time() + timeout
+    while time.time() < endtime:
+        try:
+            # Reap if it's our child (e.g. in tests), otherwise just poll
+            if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                break
+        except OSError as xcept:
+            if xcept.errno != errno.ECHILD:
+                raise
+            try:
+                os.kill(pid, 0)
+            except OSError:
+                break
+        time.sleep(0.05)
+    else:
+        os.kill(pid, signal.SIGKILL)
+    return True
+
+
+def main(argv=None):
+    """
+    Sample docker daemon until SIGTERM/SIGINT
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pid', type=int, default=None,
+                        help='docker daemon PID (default: find dockerd)')
+    parser.add_argument('--output', required=True,
+                        help='path to samples CSV file')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='seconds between samples')
+    parser.add_argument('--step-file', required=True,
+                        help='file holding label of running step')
+    parser.add_argument('--proc', default='/proc', help='procfs mount')
+    args = parser.parse_args(argv)
+    with open(args.output, 'w') as output:
+        sampler = DaemonSampler(args.pid, output, args.interval,
+                                args.step_file, args.proc)
+        signal.signal(signal.SIGTERM, sampler.stop)
+        signal.signal(signal.SIGINT, sampler.stop)
+        sampler.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+STATUS = """Name:\tdockerd
+State:\tS (sleeping)
+VmSize:\t  %d kB
+VmRSS:\t   %d kB
+Threads:\t%d
+"""
+
+STAT = "%d (docker d) S 1 %d %d 0 -1 4194560 100 0 0 0 %d %d 0 0 20 0 %d 0"
+
+
+class DaemonSamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import daemonsampler
+        self.daemonsampler = daemonsampler
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.proc = os.path.join(self.tmpdir, 'proc')
+        self.step_file = os.path.join(self.tmpdir, 'step')
+        self.pid_file = os.path.join(self.tmpdir, 'pid')
+        os.mkdir(self.proc)
+
+    def tearDown(self):
+        self.daemonsampler.configure(None)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write_proc(self, pid, comm='dockerd', rss=1000, threads=10, fds=3,
+                   utime=5, stime=7):
+        base = os.path.join(self.proc, str(pid))
+        if os.path.isdir(base):
+            shutil.rmtree(base)
+        os.makedirs(os.path.join(base, 'fd'))
+        for fd in range(fds):
+            open(os.path.join(base, 'fd', str(fd)), 'w').close()
+        with open(os.path.join(base, 'comm'), 'w') as comm_file:
+            comm_file.write(comm + '\n')
+        with open(os.path.join(base, 'status'), 'w') as status:
+            status.write(STATUS % (rss * 4, rss, threads))
+        with open(os.path.join(base, 'stat'), 'w') as stat:
+            stat.write(STAT % (pid, pid, pid, utime, stime, threads))
+
+    def note(self, label):
+        self.daemonsampler.note(label, self.step_file, self.pid_file)
+
+    def test_configure(self):
+        # Nothing to do until configured
+        self.daemonsampler.note('unconfigured')
+        self.assertEqual(self.daemonsampler.current_step(), '')
+        self.assertEqual(self.daemonsampler.running(), None)
+        self.assertFalse(self.daemonsampler.stop())
+        self.assertRaises(ValueError, self.daemonsampler.start, 'samples.csv')
+        self.daemonsampler.configure(self.tmpdir)
+        pid_file = os.path.join(self.tmpdir, self.daemonsampler.PID_FILENAME)
+        with open(pid_file, 'w') as pidf:
+            pidf.write('%d\n' % os.getpid())
+        self.daemonsampler.note('configured')
+        self.assertEqual(self.daemonsampler.current_step(), 'configured')
+        self.assertEqual(self.daemonsampler.running(), os.getpid())
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         sorted(['proc', self.daemonsampler.PID_FILENAME,
+                                 self.daemonsampler.STEP_FILENAME]))
+
+    def test_read_sample(self):
+        self.write_proc(42)
+        self.assertEqual(self.daemonsampler.read_sample(42, self.proc),
+                         (1000, 4000, 10, 3, 5, 7))
+        self.assertEqual(self.daemonsampler.read_sample(43, self.proc), None)
+
+    def test_find_pid(self):
+        self.write_proc(7, comm='bash')
+        self.write_proc(42)
+        self.assertEqual(self.daemonsampler.find_pid(proc=self.proc), 42)
+        self.assertEqual(self.daemonsampler.find_pid('nope', self.proc), None)
+
+    def test_note(self):
+        # Nothing is written unless a sampler is running
+        self.note('one')
+        self.assertEqual(self.daemonsampler.current_step(self.step_file), '')
+        open(self.pid_file, 'w').close()
+        self.note('two')
+        self.assertEqual(self.daemonsampler.current_step(self.step_file),
+                         'two')
+
+    def test_sample_follows_restart(self):
+        self.write_proc(42)
+        output = io.StringIO()
+        sampler = self.daemonsampler.DaemonSampler(42, output,
+                                                   step_file=self.step_file,
+                                                   proc=self.proc)
+        open(self.pid_file, 'w').close()
+        self.note('run initialize')
+        self.assertEqual(sampler.sample()[1:], ('run initialize',
+                                                1000, 4000, 10, 3, 5, 7))
+        shutil.rmtree(os.path.join(self.proc, '42'))
+        self.assertEqual(sampler.sample(), None)
+        self.write_proc(99, threads=20)
+        self.assertEqual(sampler.sample()[4], 20)
+        self.assertEqual(sampler.pid, 99)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
+
+    def test_step_deltas(self):
+        rows = [dict(time=str(stamp), step=step, rss_kb=str(rss),
+                     vm_kb='0', threads=str(threads), fds='3', utime='0',
+                     stime='0')
+                for stamp, step, rss, threads in ((1, '', 100, 10),
+                                                  (2, 'a run_once', 150, 12),
+                                                  (3, 'a run_once', 200, 15),
+                                                  (4, 'b run_once', 180, 15))]
+        deltas = self.daemonsampler.step_deltas(rows)
+        self.assertEqual([delta['step'] for delta in deltas],
+                         ['', 'a run_once', 'b run_once'])
+        self.assertEqual([delta['samples'] for delta in deltas], [1, 2, 1])
+        self.assertEqual([delta['rss_kb'] for delta in deltas], [0, 100, -20])
+        self.assertEqual([delta['threads'] for delta in deltas], [0, 5, 0])
+        self.assertEqual(deltas[1]['seconds'], '2.000')
+
+    def test_start_stop(self):
+        self.write_proc(42)
+        samples = os.path.join(self.tmpdir, 'samples.csv')
+        deltas = os.path.join(self.tmpdir, 'deltas.csv')
+        # Real /proc is sampled, this process stands in for the daemon
+        pid = self.daemonsampler.start(samples, os.getpid(), 0.01,
+                                       self.pid_file, self.step_file)
+        self.assertEqual(self.daemonsampler.running(self.pid_file), pid)
+        self.note('test step')
+        for _ in range(200):
+            if os.path.isfile(samples):
+                with open(samples) as samples_file:
+                    if 'test step' in samples_file.read():
+                        break
+            self.daemonsampler.time.sleep(0.01)
+        self.assertTrue(self.daemonsampler.stop(5, self.pid_file,
+                                                self.step_file))
+        self.assertFalse(os.path.exists(self.pid_file))
+        self.assertFalse(self.daemonsampler.stop(5, self.pid_file,
+                                                 self.step_file))
+        result = self.daemonsampler.write_step_deltas(samples, deltas)
+        self.assertTrue('test step' in [delta['step'] for delta in result])
+        with open(deltas) as deltas_file:
+            header = next(csv.reader(deltas_file))
+        self.assertEqual(header[:3], ['step', 'samples', 'seconds'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Content-addressed cache of rendered documentation fragments
+
+Rendering each test module's documentation (parsing it's docstring, it's
+ini file and running docutils over the result) only needs repeating when
+one of those inputs changed.  Every fragment is stored as a small JSON
+file named by a hash of the content of everything it was rendered from.
+Fragments missing from the cache are rendered by a pool of processes.
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+
+#: Bumped whenever stored content format changes, older entries are ignored
+FORMAT = 1
+
+
+def content_hash(paths, *extra):
+    """
+    Return hex digest of the contents of files at paths, and extra strings
+
+    :param paths: Iterable of file paths, None or missing files are fine
+    :param extra: Additional strings affecting the result (format, options)
+    """
+    digest = hashlib.sha1(('format %d' % FORMAT).encode('utf-8'))
+    for path in paths:
+        digest.update(b'\0path\0')
+        if path is None:
+            continue
+        try:
+            with open(path, 'rb') as source:
+                digest.update(source.read())
+        except (IOError, OSError):
+            digest.update(b'\0missing\0')
+    for item in extra:
+        digest.update(b'\0extra\0')
+        digest.update(str(item).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class FragmentCache(object):
+
+    """
+    Directory of JSON-able rendered fragments, one file per key
+
+    :param directory: Directory to hold fragments, created on ``put()``
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        """
+        Return path to file holding fragment for key
+        """
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """
+        Return tuple of True and cached fragment for key, or (False, None)
+        """
+        try:
+            with open(self.path(key)) as fragment_file:
+                return True, json.load(fragment_file)
+        except (IOError, OSError, ValueError):
+            return False, None
+
+    def put(self, key, fragment):
+        """
+        Atomically store JSON-able fragment for key, ignoring write errors
+        """
+        path = self.path(key)
+        tmp_path = '%s.%d' % (path, os.getpid())
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(tmp_path, 'w') as fragment_file:
+                json.dump(fragment, fragment_file)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            pass  # Just rendered again next time
+
+
+def render_all(function, jobs, cache=None, processes=None):
+    """
+    Return list of ``function(args)`` for each job, reusing cached results
+
+    :param function: Module-level (picklable) callable returning JSON-able
+                     result from a single args parameter
+    :param jobs: List of tuples of cache key and args for function
+    :param cache: ``FragmentCache`` instance, or None to render all jobs
+    :param processes: Size of process pool, None for number of CPUs
+    """
+    results = [None] * len(jobs)
+    missing = []  # Indexes into jobs
+    for index, (key, _) in enumerate(jobs):
+        found = False
+        if cache is not None:
+            found, results[index] = cache.get(key)
+        if not found:
+            missing.append(index)
+    if not missing:
+        return results
+    missing_args = [jobs[index][1] for index in missing]
+    rendered = None
+    if len(missing) > 1 and processes != 1:
+        try:
+            pool = multiprocessing.Pool(processes)
+        except (OSError, ImportError):  # e.g. no /dev/shm, render serially
+            pool = None
+        if pool is not None:
+            try:
+                rendered = pool.map(function, missing_args)
+            finally:
+                pool.close()
+                pool.join()
+    if rendered is None:
+        rendered = [function(args) for args in missing_args]
+    for index, result in zip(missing, rendered):
+        results[index] = result
+        if cache is not None:
+            cache.put(jobs[index][0], result)
+    return results
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+def render(args):
+    return {'pid': os.getpid(), 'upper': args.upper()}
+
+
+def not_called(args):
+    raise AssertionError("Rendered %s, expected cached" % args)
+
+
+class DocCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import doccache
+        self.doccache = doccache
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.source = os.path.join(self.tmpdir, 'source.py')
+        with open(self.source, 'w') as source:
+            source.write('"""Docstring"""\n')
+        self.cache = doccache.FragmentCache(os.path.join(self.tmpdir,
+                                                         'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_content_hash(self):
+        key = self.doccache.content_hash([self.source, None], 'fmt')
+        self.assertEqual(key, self.doccache.content_hash([self.source, None],
+                                                         'fmt'))
+        self.assertNotEqual(key, self.doccache.content_hash([self.source],
+                                                            'other'))
+        missing = self.doccache.content_hash([self.source + '.missing'])
+        self.assertNotEqual(missing, self.doccache.content_hash([None]))
+        with open(self.source, 'a') as source:
+            source.write('# Changed\n')
+        self.assertNotEqual(key, self.doccache.content_hash([self.source,
+                                                             None], 'fmt'))
+
+    def test_get_put(self):
+        self.assertEqual(self.cache.get('key'), (False, None))
+        self.cache.put('key', None)
+        self.assertEqual(self.cache.get('key'), (True, None))
+        self.cache.put('key', 'fragment')
+        self.assertEqual(self.cache.get('key'), (True, 'fragment'))
+        self.assertEqual(os.listdir(self.cache.directory), ['key.json'])
+
+    def test_unwritable(self):
+        with open(os.path.join(self.tmpdir, 'file'), 'w'):
+            pass
+        cache = self.doccache.FragmentCache(os.path.join(self.tmpdir,
+                                                         'file', 'cache'))
+        cache.put('key', 'fragment')
+        self.assertEqual(cache.get('key'), (False, None))
+
+    def test_render_all(self):
+        jobs = [(name, name) for name in ('a', 'b', 'c')]
+        results = self.doccache.render_all(render, jobs, self.cache,
+                                           processes=2)
+        self.assertEqual([result['upper'] for result in results],
+                         ['A', 'B', 'C'])
+        # Rendered by pool, not this process
+        self.assertFalse(os.getpid() in [result['pid']
+                                         for result in results])
+        self.assertEqual(self.doccache.render_all(not_called, jobs,
+                                                  self.cache), results)
+
+    def test_render_changed(self):
+        self.doccache.render_all(render, [('a', 'a')], self.cache)
+        results = self.doccache.render_all(render, [('a', 'x'), ('b', 'b')],
+                                           self.cache, processes=1)
+        # Only b rendered, in this process
+        self.assertEqual(results[0]['upper'], 'A')
+        self.assertEqual(results[1], {'pid': os.getpid(), 'upper': 'B'})
+
+    def test_no_cache(self):
+        results = self.doccache.render_all(render, [('a', 'a')])
+        self.assertEqual(results, [{'pid': os.getpid(), 'upper': 'A'}])
+        self.assertFalse(os.path.exists(self.cache.directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,12 +6,21 @@ Docker Daemon interface helpers and utilities
 # pylint: disable=W0403
 
 import http.client
+import errno
 import logging
+import os
+import signal
 import socket
+import subprocess
 import json
 import re
+import time
 from autotest.client import utils
 
+#: Environment variable holding root directory of this job's private
+#: daemon instance (see ``DaemonInstance``), inherited by every step
+INSTANCE_ENV = 'DOCKERTEST_DAEMON_INSTANCE'
+
 
 class ClientBase(object):
 
@@ -109,6 +118,216 @@ class SocketClient(ClientBase):
 
         return self.get_json("/version")
 
+class DaemonInstance(object):
+
+    """
+    Private dockerd, isolated by data-root, exec-root, socket and bridge
+
+    Several instances let independent test jobs share one host without
+    seeing (or cleaning up) each other's containers, images or networks.
+    All state is kept under ``root``, including ``instance.json`` from
+    which any step process can ``load()`` the instance again.
+
+    :param index: Number of instance (1..N), selects bridge and subnet
+    :param base_dir: Directory holding the root directory of every instance
+    """
+
+    #: Name of file under root holding instance settings
+    settings_filename = 'instance.json'
+
+    #: Bridge interface name format, given index
+    bridge_fmt = 'dtbr%d'
+
+    #: Bridge IP and subnet (CIDR) format, given index
+    bip_fmt = '172.31.%d.1/24'
+
+    def __init__(self, index, base_dir):
+        self.index = int(index)
+        self.base_dir = base_dir
+        self.root = os.path.join(base_dir, 'dockerd%d' % self.index)
+        self.data_root = os.path.join(self.root, 'data')
+        self.exec_root = os.path.join(self.root, 'exec')
+        self.socket = os.path.join(self.root, 'docker.sock')
+        self.pidfile = os.path.join(self.root, 'docker.pid')
+        self.logfile = os.path.join(self.root, 'dockerd.log')
+        self.bridge = self.bridge_fmt % self.index
+        self.bip = self.bip_fmt % self.index
+        #: Path to dockerd binary, set by ``start()``
+        self.dockerd = 'dockerd'
+        #: Additional dockerd arguments, set by ``start()``
+        self.extra_args = []
+
+    @property
+    def host(self):
+        """
+        Docker client ``-H`` / ``DOCKER_HOST`` value for this instance
+        """
+        return 'unix://%s' % self.socket
+
+    def client_options(self, docker_options=''):
+        """
+        Return docker_options prefixed with ``-H`` for this instance
+        """
+        return ('-H %s %s' % (self.host, docker_options.strip())).strip()
+
+    def environ(self):
+        """
+        Return dict of environment variables selecting this instance
+        """
+        return {INSTANCE_ENV: self.root, 'DOCKER_HOST': self.host}
+
+    def save(self):
+        """
+        Create root directory, store settings for ``load()``
+        """
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        with open(os.path.join(self.root, self.settings_filename),
+                  'w') as settings:
+            json.dump({'index': self.index, 'base_dir': self.base_dir,
+                       'dockerd': self.dockerd,
+                       'extra_args': self.extra_args}, settings)
+
+    @classmethod
+    def load(cls, root):
+        """
+        Return instance from settings stored under root by ``save()``
+
+        :raise IOError: If root holds no instance settings
+        """
+        with open(os.path.join(root, cls.settings_filename)) as settings:
+            content = json.load(settings)
+        instance = cls(content['index'], content['base_dir'])
+        instance.dockerd = content['dockerd']
+        instance.extra_args = content['extra_args']
+        return instance
+
+    def command(self):
+        """
+        Return dockerd argument list for this instance
+        """
+        return ([self.dockerd,
+                 '--data-root', self.data_root,
+                 '--exec-root', self.exec_root,
+                 '--host', self.host,
+                 '--pidfile', self.pidfile,
+                 '--bridge', self.bridge] + list(self.extra_args))
+
+    def pid(self):
+        """
+        Return process ID of running instance, or None
+        """
+        try:
+            with open(self.pidfile) as pidfile:
+                process_id = int(pidfile.read().strip())
+            os.kill(process_id, 0)
+        except (IOError, OSError, ValueError):
+            return None
+        return process_id
+
+    def ready(self):
+        """
+        Return True if instance answers API requests on it's socket
+        """
+        try:
+            return SocketClient(self.socket).get('/_ping').status == 200
+        except (IOError, OSError, http.client.HTTPException):
+            return False
+
+    def setup_bridge(self):
+        """
+        Create and bring up bridge interface, unless it exists
+        """
+        if utils.run('ip link show %s' % self.bridge,
+                     ignore_status=True).exit_status == 0:
+            return
+        utils.run('ip link add name %s type bridge' % self.bridge)
+        utils.run('ip addr add %s dev %s' % (self.bip, self.bridge))
+        utils.run('ip link set %s up' % self.bridge)
+
+    def remove_bridge(self):
+        """
+        Remove bridge interface, if it exists
+        """
+        utils.run('ip link delete %s type bridge' % self.bridge,
+                  ignore_status=True)
+
+    def start(self, dockerd=None, extra_args=None, timeout=60):
+        """
+        Start instance in background, wait until it answers requests
+
+        :param dockerd: Path to dockerd binary, None to keep previous
+        :param extra_args: List of additional dockerd args, None to keep
+        :param timeout: Seconds to wait for instance to become ready
+        :raise RuntimeError: If instance didn't become ready in time
+        """
+        if dockerd is not None:
+            self.dockerd = dockerd
+        if extra_args is not None:
+            self.extra_args = list(extra_args)
+        self.save()
+        self.setup_bridge()
+        # Must outlive the step process which started it
+        with open(os.devnull, 'r') as devnull:
+            with open(self.logfile, 'a') as logfile:
+                daemon = subprocess.Popen(self.command(), close_fds=True,
+                                          stdin=devnull, stdout=logfile,
+                                          stderr=subprocess.STDOUT,
+                                          start_new_session=True)
+        endtime = time.time() + timeout
+        while time.time() < endtime:
+            if daemon.poll() is not None:
+                raise RuntimeError("dockerd instance %d exited %s, see %s"
+                                   % (self.index, daemon.returncode,
+                                      self.logfile))
+            if self.ready():
+                return daemon.pid
+            time.sleep(0.2)
+        raise RuntimeError("dockerd instance %d not ready after %s seconds,"
+                           " see %s" % (self.index, timeout, self.logfile))
+
+    def stop(self, timeout=30, remove_bridge=True):
+        """
+        Stop running instance, return True if it was running
+
+        :param timeout: Seconds to wait before killing instance
+        :param remove_bridge: Also remove instance's bridge interface
+        """
+        process_id = self.pid()
+        if process_id is not None:
+            os.kill(process_id, signal.SIGTERM)
+            endtime = time.time() + timeout
+            while time.time() < endtime and self.pid() == process_id:
+                try:
+                    # Reap if it's our child, otherwise just poll
+                    os.waitpid(process_id, os.WNOHANG)
+                except OSError as xcept:
+                    if xcept.errno != errno.ECHILD:
+                        raise
+                time.sleep(0.2)
+            if self.pid() == process_id:
+                os.kill(process_id, signal.SIGKILL)
+        if remove_bridge:
+            self.remove_bridge()
+        return process_id is not None
+
+    def restart(self, timeout=60):
+        """
+        Stop (keeping bridge) then start instance again
+        """
+        self.stop(remove_bridge=False)
+        return self.start(timeout=timeout)
+
+
+def current_instance():
+    """
+    Return ``DaemonInstance`` this job runs against, or None for system's
+    """
+    root = os.environ.get(INSTANCE_ENV)
+    if not root:
+        return None
+    return DaemonInstance.load(root)
+
 # Group of utils for managing docker daemon service.
 
 
@@ -142,17 +361,26 @@ def systemd_action(action):
 
 
 def stop():
-    """ stop the docker daemon """
+    """ stop the docker daemon (or this job's private instance) """
+    instance = current_instance()
+    if instance is not None:
+        return instance.stop(remove_bridge=False)
     return systemd_action('stop')
 
 
 def start():
-    """ start the docker daemon """
+    """ start the docker daemon (or this job's private instance) """
+    instance = current_instance()
+    if instance is not None:
+        return instance.start()
     return systemd_action('start')
 
 
 def restart():
-    """ restart the docker daemon """
+    """ restart the docker daemon (or this job's private instance) """
+    instance = current_instance()
+    if instance is not None:
+        return instance.restart()
     return systemd_action('restart')
 
 
@@ -171,6 +399,13 @@ def systemd_show(prop):
 
 def pid():
     """ returns the process ID of currently-running docker daemon """
+    instance = current_instance()
+    if instance is not None:
+        process_id = instance.pid()
+        if process_id is None:
+            raise RuntimeError("dockerd instance %d is not running"
+                               % instance.index)
+        return process_id
     mainpid = int(systemd_show('MainPID'))
     cmd = cmdline(mainpid)
     if 'dockerd' in cmd[0]:
@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 
 import json
+import os
+import shutil
+import tempfile
 import unittest2
 import sys
 import types
@@ -196,5 +199,66 @@ class TestSystemdShow(unittest2.TestCase):
         self.assertEqual(docker_daemon.pid(), 12345, 'daemon pid')
 
 
+class TestDaemonInstance(unittest2.TestCase):
+    """
+    Tests for DaemonInstance and instance-aware helpers
+    """
+
+    def setUp(self):
+        from . import docker_daemon
+        self.dd = docker_daemon
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.old_environ = os.environ.copy()
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.old_environ)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_isolation(self):
+        one = self.dd.DaemonInstance(1, self.tmpdir)
+        two = self.dd.DaemonInstance(2, self.tmpdir)
+        for attr in ('root', 'data_root', 'exec_root', 'socket', 'pidfile',
+                     'bridge', 'bip', 'host'):
+            self.assertNotEqual(getattr(one, attr), getattr(two, attr))
+        command = one.command()
+        for value in (one.data_root, one.exec_root, one.host, one.bridge):
+            self.assertTrue(value in command)
+
+    def test_client_options(self):
+        instance = self.dd.DaemonInstance(3, self.tmpdir)
+        self.assertEqual(instance.client_options(),
+                         '-H unix://%s/dockerd3/docker.sock' % self.tmpdir)
+        self.assertTrue(instance.client_options(' --tls ').endswith(
+            'docker.sock --tls'))
+
+    def test_current_instance(self):
+        os.environ.pop(self.dd.INSTANCE_ENV, None)
+        self.assertEqual(self.dd.current_instance(), None)
+        instance = self.dd.DaemonInstance(4, self.tmpdir)
+        instance.extra_args = ['--debug']
+        instance.save()
+        os.environ.update(instance.environ())
+        loaded = self.dd.current_instance()
+        self.assertEqual(loaded.index, 4)
+        self.assertEqual(loaded.root, instance.root)
+        self.assertEqual(loaded.command(), instance.command())
+
+    def test_pid(self):
+        instance = self.dd.DaemonInstance(5, self.tmpdir)
+        instance.save()
+        os.environ.update(instance.environ())
+        self.assertEqual(instance.pid(), None)
+        self.assertRaises(RuntimeError, self.dd.pid)
+        with open(instance.pidfile, 'w') as pidfile:
+            pidfile.write('%d\n' % os.getpid())
+        self.assertEqual(self.dd.pid(), os.getpid())
+
+    def test_stop_not_running(self):
+        instance = self.dd.DaemonInstance(6, self.tmpdir)
+        fakerun_setup(stdout="")                      # for ip link delete
+        self.assertFalse(instance.stop())
+
+
 if __name__ == '__main__':
     unittest2.main()
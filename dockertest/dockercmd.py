@@ -6,8 +6,18 @@ Frequently used docker CLI operations/data
 # Pylint runs from a different directory, it's fine to import this way
 # pylint: disable=W0403
 
+import asyncio
+import codecs
+import os
+import signal
+import subprocess
+import threading
 import time
 from autotest.client import utils
+from . import containerindex
+from . import kernellog
+from .logfollower import ContainerLogFollower
+from .output import OutputGood, OutputScanner
 from .subtestbase import SubBase
 from .xceptions import DockerNotImplementedError
 from .xceptions import DockerExecError, DockerTestError
@@ -281,6 +291,7 @@ class DockerCmd(DockerCmdBase):  # pylint: disable=R0903
             str_stdin = ""
         if self.verbose:
             self.subtest.logdebug("Executing %s%s", str(self), str_stdin)
+        kernellog.note(self.command)
         self.cmdresult = utils.run(self.command, timeout=self.timeout,
                                    stdin=stdin, verbose=False,
                                    ignore_status=True)
@@ -288,6 +299,190 @@ class DockerCmd(DockerCmdBase):  # pylint: disable=R0903
         return self.cmdresult
 
 
+class StreamDockerCmd(DockerCmd):
+
+    """
+    Execute docker command, passing stdout to ``sink`` in fixed-size chunks
+
+    Memory use is constant regardless of output size, only the first
+    ``preview_size`` bytes of stdout are kept in ``cmdresult.stdout``.
+    All of stdout is scanned for ``OutputGood`` checks, pass ``scanners``
+    to it for results covering more than the preview.
+
+    :param sink: None to discard, a file-like object (``write()``), a hash
+                 object (``update()``), a callable accepting each bytes
+                 chunk, or a ``DockerCmd`` instance to pipe stdout into
+                 (executed concurrently, with stdout as it's stdin).
+    :param preview_size: Max bytes of stdout to keep in ``cmdresult.stdout``
+    """
+
+    #: Max number of stdout bytes passed to sink at a time
+    chunk_size = 65536
+
+    #: Total number of stdout bytes passed to sink by last ``execute()``
+    stdout_size = None
+
+    #: Dictionary for ``OutputGood(scanners=)`` after ``execute()``
+    scanners = None
+
+    def __init__(self, subtest, subcmd, subargs=None, timeout=None,
+                 verbose=True, sink=None, preview_size=4096):
+        super(StreamDockerCmd, self).__init__(subtest, subcmd, subargs,
+                                              timeout, verbose)
+        self.sink = sink
+        self.preview_size = preview_size
+
+    def _sink_write(self):
+        """
+        Return callable passing one chunk to sink
+        """
+        if self.sink is None:
+            return lambda chunk: None
+        elif hasattr(self.sink, 'write'):
+            return self.sink.write
+        elif hasattr(self.sink, 'update'):
+            return self.sink.update
+        elif callable(self.sink):
+            return self.sink
+        raise DockerTestError("Unsupported stdout sink: %r" % self.sink)
+
+    @staticmethod
+    def _feed_stdin(stdin, pipe):
+        """
+        Write stdin string to pipe then close it, for use in a thread
+        """
+        try:
+            pipe.write(stdin.encode('utf-8'))
+        finally:
+            pipe.close()
+
+    def _drain(self, pipe, chunks):
+        """
+        Append all chunks read from pipe to chunks, for use in a thread
+        """
+        for chunk in iter(lambda: pipe.read(self.chunk_size), b''):
+            chunks.append(chunk)
+        pipe.close()
+
+    def execute(self, stdin=None):
+        """
+        Run docker command, streaming stdout, ignore any non-zero exit code
+
+        :raises DockerCommandError: If timeout exceeded, or sink stopped
+                                    reading (e.g. a piped command exited)
+        """
+
+        if self.verbose and not self.quiet:
+            self.subtest.logdebug("Executing (streamed) %s", str(self))
+        kernellog.note(self.command)
+        threads = []
+        downstream = None
+        if isinstance(self.sink, DockerCmdBase):
+            readfd, writefd = os.pipe()
+
+            def pipe_to_sink():  # private, no docstring pylint: disable=C0111
+                try:
+                    self.sink.execute(readfd)
+                finally:
+                    # Further writes fail instead of blocking forever
+                    os.close(readfd)
+            downstream = threading.Thread(target=pipe_to_sink)
+            downstream.start()
+            pipeout = os.fdopen(writefd, 'wb')
+            write = pipeout.write
+        else:
+            write = self._sink_write()
+        if isinstance(stdin, str):
+            popen_stdin = subprocess.PIPE
+        else:
+            popen_stdin = stdin
+        start = time.time()
+        # New session, so the entire pipeline can be killed on timeout
+        proc = subprocess.Popen(self.command, shell=True, close_fds=True,
+                                stdin=popen_stdin, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                start_new_session=True)
+        if isinstance(stdin, str):
+            threads.append(threading.Thread(target=self._feed_stdin,
+                                            args=(stdin, proc.stdin)))
+        stderr = []
+        threads.append(threading.Thread(target=self._drain,
+                                        args=(proc.stderr, stderr)))
+        for thread in threads:
+            thread.start()
+        timed_out = []
+
+        def kill():  # private, no docstring pylint: disable=C0111
+            timed_out.append(True)
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass  # exited just now
+        timer = threading.Timer(self.timeout, kill)
+        timer.start()
+        scanner = OutputScanner(OutputGood)
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        preview = []
+        preview_left = self.preview_size
+        self.stdout_size = 0
+        sink_error = None
+        try:
+            for chunk in iter(lambda: os.read(proc.stdout.fileno(),
+                                              self.chunk_size), b''):
+                try:
+                    write(chunk)
+                except BrokenPipeError as xcept:
+                    sink_error = xcept
+                    break  # Closing stdout below stops command too
+                self.stdout_size += len(chunk)
+                scanner.feed(decoder.decode(chunk))
+                if preview_left > 0:
+                    preview.append(chunk[:preview_left])
+                    preview_left -= len(preview[-1])
+        finally:
+            proc.stdout.close()
+            if downstream is not None:
+                try:
+                    pipeout.close()  # Flushes, fd is closed regardless
+                except OSError as xcept:
+                    sink_error = xcept
+                downstream.join()
+            exit_status = proc.wait()
+            timer.cancel()
+            for thread in threads:
+                thread.join()
+        scanner.feed(decoder.decode(b'', True))
+        scanner.close()
+        self.scanners = {'stdout': scanner}
+        self.cmdresult = utils.CmdResult(
+            command=self.command,
+            stdout=b''.join(preview).decode('utf-8', 'replace'),
+            stderr=b''.join(stderr).decode('utf-8', 'replace'),
+            exit_status=exit_status, duration=time.time() - start)
+        if timed_out:
+            # Exception takes care of logging the command
+            raise DockerCommandError("Timed out after %0.2f seconds"
+                                     % (float(self.timeout)),
+                                     self.cmdresult)
+        if sink_error is not None:
+            raise DockerCommandError(self._sink_failure(sink_error),
+                                     self.cmdresult)
+        return self.cmdresult
+
+    def _sink_failure(self, xcept):
+        """
+        Return message describing sink which stopped reading with xcept
+        """
+        if isinstance(self.sink, DockerCmdBase):
+            sink = "Piped command %s" % self.sink.command
+            if self.sink.cmdresult is not None:
+                sink += " (exit status %s)" % self.sink.cmdresult.exit_status
+        else:
+            sink = "Stdout sink %r" % self.sink
+        return ("%s stopped reading after %d bytes: %s"
+                % (sink, self.stdout_size, xcept))
+
+
 class AsyncDockerCmd(DockerCmdBase):
 
     """
@@ -320,6 +515,7 @@ class AsyncDockerCmd(DockerCmdBase):
             str_stdin = ""
         if self.verbose:
             self.subtest.logdebug("Async-execute: %s%s", str(self), str_stdin)
+        kernellog.note(self.command)
         self._async_job = utils.AsyncJob(self.command, verbose=False,
                                          stdin=stdin, close_fds=True)
         return self.cmdresult
@@ -337,21 +533,32 @@ class AsyncDockerCmd(DockerCmdBase):
             timeout = float(self.subtest.config['wait_ready'])
         end_time = time.time() + timeout
         done = False
-        while time.time() <= end_time and not done:
-            done = self.done
-            stdout = self.stdout
-            if 'READY' in stdout:
-                return
-            # Also check docker logs
-            if cid is None:
-                cid = self.container_id
-            if cid is not None:
-                logs = DockerCmd(self.subtest, 'logs', [cid])
-                logs.execute()
-                stdout = logs.stdout
+        follower = None
+        checked = 0  # log lines already checked
+        try:
+            while time.time() <= end_time and not done:
+                done = self.done
+                stdout = self.stdout
                 if 'READY' in stdout:
                     return
-            time.sleep(timestep)
+                # Also check docker logs
+                if cid is None:
+                    cid = self.container_id
+                if cid is not None and follower is None:
+                    follower = ContainerLogFollower(self.subtest, cid)
+                if follower is not None:
+                    n_lines = len(follower)
+                    found = follower.wait_for_line(lambda line:
+                                                   'READY' in line,
+                                                   timestep, checked)
+                    if found is not None:
+                        return
+                    checked = n_lines  # at least these were searched
+                else:
+                    time.sleep(timestep)
+        finally:
+            if follower is not None:
+                follower.stop()
 
         # Never saw READY. Did container exit? If so, help user understand why
         if self.done:
@@ -433,15 +640,11 @@ class AsyncDockerCmd(DockerCmdBase):
         if self.subcmd == 'attach':
             return self.subargs[-1]
 
-        # Non-attach command. Find our PID, iterate over all containers,
-        # get their PID (via inspect). If we find a match, return the CID.
-        pid = self.process_id
-        cids = utils.run('docker ps -q', verbose=False).stdout.splitlines()
-        for cid in cids:
-            c_pid = utils.run('docker inspect --format {{.State.Pid}} ' + cid)
-            if int(c_pid.stdout) == int(pid):
-                return cid
-        return None
+        # Non-attach command. Find container of our PID from it's cgroup,
+        # or the (lazily refreshed) index of all container PIDs.
+        docker = ("%s %s" % (self.docker_command.strip(),
+                             self.docker_options.strip())).strip()
+        return containerindex.index(docker).lookup(self.process_id)
 
     # Override base-class property methods to give up-to-second details
 
@@ -494,3 +697,201 @@ class AsyncDockerCmd(DockerCmdBase):
             # Current elapsed time
             duration = time.time() - self._async_job.start_time
         return float(duration)
+
+
+class DockerCmdEngine(object):
+
+    """
+    Run many docker commands concurrently from one asyncio event loop
+
+    Each command's pipes are read by the event loop, instead of by helper
+    threads, so hundreds of concurrent docker clients are practical.  The
+    commands are ``DockerCmdBase`` instances (their ``command``, ``timeout``
+    and logging settings are used); on completion ``cmdresult`` is set on
+    each, exactly as by ``DockerCmd.execute()``.
+
+    :param max_concurrent: Max number of docker processes running at once
+    """
+
+    #: Max number of bytes read from a pipe at a time
+    chunk_size = 65536
+
+    def __init__(self, max_concurrent=64):
+        self.max_concurrent = int(max_concurrent)
+        if self.max_concurrent < 1:
+            raise DockerTestError("DockerCmdEngine max_concurrent must be "
+                                  "at least 1")
+        self._semaphore = None
+        self._loop = None
+
+    @property
+    def semaphore(self):
+        """
+        Semaphore bounding concurrency, belonging to running event loop
+        """
+        loop = asyncio.get_event_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._loop = loop
+        return self._semaphore
+
+    async def _pump(self, reader, chunks, callback):
+        """
+        Append all chunks from reader to chunks, calling callback per line
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        partial = ''
+        while True:
+            chunk = await reader.read(self.chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if callback is None:
+                continue
+            lines = (partial + decoder.decode(chunk)).split('\n')
+            partial = lines.pop()
+            for line in lines:
+                callback(line)
+        if callback is not None:
+            partial += decoder.decode(b'', True)
+            if partial:
+                callback(partial)
+
+    @staticmethod
+    async def _feed_stdin(stdin, writer):
+        """
+        Write stdin string to writer then close it
+        """
+        try:
+            writer.write(stdin.encode('utf-8'))
+            await writer.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # command exited without reading all input
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _kill(proc):
+        """
+        Kill process group of proc, if it's still running
+        """
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass  # exited just now
+
+    async def run(self, dkrcmd, stdin=None, on_stdout=None, on_stderr=None):
+        """
+        Coroutine running dkrcmd, ignore any non-zero exit code
+
+        :param dkrcmd: ``DockerCmdBase`` instance, not already executing
+        :param stdin: None, a string, or file descriptor/object for stdin
+        :param on_stdout: Optional callable passed each line of stdout
+                          (without newline) as it's output
+        :param on_stderr: Same as on_stdout, but for stderr
+        :raises DockerCommandError: If dkrcmd's timeout is exceeded
+        :return: CmdResult instance, also set as ``dkrcmd.cmdresult``
+        """
+        async with self.semaphore:
+            if dkrcmd.verbose and not dkrcmd.quiet:
+                dkrcmd.subtest.logdebug("Executing (asyncio) %s", str(dkrcmd))
+            kernellog.note(dkrcmd.command)
+            if isinstance(stdin, str):
+                popen_stdin = subprocess.PIPE
+            else:
+                popen_stdin = stdin
+            start = time.time()
+            # New session, so entire pipeline can be killed on timeout
+            proc = await asyncio.create_subprocess_shell(
+                dkrcmd.command, stdin=popen_stdin, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, close_fds=True,
+                start_new_session=True)
+            stdout = []
+            stderr = []
+            tasks = [self._pump(proc.stdout, stdout, on_stdout),
+                     self._pump(proc.stderr, stderr, on_stderr)]
+            if isinstance(stdin, str):
+                tasks.append(self._feed_stdin(stdin, proc.stdin))
+            done = asyncio.gather(proc.wait(), *tasks)
+            timed_out = False
+            try:
+                await asyncio.wait_for(asyncio.shield(done), dkrcmd.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                self._kill(proc)
+                await done
+            except asyncio.CancelledError:
+                self._kill(proc)
+                await done
+                raise
+        dkrcmd.cmdresult = utils.CmdResult(
+            command=dkrcmd.command,
+            stdout=b''.join(stdout).decode('utf-8', 'replace'),
+            stderr=b''.join(stderr).decode('utf-8', 'replace'),
+            exit_status=proc.returncode, duration=time.time() - start)
+        if timed_out:
+            # Exception takes care of logging the command
+            raise DockerCommandError("Timed out after %0.2f seconds"
+                                     % (float(dkrcmd.timeout)),
+                                     dkrcmd.cmdresult)
+        return dkrcmd.cmdresult
+
+    async def stream(self, dkrcmd, stdin=None):
+        """
+        Asynchronous generator running dkrcmd, yielding lines as output
+
+        Yields tuples of ``('stdout'|'stderr', line)``, when finished
+        ``dkrcmd.cmdresult`` holds the full result.
+
+        :param dkrcmd: ``DockerCmdBase`` instance, not already executing
+        :param stdin: None, a string, or file descriptor/object for stdin
+        :raises DockerCommandError: If dkrcmd's timeout is exceeded
+        """
+        lines = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self.run(dkrcmd, stdin,
+                     lambda line: lines.put_nowait(('stdout', line)),
+                     lambda line: lines.put_nowait(('stderr', line))))
+        task.add_done_callback(lambda _: lines.put_nowait(None))
+        try:
+            while True:
+                item = await lines.get()
+                if item is None:
+                    break
+                yield item
+            task.result()  # raise any exception
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def run_all(self, dkrcmds, stdin=None, on_line=None):
+        """
+        Coroutine running all dkrcmds concurrently, see ``execute()``
+        """
+        def callback(dkrcmd, name):  # pylint: disable=C0111
+            if on_line is None:
+                return None
+            return lambda line: on_line(dkrcmd, name, line)
+        results = await asyncio.gather(*[self.run(dkrcmd, stdin,
+                                                  callback(dkrcmd, 'stdout'),
+                                                  callback(dkrcmd, 'stderr'))
+                                         for dkrcmd in dkrcmds],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def execute(self, dkrcmds, stdin=None, on_line=None):
+        """
+        Run all dkrcmds concurrently to completion, from a new event loop
+
+        :param dkrcmds: Iterable of ``DockerCmdBase`` instances
+        :param stdin: None or a string passed to every command's stdin
+        :param on_line: Optional callable passed dkrcmd, ``'stdout'`` or
+                        ``'stderr'``, and each line as it's output
+        :raises DockerCommandError: After all commands finish, if any
+                                    exceeded it's timeout
+        :return: List of CmdResult instances, in same order as dkrcmds
+        """
+        return asyncio.run(self.run_all(list(dkrcmds), stdin, on_line))
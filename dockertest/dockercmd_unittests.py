@@ -9,6 +9,7 @@ import os
 import shutil
 import sys
 import tempfile
+import time
 import types
 import unittest
 
@@ -333,5 +334,135 @@ class AsyncDockerCmd(DockerCmdTestBase):
         self.assertEqual(docker_cmd.process_id, -1)
 
 
+class StreamDockerCmd(DockerCmdTestBase):
+    defaults = {'docker_path': '/bin/sh', 'docker_options': '-c',
+                'docker_timeout': "42.0"}
+    customs = {}
+    config_section = "Foo/Bar/Baz"
+
+    def stream(self, script, sink=None, preview_size=4096):
+        return self.dockercmd.StreamDockerCmd(self.fake_subtest,
+                                              "'%s'" % script,
+                                              sink=sink,
+                                              preview_size=preview_size)
+
+    def test_hash_sink(self):
+        import hashlib
+        md5 = hashlib.md5()
+        docker_cmd = self.stream('head -c 300000 /dev/zero; echo bar >&2',
+                                 md5, 10)
+        cmdresult = docker_cmd.execute()
+        self.assertEqual(cmdresult.exit_status, 0)
+        self.assertEqual(cmdresult.stdout, '\0' * 10)
+        self.assertEqual(cmdresult.stderr, 'bar\n')
+        self.assertEqual(docker_cmd.stdout_size, 300000)
+        self.assertEqual(md5.hexdigest(),
+                         hashlib.md5(b'\0' * 300000).hexdigest())
+
+    def test_file_and_callable_sinks(self):
+        import io
+        sink = io.BytesIO()
+        cmdresult = self.stream('echo foo; exit 3', sink).execute()
+        self.assertEqual(cmdresult.exit_status, 3)
+        self.assertEqual(sink.getvalue(), b'foo\n')
+        chunks = []
+        self.stream('cat', chunks.append).execute('some input')
+        self.assertEqual(b''.join(chunks), b'some input')
+
+    def test_pipe_sink(self):
+        import io
+        sink = io.BytesIO()
+        downstream = self.stream('wc -c', sink)
+        upstream = self.stream('head -c 200000 /dev/zero', downstream, 0)
+        self.assertEqual(upstream.execute().stdout, '')
+        self.assertEqual(downstream.cmdresult.exit_status, 0)
+        self.assertEqual(int(sink.getvalue()), 200000)
+
+    def test_pipe_sink_exits(self):
+        from dockertest.xceptions import DockerCommandError
+        downstream = self.stream('exit 7')
+        upstream = self.stream('head -c 2000000 /dev/zero; echo done >&2',
+                               downstream, 0)
+        try:
+            upstream.execute()
+        except DockerCommandError as xcept:
+            self.assertTrue("exit status 7" in str(xcept))
+        else:
+            self.fail("Sink exiting early did not raise DockerCommandError")
+        # Cleanup happened anyway
+        self.assertNotEqual(upstream.cmdresult, None)
+        self.assertNotEqual(upstream.cmdresult.exit_status, None)
+        self.assertEqual(downstream.cmdresult.exit_status, 7)
+
+    def test_scanners(self):
+        docker_cmd = self.stream('echo ok; head -c 100000 /dev/zero '
+                                 '| tr "\\0" x; echo; echo FATA[0000]',
+                                 preview_size=3)
+        cmdresult = docker_cmd.execute()
+        self.assertTrue(self.output.OutputGood(cmdresult, True))
+        self.assertFalse(self.output.OutputGood(cmdresult, True,
+                                                scanners=docker_cmd.scanners))
+
+    def test_timeout(self):
+        from dockertest.xceptions import DockerCommandError
+        docker_cmd = self.stream('sleep 10')
+        docker_cmd.timeout = 0.1
+        self.assertRaises(DockerCommandError, docker_cmd.execute)
+
+
+class DockerCmdEngine(DockerCmdTestBase):
+    defaults = {'docker_path': '/bin/sh', 'docker_options': '-c',
+                'docker_timeout': "42.0"}
+    customs = {}
+    config_section = "Foo/Bar/Baz"
+
+    def dkrcmd(self, script):
+        return self.dockercmd.DockerCmd(self.fake_subtest, "'%s'" % script)
+
+    def test_execute(self):
+        engine = self.dockercmd.DockerCmdEngine(max_concurrent=50)
+        dkrcmds = [self.dkrcmd('sleep 0.5; echo %d; exit %d' % (idx, idx))
+                   for idx in range(100)]
+        lines = []
+        start = time.time()
+        results = engine.execute(dkrcmds, on_line=lambda dkrcmd, name, line:
+                                 lines.append((dkrcmd, name, line)))
+        # Two batches of 50 in parallel
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual([result.exit_status for result in results],
+                         list(range(100)))
+        self.assertEqual([dkrcmd.cmdresult.stdout for dkrcmd in dkrcmds],
+                         ["%d\n" % idx for idx in range(100)])
+        self.assertEqual(len(lines), 100)
+        self.assertTrue((dkrcmds[7], 'stdout', '7') in lines)
+
+    def test_stdin_and_lines(self):
+        import asyncio
+        engine = self.dockercmd.DockerCmdEngine()
+        dkrcmd = self.dkrcmd('cat; echo err >&2; printf partial')
+
+        async def collect():
+            return [item async for item in engine.stream(dkrcmd, 'a\nb\n')]
+
+        items = asyncio.run(collect())
+        self.assertEqual(sorted(items), [('stderr', 'err'),
+                                         ('stdout', 'a'), ('stdout', 'b'),
+                                         ('stdout', 'partial')])
+        self.assertEqual(dkrcmd.cmdresult.stdout, 'a\nb\npartial')
+        self.assertEqual(dkrcmd.cmdresult.stderr, 'err\n')
+
+    def test_timeout(self):
+        from dockertest.xceptions import DockerCommandError
+        engine = self.dockercmd.DockerCmdEngine()
+        slow = self.dkrcmd('echo started; sleep 10')
+        slow.timeout = 0.2
+        fast = self.dkrcmd('echo fast')
+        start = time.time()
+        self.assertRaises(DockerCommandError, engine.execute, [slow, fast])
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual(slow.cmdresult.stdout, 'started\n')
+        self.assertEqual(fast.cmdresult.stdout, 'fast\n')
+
+
 if __name__ == '__main__':
     unittest.main()
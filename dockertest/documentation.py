@@ -14,6 +14,9 @@ is assumed.
 
 import ast
 import os.path
+from . import catalog
+from . import doccache
+from . import docdeps
 from .docdeps import ConfigINIParser
 from .docdeps import SummaryVisitor
 from .docdeps import DocBase
@@ -132,7 +135,12 @@ class ConfigDoc(DocBase):
         """
         if base_path is None:
             base_path = cls.default_base_path
-        # If this becomes performance bottleneck, implement cls._cache
+        # Ini file defining section is usually the one needed
+        ini_path = catalog.load(base_path).ini(name.strip())
+        if ini_path is not None:
+            inst = cls(ini_path)
+            if name.strip() == inst.docitems.subtest_name:
+                return inst
         for ini_path in cls.ini_filenames(base_path):
             inst = cls(ini_path)
             if name.strip() == inst.docitems.subtest_name:
@@ -238,16 +246,8 @@ class ConfigDoc(DocBase):
         """
         if base_path is None:
             base_path = cls.default_base_path
-        ini_files = []
-        ini_path = os.path.join(os.path.abspath(base_path),
-                                'config_defaults')
-        for dirpath, _, filenames in os.walk(ini_path):
-            for filename in filenames:
-                if filename == 'defaults.ini':
-                    continue  # processed separately
-                if filename.endswith('.ini'):
-                    ini_files.append(os.path.join(dirpath, filename))
-        return tuple(ini_files)
+        # defaults.ini is not included, it's processed separately
+        return catalog.load(base_path).ini_filenames()
 
 
 class SubtestDoc(DocBase):
@@ -369,13 +369,7 @@ class SubtestDoc(DocBase):
         """
         if base_path is None:
             base_path = cls.default_base_path
-        subtests = []
-        subtest_path = os.path.join(os.path.abspath(base_path), cls.tld_name)
-        for dirpath, _, filenames in os.walk(subtest_path):
-            subtest = os.path.basename(dirpath) + '.py'
-            if subtest in filenames:
-                subtests.append(os.path.join(dirpath, subtest))
-        return tuple(subtests)
+        return catalog.load(base_path, (cls.tld_name,)).modules(cls.tld_name)
 
     # Optional, alternate conv methods
 
@@ -445,6 +439,10 @@ class SubtestDocs(DocBase):
     :param exclude: Customized list of subtests to exclude, None for default
     :param SubtestDocClass: Alternate class to use, None for SubtestDoc
     :param contents: True to prefix with RST ``...contents::`` block.
+    :param cache_dir: Directory to cache each rendered subtest in, None
+                      to always render all of them.
+    :param processes: Number of processes rendering subtests, None for
+                      number of CPUs.
     """
 
     #: Class to use for instantiating documentation for each subtest
@@ -464,7 +462,9 @@ class SubtestDocs(DocBase):
     contents = ".. contents::\n   :depth: 1\n   :local:\n\n"
 
     def __init__(self, base_path=None, exclude=None, subtestdocclass=None,
-                 contents=True):
+                 contents=True, cache_dir=None, processes=1):
+        self.cache_dir = cache_dir
+        self.processes = processes
         if not contents:
             self.contents = ''
         if base_path is None:
@@ -493,13 +493,47 @@ class SubtestDocs(DocBase):
         """Dynamically represent ``DocBase.sub_str`` when referenced
 
         Any test names referenced in ``exclude`` will be skipped"""
-        # list of tuples for initializing dictionary
-        lot = []
-        for name, filename in self.names_filenames.items():
+        names = []
+        jobs = []
+        for name, filename in sorted(self.names_filenames.items()):
             if name not in self.exclude:
-                lot.append((name, self.stdc(filename)))
+                names.append(name)
+                jobs.append((self.cache_key(name, filename),
+                             (self.stdc, filename)))
+        if self.cache_dir is None:
+            cache = None
+        else:
+            cache = doccache.FragmentCache(self.cache_dir)
+        rendered = doccache.render_all(render_subtest_doc, jobs, cache,
+                                       self.processes)
         # Excluded names not present in ``fmt`` will be ignored
-        return dict(lot)
+        return dict(list(zip(names, rendered)))
+
+    def cache_key(self, name, filename):
+        """
+        Return key identifying everything rendered output of name depends on
+
+        :param name: Standardized name of test
+        :param filename: Absolute path to test module
+        """
+        config_doc_class = self.stdc.ConfigDocClass
+        if config_doc_class is None:
+            ini_path = None
+        else:
+            base_path = config_doc_class.default_base_path
+            ini_path = catalog.load(base_path).ini(name)
+        defaults_path = os.path.join(DefaultDoc.default_base_path,
+                                     'config_defaults', 'defaults.ini')
+        # Rendering code and formats affect output as much as the sources
+        sources = (filename, ini_path, defaults_path, DefaultDoc.ini_path,
+                   os.path.splitext(__file__)[0] + '.py',
+                   os.path.splitext(docdeps.__file__)[0] + '.py')
+        return doccache.content_hash(
+            sources, self.stdc.__module__, self.stdc.__name__, self.stdc.fmt,
+            self.stdc.NoINIString, getattr(config_doc_class, '__name__', None),
+            ConfigDoc.item_fmt, ConfigDoc.def_item_fmt, ConfigDoc.inherit_fmt,
+            DefaultDoc.item_fmt, ConfigINIParser.undoc_option_doc,
+            docdeps.DocItem.empty_value, SummaryVisitor.exclude_names)
 
     @property
     def names_filenames(self):
@@ -513,6 +547,16 @@ class SubtestDocs(DocBase):
         return dict(lot)
 
 
+def render_subtest_doc(args):
+    """
+    Return rendered documentation of one test module (for process pools)
+
+    :param args: Tuple of ``SubtestDoc`` (sub)class and path to test module
+    """
+    subtestdocclass, subtest_path = args
+    return str(subtestdocclass(subtest_path))
+
+
 def set_default_base_path(base_path):
     """Modify all relevant classes ``default_base_path`` to base_path"""
     # Order is significant!
@@ -7,17 +7,30 @@ Low-level/standalone host-environment handling/checking utilities/classes/data
        in autotest!
 """
 
+import importlib
 import warnings
 import subprocess
-# N/B: This module is automaticly generated from libselinux, so the
-# python docs are terrible.  The C library man(3) pages provided by
-# the 'libselinux-devel' RPM package (or equivilent) are much better.
-try:
-    import selinux
-except ModuleNotFoundError:
-    pass
 from dockertest.docker_daemon import which_docker
 
+# Private cache of selinux module, False until import attempted
+_selinux = False
+
+
+def selinux_module():
+    """
+    Return ``selinux`` module, importing it on first use, or None if missing
+    """
+    global _selinux  # pylint: disable=W0603
+    if _selinux is False:
+        # N/B: This module is automaticly generated from libselinux, so the
+        # python docs are terrible.  The C library man(3) pages provided by
+        # the 'libselinux-devel' RPM package (or equivilent) are much better.
+        try:
+            _selinux = importlib.import_module('selinux')
+        except ImportError:
+            _selinux = None
+    return _selinux
+
 
 def set_selinux_context(path=None, context=None, recursive=True, pwd=None):
     """
@@ -66,7 +79,11 @@ def get_selinux_context(path):
     :return: SELinux context as a string
     :raises IOError: As per usual.  Documented here as it's
     a behavior difference from ``set_selinux_context()``.
+    :raises NameError: If the selinux module isn't installed
     """
+    selinux = selinux_module()
+    if selinux is None:
+        raise NameError("selinux module not available")
     # First list item is null-terminated string length
     return selinux.getfilecon(path)[1]
 
@@ -78,14 +95,14 @@ def selinux_is_enforcing():
     :raise ValueError: If there was an error from libselinux
     :rtype: bool
     """
-    try:
-        mode = selinux.security_getenforce()
-        if mode not in [selinux.ENFORCING, selinux.PERMISSIVE]:
-            raise ValueError("Unexpected value from"
-                             " security_getenforce(): %s" % mode)
-        return mode == selinux.ENFORCING
-    except NameError:
+    selinux = selinux_module()
+    if selinux is None:
         return None
+    mode = selinux.security_getenforce()
+    if mode not in [selinux.ENFORCING, selinux.PERMISSIVE]:
+        raise ValueError("Unexpected value from"
+                         " security_getenforce(): %s" % mode)
+    return mode == selinux.ENFORCING
 
 
 def docker_rpm():
@@ -0,0 +1,97 @@
+"""
+Local stand-in for the ``bugzilla`` python module, for testing the framework
+
+Implements just the interface the control file's exclusion filter uses:
+``Bugzilla(url=...)``, ``login()``, ``build_query()``, ``query()`` and
+``Fault``.  Bugs are read from a JSON file (a list of objects, each with a
+``bug_id`` and any other fields), named by the ``url``.  Select it through
+``control.ini``, for example::
+
+    [Bugzilla]
+    module = dockertest.fake_bugzilla
+    url = /path/to/bugs.json
+
+A ``url`` of a missing file raises ``Fault``, like an unreachable server.
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!
+"""
+
+import json
+
+
+class Fault(Exception):
+
+    """
+    Raised for any query failure, like ``xmlrpc.client.Fault``
+    """
+
+
+class Bug(object):
+
+    """
+    One bug, with every field of it's JSON object as an attribute
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        return "<Bug #%s>" % getattr(self, 'bug_id', None)
+
+
+class Bugzilla(object):
+
+    """
+    Stand-in for ``bugzilla.Bugzilla``, serving bugs from a JSON file
+
+    :param url: Path to JSON file of bugs
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.user = None
+        #: Number of queries made, so tests can check batching/caching
+        self.queries = 0
+
+    def login(self, user, password):
+        """
+        Accept any credentials
+        """
+        del password  # Not checked
+        self.user = user
+
+    @staticmethod
+    def build_query(**query):
+        """
+        Return query dictionary, as given
+        """
+        return dict(query)
+
+    @staticmethod
+    def matches(bug, field, wanted):
+        """
+        Return True if bug's field matches wanted value, or any in a list
+
+        Strings match as substrings, like bugzilla's whiteboard searches.
+        """
+        if not isinstance(wanted, list):
+            wanted = [wanted]
+        value = str(getattr(bug, field, ''))
+        return any(str(item) in value for item in wanted)
+
+    def query(self, query):
+        """
+        Return list of ``Bug`` matching every field of query
+
+        :raise Fault: If JSON file can't be read
+        """
+        self.queries += 1
+        try:
+            with open(self.url) as bugs_file:
+                bugs = [Bug(**fields) for fields in json.load(bugs_file)]
+        except (IOError, OSError, ValueError) as xcept:
+            raise Fault("Can't read bugs from %s: %s" % (self.url, xcept))
+        return [bug for bug in bugs
+                if all(self.matches(bug, field, wanted)
+                       for field, wanted in query.items())]
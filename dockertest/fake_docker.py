@@ -0,0 +1,942 @@
+#!/usr/bin/env python
+
+"""
+Deterministic stand-in for the docker CLI and daemon, for testing the framework
+
+Provides a fake ``docker`` executable and a unix-socket fake daemon, both
+serving a synthetic, in-memory set of containers, images and events of
+configurable size.  Only the handful of subcommands the framework itself
+depends upon are implemented: ``ps``, ``images``, ``inspect``, ``events``,
+``run`` (detached only), ``rename``, ``rm``, ``rmi``, ``version`` and
+``info``.  Output formats mimic
+docker-1.12+ closely enough for the ``dockertest`` parsers.
+
+Select it through configuration, for example::
+
+    docker_path = /path/to/dockertest/fake_docker.py --fake-containers=5000
+    docker_options = --fake-images=2000
+
+Global options are accepted anywhere before the subcommand.  Since
+``DockerContainers`` and ``DockerImages`` only use ``docker_path``, options
+meant to affect them must be placed there.
+
+Without a daemon, every invocation re-generates identical state from the
+seed, so ``run``/``rm``/etc. report success but changes do not persist.  For
+stateful operation, start a daemon and point the client at it::
+
+    fake_docker.py --fake-containers=5000 daemon /tmp/fake_docker.sock &
+
+    docker_options = -H unix:///tmp/fake_docker.sock
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!  It is executed directly as ``docker_path``.
+"""
+
+import datetime
+import http.client
+import http.server
+import json
+import os
+import random
+import re
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import urllib.parse
+
+#: Fixed point in time all synthetic timestamps are relative to
+FAKE_NOW = 1500000000
+
+#: Version string reported for both client and server
+FAKE_VERSION = '1.12.6'
+
+#: API version string reported for both client and server
+FAKE_API_VERSION = '1.24'
+
+
+def human_duration(seconds):
+    """
+    Return docker-style human-readable duration, e.g. ``3 hours``
+
+    :param seconds: Non-negative number of seconds
+    """
+    seconds = int(seconds)
+    for divisor, unit in ((60 * 60 * 24 * 7, 'week'), (60 * 60 * 24, 'day'),
+                          (60 * 60, 'hour'), (60, 'minute')):
+        if seconds >= divisor * 2:
+            return "%d %ss" % (seconds // divisor, unit)
+        if seconds >= divisor:
+            return "About a%s %s" % ('n' if unit == 'hour' else '', unit)
+    return "%d seconds" % seconds
+
+
+def iso_time(epoch):
+    """
+    Return RFC3339-nano formatted UTC timestamp for epoch seconds
+    """
+    stamp = datetime.datetime.utcfromtimestamp(int(epoch))
+    nanos = int(round((epoch - int(epoch)) * 1000000000))
+    return "%s.%09dZ" % (stamp.strftime('%Y-%m-%dT%H:%M:%S'), nanos)
+
+
+class FakeState(object):
+
+    """
+    Synthetic, deterministic inventory of containers, images and events
+
+    :param containers: Number of containers to generate
+    :param images: Number of images to generate
+    :param events: Number of events to generate
+    :param seed: Random seed, same value always generates same state
+    """
+
+    #: Every N-th image is untagged (``<none>:<none>``)
+    none_every = 10
+
+    #: Every N-th container is running, the rest have exited
+    running_every = 3
+
+    def __init__(self, containers=0, images=0, events=0, seed=0):
+        self.lock = threading.Lock()
+        self.rng = rng = random.Random(seed)
+        self.images = []
+        for index in range(int(images)):
+            if (index + 1) % self.none_every:
+                repotags = ['fake/repo%04d:tag%d' % (index, index % 7)]
+            else:
+                repotags = ['<none>:<none>']
+            self.images.append({
+                'Id': 'sha256:%064x' % rng.getrandbits(256),
+                'RepoTags': repotags,
+                'Created': FAKE_NOW - rng.randint(3600, 3600 * 24 * 365),
+                'Size': rng.randint(1, 1000) * 1000 * 1000})
+        tagged = [img for img in self.images
+                  if img['RepoTags'][0] != '<none>:<none>']
+        self.containers = []
+        for index in range(int(containers)):
+            if tagged:
+                image = tagged[index % len(tagged)]
+                image_name = image['RepoTags'][0]
+                image_id = image['Id']
+            else:
+                image_name = 'fake/image:latest'
+                image_id = 'sha256:%064x' % 0
+            running = not index % self.running_every
+            self.containers.append({
+                'Id': '%064x' % rng.getrandbits(256),
+                'Name': 'fake_%06d' % index,
+                'Image': image_name,
+                'ImageID': image_id,
+                'Cmd': ['/bin/bash', '-c', 'sleep %d' % (index + 1)],
+                'Created': FAKE_NOW - rng.randint(60, 3600 * 24 * 30),
+                'Running': running,
+                'Pid': 10000 + index if running else 0,
+                'ExitCode': 0 if running else index % 3,
+                'IPAddress': ('172.17.%d.%d' % (index // 250, index % 250 + 2)
+                              if running else ''),
+                'SizeRw': rng.randint(0, 1000) * 1000})
+        self.events = []
+        actions = ('create', 'start', 'die', 'destroy')
+        for index in range(int(events)):
+            if self.containers:
+                cntr = self.containers[(index // len(actions)) %
+                                       len(self.containers)]
+                actor = cntr['Id']
+                attributes = {'image': cntr['Image'], 'name': cntr['Name']}
+            else:
+                actor = '%064x' % index
+                attributes = {'image': 'fake/image:latest',
+                              'name': 'fake_%06d' % index}
+            self.events.append({'Type': 'container',
+                                'Action': actions[index % len(actions)],
+                                'Actor': {'ID': actor,
+                                          'Attributes': attributes},
+                                'timeNano': (FAKE_NOW * 1000000000 +
+                                             index * 1000)})
+        self.reindex()
+
+    def reindex(self):
+        """
+        Rebuild lookup tables, must be called after any mutation
+        """
+        self._cntr_by_key = {}
+        for cntr in self.containers:
+            self._cntr_by_key[cntr['Id']] = cntr
+            self._cntr_by_key[cntr['Name']] = cntr
+        self._img_by_key = {}
+        for img in self.images:
+            self._img_by_key[img['Id']] = img
+            self._img_by_key[img['Id'][7:]] = img  # without sha256:
+            for repotag in img['RepoTags']:
+                if repotag != '<none>:<none>':
+                    self._img_by_key[repotag] = img
+
+    def find_container(self, key):
+        """
+        Return container record by name, long or unique-prefix ID, or None
+        """
+        key = key.lstrip('/')
+        found = self._cntr_by_key.get(key)
+        if found is not None or len(key) < 4:
+            return found
+        matches = [cntr for cntr in self.containers
+                   if cntr['Id'].startswith(key)]
+        if len(matches) == 1:
+            return matches[0]
+        return None
+
+    def find_image(self, key):
+        """
+        Return image record by name[:tag], long or unique-prefix ID, or None
+        """
+        found = self._img_by_key.get(key)
+        if found is None and ':' not in key.split('/')[-1]:
+            found = self._img_by_key.get(key + ':latest')
+        if found is not None or len(key) < 4:
+            return found
+        if key.startswith('sha256:'):
+            key = key[7:]
+        matches = [img for img in self.images
+                   if img['Id'][7:].startswith(key)]
+        if len(matches) == 1:
+            return matches[0]
+        return None
+
+    @staticmethod
+    def container_summary(cntr, size=False):
+        """
+        Return API ``/containers/json`` representation of record
+        """
+        if cntr['Running']:
+            status = 'Up %s' % human_duration(FAKE_NOW - cntr['Created'])
+            state = 'running'
+        else:
+            status = ('Exited (%d) %s ago'
+                      % (cntr['ExitCode'],
+                         human_duration(FAKE_NOW - cntr['Created'])))
+            state = 'exited'
+        summary = {'Id': cntr['Id'],
+                   'Names': ['/' + cntr['Name']],
+                   'Image': cntr['Image'],
+                   'ImageID': cntr['ImageID'],
+                   'Command': ' '.join(cntr['Cmd']),
+                   'Created': cntr['Created'],
+                   'Ports': [],
+                   'State': state,
+                   'Status': status}
+        if size:
+            summary['SizeRw'] = cntr['SizeRw']
+        return summary
+
+    @staticmethod
+    def container_inspect(cntr):
+        """
+        Return API ``/containers/<id>/json`` representation of record
+        """
+        return {'Id': cntr['Id'],
+                'Created': iso_time(cntr['Created']),
+                'Path': cntr['Cmd'][0],
+                'Args': cntr['Cmd'][1:],
+                'State': {'Status': ('running' if cntr['Running']
+                                     else 'exited'),
+                          'Running': cntr['Running'],
+                          'Paused': False,
+                          'Restarting': False,
+                          'Pid': cntr['Pid'],
+                          'ExitCode': cntr['ExitCode']},
+                'Image': cntr['ImageID'],
+                'Name': '/' + cntr['Name'],
+                'Config': {'Image': cntr['Image'],
+                           'Cmd': cntr['Cmd']},
+                'NetworkSettings': {'IPAddress': cntr['IPAddress']}}
+
+    @staticmethod
+    def image_summary(img):
+        """
+        Return API ``/images/json`` representation of record
+        """
+        return {'Id': img['Id'],
+                'RepoTags': img['RepoTags'],
+                'Created': img['Created'],
+                'Size': img['Size']}
+
+    @staticmethod
+    def image_inspect(img):
+        """
+        Return API ``/images/<name>/json`` representation of record
+        """
+        return {'Id': img['Id'],
+                'RepoTags': img['RepoTags'],
+                'Created': iso_time(img['Created']),
+                'Size': img['Size'],
+                'VirtualSize': img['Size']}
+
+    def version(self):
+        """
+        Return API ``/version`` representation
+        """
+        return {'Version': FAKE_VERSION, 'ApiVersion': FAKE_API_VERSION,
+                'GoVersion': 'go1.7.4', 'GitCommit': 'fake',
+                'Os': 'linux', 'Arch': 'amd64'}
+
+    def info(self):
+        """
+        Return API ``/info`` representation
+        """
+        running = len([cntr for cntr in self.containers if cntr['Running']])
+        return {'Containers': len(self.containers),
+                'ContainersRunning': running,
+                'ContainersPaused': 0,
+                'ContainersStopped': len(self.containers) - running,
+                'Images': len(self.images),
+                'ServerVersion': FAKE_VERSION,
+                'Driver': 'fake',
+                'CgroupDriver': 'systemd',
+                'KernelVersion': '3.10.0',
+                'OperatingSystem': 'Fake Linux',
+                'NCPU': 1,
+                'DockerRootDir': '/var/lib/docker'}
+
+    # Deliberately mirrors a tiny subset of the docker remote API, so the
+    # same dispatcher serves both the daemon and in-process CLI invocations.
+    def handle(self, method, path):
+        """
+        Dispatch an API request, return tuple of HTTP status and JSON payload
+
+        :param method: HTTP method, ``GET``, ``POST`` or ``DELETE``
+        :param path: Request path including any query string
+        """
+        parsed = urllib.parse.urlparse(path)
+        query = urllib.parse.parse_qs(parsed.query)
+        flag = lambda name: query.get(name, ['0'])[0] in ('1', 'true')
+        parts = [urllib.parse.unquote(part)
+                 for part in parsed.path.strip('/').split('/')]
+        with self.lock:
+            if method == 'GET' and parts == ['version']:
+                return 200, self.version()
+            if method == 'GET' and parts == ['info']:
+                return 200, self.info()
+            if method == 'GET' and parts == ['events']:
+                return 200, list(self.events)
+            if method == 'POST' and parts == ['containers', 'create']:
+                return self._create_container(query)
+            if parts[0] == 'containers':
+                return self._handle_containers(method, parts[1:], flag,
+                                               query)
+            if parts[0] == 'images':
+                return self._handle_images(method, parts[1:], flag)
+        return 404, {'message': 'page not found'}
+
+    # private methods don't need docstrings
+    def _create_container(self, query):  # pylint: disable=C0111
+        name = query.get('name', [None])[0]
+        if name is None:
+            name = 'fake_%06d' % len(self.containers)
+        if name in self._cntr_by_key:
+            return 409, {'message': 'Conflict. The name "/%s" is already '
+                                    'in use by container %s'
+                                    % (name, self._cntr_by_key[name]['Id'])}
+        image_name = query.get('image', [''])[0]
+        img = self.find_image(image_name)
+        if img is None:
+            return 404, {'message': 'No such image: %s' % image_name}
+        cntr = {'Id': '%064x' % self.rng.getrandbits(256),
+                'Name': name,
+                'Image': image_name,
+                'ImageID': img['Id'],
+                'Cmd': json.loads(query.get('cmd', ['[]'])[0]),
+                'Created': FAKE_NOW,
+                'Running': False,
+                'Pid': 0,
+                'ExitCode': 0,
+                'IPAddress': '',
+                'SizeRw': 0}
+        self.containers.append(cntr)
+        self.reindex()
+        return 201, {'Id': cntr['Id']}
+
+    # private methods don't need docstrings
+    def _handle_containers(self, method, parts, flag,  # pylint: disable=C0111
+                           query):
+        if method == 'GET' and parts == ['json']:
+            return 200, [self.container_summary(cntr, flag('size'))
+                         for cntr in self.containers
+                         if flag('all') or cntr['Running']]
+        cntr = self.find_container(parts[0]) if parts else None
+        if cntr is None:
+            return 404, {'message': 'No such container: %s'
+                                    % '/'.join(parts[:1])}
+        if method == 'GET' and parts[1:] == ['json']:
+            return 200, self.container_inspect(cntr)
+        if method == 'POST' and parts[1:] == ['start']:
+            index = self.containers.index(cntr)
+            cntr.update({'Running': True, 'Pid': 10000 + index,
+                         'IPAddress': '172.17.%d.%d' % (index // 250,
+                                                        index % 250 + 2)})
+            return 204, None
+        if method == 'POST' and parts[1:] == ['rename']:
+            name = query.get('name', [''])[0]
+            if name in self._cntr_by_key:
+                return 409, {'message': 'Conflict. The name "/%s" is '
+                                        'already in use' % name}
+            cntr['Name'] = name
+            self.reindex()
+            return 204, None
+        if method == 'DELETE' and len(parts) == 1:
+            if cntr['Running'] and not flag('force'):
+                return 409, {'message': 'You cannot remove a running '
+                                        'container %s. Stop the container '
+                                        'before attempting removal or use '
+                                        '-f' % cntr['Id']}
+            self.containers.remove(cntr)
+            self.reindex()
+            return 204, None
+        return 404, {'message': 'page not found'}
+
+    # private methods don't need docstrings
+    def _handle_images(self, method, parts, flag):  # pylint: disable=C0111
+        if method == 'GET' and parts == ['json']:
+            return 200, [self.image_summary(img) for img in self.images]
+        key = '/'.join(parts)
+        if method == 'GET' and parts[-1:] == ['json']:
+            key = '/'.join(parts[:-1])
+        img = self.find_image(key) if key else None
+        if img is None:
+            return 404, {'message': 'No such image: %s' % key}
+        if method == 'GET':
+            return 200, self.image_inspect(img)
+        if method == 'DELETE':
+            users = [cntr['Id'] for cntr in self.containers
+                     if cntr['ImageID'] == img['Id']]
+            if users and not flag('force'):
+                return 409, {'message': 'conflict: unable to remove '
+                                        'repository reference "%s" - '
+                                        'container %s is using its '
+                                        'referenced image %s'
+                                        % (key, users[0][:12],
+                                           img['Id'][7:19])}
+            self.images.remove(img)
+            self.reindex()
+            deleted = [{'Untagged': repotag} for repotag in img['RepoTags']
+                       if repotag != '<none>:<none>']
+            return 200, deleted + [{'Deleted': img['Id']}]
+        return 404, {'message': 'page not found'}
+
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    """
+    Serve a FakeState over HTTP on a unix-domain socket
+
+    :param socket_path: Path to (non-existing) unix socket to create
+    :param state: FakeState instance to serve
+    """
+
+    daemon_threads = True
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        """
+        Adapt HTTP requests onto ``FakeState.handle()``
+        """
+
+        # Unix sockets have no client address, avoid formatting errors
+        def address_string(self):
+            return 'unix'
+
+        def log_message(self, *args):  # pylint: disable=W0221
+            pass  # Quiet, thousands of these are expected
+
+        def _respond(self, method):
+            status, payload = self.server.state.handle(method, self.path)
+            if isinstance(payload, list) and self.path.startswith('/events'):
+                # Events are streamed, one JSON document per line
+                body = ''.join(json.dumps(item) + '\n' for item in payload)
+            elif payload is None:
+                body = ''
+            else:
+                body = json.dumps(payload)
+            body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):  # pylint: disable=C0103
+            self._respond('GET')
+
+        def do_DELETE(self):  # pylint: disable=C0103
+            self._respond('DELETE')
+
+        def do_POST(self):  # pylint: disable=C0103
+            self._respond('POST')
+
+    def __init__(self, socket_path, state):
+        self.socket_path = socket_path
+        self.state = state
+        self._thread = None
+        socketserver.UnixStreamServer.__init__(self, socket_path,
+                                               self.Handler)
+
+    def start(self):
+        """
+        Serve requests from a background thread, return immediately
+        """
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop serving and remove the socket
+        """
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+class SocketBackend(object):
+
+    """
+    Client-side equivalent of ``FakeState.handle()`` talking to a FakeDaemon
+
+    :param socket_path: Path to the daemon's unix socket
+    """
+
+    class UHTTPConnection(http.client.HTTPConnection):
+
+        """
+        HTTPConnection over a unix-domain socket
+        """
+
+        def __init__(self, path):
+            http.client.HTTPConnection.__init__(self, 'localhost')
+            self.path = path
+
+        def connect(self):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            self.sock = sock
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+
+    def handle(self, method, path):
+        """
+        Same interface as ``FakeState.handle()``
+        """
+        connection = self.UHTTPConnection(self.socket_path)
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            body = response.read().decode('utf-8')
+        finally:
+            connection.close()
+        if path.startswith('/events') and response.status == 200:
+            return response.status, [json.loads(line)
+                                     for line in body.splitlines() if line]
+        if not body:
+            return response.status, None
+        return response.status, json.loads(body)
+
+
+def render_format(template, obj):
+    """
+    Render the ``{{.Field.Sub}}`` / ``{{json .Field}}`` subset of go templates
+
+    :param template: Template string as passed to ``--format``
+    :param obj: JSON-like object to take values from
+    """
+    def _lookup(match):
+        value = obj
+        for name in match.group(2).split('.'):
+            if not name:
+                continue
+            if not isinstance(value, dict) or name not in value:
+                return '<no value>'
+            value = value[name]
+        if match.group(1):
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return str(value).lower()
+        if value is None:
+            return '<nil>'
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        return str(value)
+    return re.sub(r'{{\s*(json\s+)?\.([\w\.]*)\s*}}', _lookup, template)
+
+
+def format_table(header, rows):
+    """
+    Return docker-style text table, columns separated by at least 3 spaces
+    """
+    widths = [len(col) for col in header]
+    for row in rows:
+        widths = [max(width, len(cell)) for width, cell in zip(widths, row)]
+    lines = []
+    for row in [header] + rows:
+        cells = [cell.ljust(width + 3)
+                 for width, cell in zip(widths, row)]
+        lines.append(''.join(cells).rstrip())
+    return '\n'.join(lines) + '\n'
+
+
+def _option(args, short, long_name, takes_value=False):
+    """
+    Remove ``short``/``long_name`` option from args, return value or bool
+    """
+    result = None
+    for arg in list(args):
+        names = [name for name in (short, long_name) if name]
+        for name in names:
+            if arg == name:
+                index = args.index(arg)
+                del args[index]
+                if takes_value:
+                    result = args.pop(index)
+                else:
+                    result = True
+            elif arg.startswith(name + '='):
+                args.remove(arg)
+                value = arg[len(name) + 1:]
+                if takes_value:
+                    result = value
+                else:
+                    result = value.lower() in ('1', 'true')
+    if result is None and not takes_value:
+        return False
+    return result
+
+
+def _error(stderr, payload):
+    """
+    Write docker-style daemon error message, return CLI exit code
+    """
+    stderr.write("Error response from daemon: %s\n" % payload['message'])
+    return 1
+
+
+def cmd_ps(backend, args, stdout, stderr):
+    """Implement ``docker ps``"""
+    path = '/containers/json?all=%d&size=%d' % (
+        int(_option(args, '-a', '--all')), int(_option(args, '-s', '--size')))
+    quiet = _option(args, '-q', '--quiet')
+    no_trunc = _option(args, None, '--no-trunc')
+    status, summaries = backend.handle('GET', path)
+    if status != 200:
+        return _error(stderr, summaries)
+    if quiet:
+        for summ in summaries:
+            stdout.write("%s\n" % (summ['Id'] if no_trunc
+                                   else summ['Id'][:12]))
+        return 0
+    header = ['CONTAINER ID', 'IMAGE', 'COMMAND', 'CREATED', 'STATUS',
+              'PORTS', 'NAMES']
+    size = 'size=1' in path
+    if size:
+        header.append('SIZE')
+    rows = []
+    for summ in summaries:
+        command = summ['Command']
+        if not no_trunc and len(command) > 20:
+            command = command[:17] + '...'
+        row = [summ['Id'] if no_trunc else summ['Id'][:12],
+               summ['Image'], '"%s"' % command,
+               '%s ago' % human_duration(FAKE_NOW - summ['Created']),
+               summ['Status'], '', summ['Names'][0].lstrip('/')]
+        if size:
+            row.append('%d B' % summ['SizeRw'])
+        rows.append(row)
+    stdout.write(format_table(header, rows))
+    return 0
+
+
+def cmd_images(backend, args, stdout, stderr):
+    """Implement ``docker images``"""
+    _option(args, '-a', '--all')
+    quiet = _option(args, '-q', '--quiet')
+    no_trunc = _option(args, None, '--no-trunc')
+    status, images = backend.handle('GET', '/images/json')
+    if status != 200:
+        return _error(stderr, images)
+    rows = []
+    for img in images:
+        image_id = img['Id'] if no_trunc else img['Id'][7:19]
+        if quiet:
+            stdout.write("%s\n" % image_id)
+            continue
+        for repotag in img['RepoTags']:
+            repo, tag = repotag.rsplit(':', 1)
+            created = '%s ago' % human_duration(FAKE_NOW - img['Created'])
+            rows.append([repo, tag, image_id, created,
+                         '%.1f MB' % (img['Size'] / 1000.0 / 1000.0)])
+    if not quiet:
+        stdout.write(format_table(['REPOSITORY', 'TAG', 'IMAGE ID',
+                                   'CREATED', 'SIZE'], rows))
+    return 0
+
+
+def cmd_inspect(backend, args, stdout, stderr):
+    """Implement ``docker inspect``"""
+    template = _option(args, '-f', '--format', takes_value=True)
+    kind = _option(args, None, '--type', takes_value=True)
+    _option(args, '-s', '--size')
+    results = []
+    exit_status = 0
+    for key in args:
+        status, found = 404, None
+        if kind in (None, 'container'):
+            status, found = backend.handle(
+                'GET', '/containers/%s/json' % urllib.parse.quote(key, ''))
+        if status != 200 and kind in (None, 'image'):
+            status, found = backend.handle(
+                'GET', '/images/%s/json' % urllib.parse.quote(key, ''))
+        if status != 200:
+            stderr.write("Error: No such object: %s\n" % key)
+            exit_status = 1
+            continue
+        results.append(found)
+    if template is not None:
+        for found in results:
+            stdout.write("%s\n" % render_format(template, found))
+    else:
+        stdout.write("%s\n" % json.dumps(results, indent=4))
+    return exit_status
+
+
+def cmd_events(backend, args, stdout, stderr):
+    """Implement ``docker events``, always returns after the last event"""
+    _option(args, None, '--since', takes_value=True)
+    _option(args, None, '--until', takes_value=True)
+    _option(args, '-f', '--filter', takes_value=True)
+    status, events = backend.handle('GET', '/events')
+    if status != 200:
+        return _error(stderr, events)
+    for event in events:
+        attrs = ', '.join('%s=%s' % item
+                          for item in sorted(event['Actor']['Attributes']
+                                             .items()))
+        stamp = iso_time(event['timeNano'] // 1000000000)
+        stamp = stamp[:20] + '%09dZ' % (event['timeNano'] % 1000000000)
+        stdout.write("%s %s %s %s (%s)\n" % (stamp, event['Type'],
+                                             event['Action'],
+                                             event['Actor']['ID'], attrs))
+    return 0
+
+
+def cmd_rm(backend, args, stdout, stderr):
+    """Implement ``docker rm``"""
+    force = _option(args, '-f', '--force')
+    _option(args, '-v', '--volumes')
+    exit_status = 0
+    for key in args:
+        status, payload = backend.handle(
+            'DELETE', '/containers/%s?force=%d'
+            % (urllib.parse.quote(key, ''), int(force)))
+        if status >= 300:
+            exit_status = _error(stderr, payload)
+        else:
+            stdout.write("%s\n" % key)
+    return exit_status
+
+
+def cmd_run(backend, args, stdout, stderr):
+    """Implement detached ``docker run``, other options are ignored"""
+    if not _option(args, '-d', '--detach'):
+        stderr.write("Only detached (-d) run is supported\n")
+        return 125
+    name = _option(args, None, '--name', takes_value=True)
+    while args and args[0].startswith('-'):
+        args.pop(0)
+    if not args:
+        stderr.write('"docker run" requires at least 1 argument(s).\n')
+        return 125
+    query = {'image': args[0], 'cmd': json.dumps(args[1:])}
+    if name is not None:
+        query['name'] = name
+    status, created = backend.handle('POST', '/containers/create?%s'
+                                     % urllib.parse.urlencode(query))
+    if status >= 300:
+        return _error(stderr, created)
+    status, payload = backend.handle('POST', '/containers/%s/start'
+                                     % created['Id'])
+    if status >= 300:
+        return _error(stderr, payload)
+    stdout.write("%s\n" % created['Id'])
+    return 0
+
+
+def cmd_rename(backend, args, stdout, stderr):
+    """Implement ``docker rename``"""
+    del stdout  # not used
+    if len(args) != 2:
+        stderr.write('"docker rename" requires exactly 2 argument(s).\n')
+        return 1
+    status, payload = backend.handle(
+        'POST', '/containers/%s/rename?%s'
+        % (urllib.parse.quote(args[0], ''),
+           urllib.parse.urlencode({'name': args[1]})))
+    if status >= 300:
+        return _error(stderr, payload)
+    return 0
+
+
+def cmd_rmi(backend, args, stdout, stderr):
+    """Implement ``docker rmi``"""
+    force = _option(args, '-f', '--force')
+    exit_status = 0
+    for key in args:
+        status, payload = backend.handle(
+            'DELETE', '/images/%s?force=%d'
+            % (urllib.parse.quote(key, ''), int(force)))
+        if status >= 300:
+            exit_status = _error(stderr, payload)
+            continue
+        for item in payload:
+            for verb, what in item.items():
+                stdout.write("%s: %s\n" % (verb, what))
+    return exit_status
+
+
+def cmd_version(backend, args, stdout, stderr):
+    """Implement ``docker version``"""
+    del args  # not used
+    status, version = backend.handle('GET', '/version')
+    if status != 200:
+        return _error(stderr, version)
+    lines = []
+    for section in ('Client', 'Server'):
+        lines.append('%s:' % section)
+        for key, name in (('Version', 'Version'),
+                          ('API version', 'ApiVersion'),
+                          ('Go version', 'GoVersion'),
+                          ('Git commit', 'GitCommit'),
+                          ('OS/Arch', None)):
+            if name is None:
+                value = '%s/%s' % (version['Os'], version['Arch'])
+            else:
+                value = version[name]
+            lines.append(' %-15s%s' % (key + ':', value))
+        lines.append('')
+    stdout.write('\n'.join(lines))
+    return 0
+
+
+def cmd_info(backend, args, stdout, stderr):
+    """Implement ``docker info``"""
+    del args  # not used
+    status, info = backend.handle('GET', '/info')
+    if status != 200:
+        return _error(stderr, info)
+    lines = ['Containers: %d' % info['Containers'],
+             ' Running: %d' % info['ContainersRunning'],
+             ' Paused: %d' % info['ContainersPaused'],
+             ' Stopped: %d' % info['ContainersStopped'],
+             'Images: %d' % info['Images'],
+             'Server Version: %s' % info['ServerVersion'],
+             'Storage Driver: %s' % info['Driver'],
+             'Cgroup Driver: %s' % info['CgroupDriver'],
+             'Kernel Version: %s' % info['KernelVersion'],
+             'Operating System: %s' % info['OperatingSystem'],
+             'CPUs: %d' % info['NCPU'],
+             'Docker Root Dir: %s' % info['DockerRootDir']]
+    stdout.write('\n'.join(lines) + '\n')
+    return 0
+
+
+#: Mapping of implemented subcommand names to implementing function
+SUBCOMMANDS = {'ps': cmd_ps, 'images': cmd_images, 'inspect': cmd_inspect,
+               'events': cmd_events, 'run': cmd_run, 'rename': cmd_rename,
+               'rm': cmd_rm, 'rmi': cmd_rmi, 'version': cmd_version,
+               'info': cmd_info}
+
+
+def parse_global_options(argv):
+    """
+    Split argv into dict of global options, subcommand and its arguments
+
+    :param argv: List of command-line arguments, not including argv[0]
+    :return: Tuple of options dict, subcommand string or None, args list
+    """
+    args = list(argv)
+    options = {'host': None, 'containers': 0, 'images': 0, 'events': 0,
+               'seed': 0}
+    while args and args[0].startswith('-'):
+        arg = args.pop(0)
+        name, _, value = arg.partition('=')
+        if name in ('-H', '--host'):
+            options['host'] = value if value else args.pop(0)
+        elif name.startswith('--fake-'):
+            key = name[len('--fake-'):]
+            if key not in options:
+                raise ValueError("Unknown option %s" % name)
+            options[key] = int(value if value else args.pop(0))
+        # Other global options are accepted and ignored
+    subcmd = args.pop(0) if args else None
+    return options, subcmd, args
+
+
+def make_backend(options):
+    """
+    Return SocketBackend if ``host`` option given, otherwise a new FakeState
+    """
+    host = options['host']
+    if host:
+        if not host.startswith('unix://'):
+            raise ValueError("Only unix:// hosts supported, not %s" % host)
+        return SocketBackend(host[len('unix://'):])
+    return FakeState(options['containers'], options['images'],
+                     options['events'], options['seed'])
+
+
+def main(argv=None, stdout=None, stderr=None):
+    """
+    Fake docker CLI entry-point, returns exit code
+
+    ``daemon <socket path>`` serves the generated state until killed.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if stdout is None:
+        stdout = sys.stdout
+    if stderr is None:
+        stderr = sys.stderr
+    try:
+        options, subcmd, args = parse_global_options(argv)
+    except (ValueError, IndexError) as xcept:
+        stderr.write("flag provided but not defined: %s\n" % xcept)
+        return 125
+    if subcmd == 'daemon':
+        daemon = FakeDaemon(args[0], FakeState(options['containers'],
+                                               options['images'],
+                                               options['events'],
+                                               options['seed']))
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            daemon.serve_forever()
+        finally:
+            daemon.server_close()
+        return 0
+    if subcmd not in SUBCOMMANDS:
+        stderr.write("docker: '%s' is not a docker command.\n" % subcmd)
+        return 1
+    try:
+        backend = make_backend(options)
+        return SUBCOMMANDS[subcmd](backend, args, stdout, stderr)
+    except (socket.error, ValueError) as xcept:
+        stderr.write("Cannot connect to the Docker daemon: %s\n" % xcept)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,482 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import unittest
+
+
+# DO NOT allow this function to get loose in the wild!
+def mock(mod_path):
+    """
+    Recursivly inject tree of mocked modules from entire mod_path
+    """
+    name_list = mod_path.split('.')
+    child_name = name_list.pop()
+    child_mod = sys.modules.get(mod_path, types.ModuleType(child_name))
+    if len(name_list) == 0:  # child_name is left-most basic module
+        if child_name not in sys.modules:
+            sys.modules[child_name] = child_mod
+        return sys.modules[child_name]
+    else:
+        # New or existing child becomes parent
+        recurse_path = ".".join(name_list)
+        parent_mod = mock(recurse_path)
+        if not hasattr(sys.modules[recurse_path], child_name):
+            setattr(parent_mod, child_name, child_mod)
+            # full-name also points at child module
+            sys.modules[mod_path] = child_mod
+        return sys.modules[mod_path]
+
+
+# Just pack whatever args received into attributes
+class FakeCmdResult(object):
+
+    def __init__(self, **dargs):
+        for key, val in list(dargs.items()):
+            setattr(self, key, val)
+
+
+# Actually run the command, it's only ever the fake docker
+def run(command, *_args, **_dargs):
+    start = time.time()
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = proc.communicate()
+    return FakeCmdResult(command=command, stdout=stdout, stderr=stderr,
+                         exit_status=proc.returncode,
+                         duration=time.time() - start)
+
+setattr(mock('autotest.client.utils'), 'run', run)
+setattr(mock('autotest.client.utils'), 'CmdResult', FakeCmdResult)
+setattr(mock('autotest.client.shared.error'), 'CmdError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestFail', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestNAError', Exception)
+setattr(mock('autotest.client.shared.error'), 'AutotestError', Exception)
+
+#: Absolute path to the fake docker executable
+FAKE_DOCKER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'fake_docker.py')
+
+
+class FakeStateTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import fake_docker
+        self.fake_docker = fake_docker
+
+    def test_deterministic(self):
+        one = self.fake_docker.FakeState(50, 20, 10, seed=42)
+        two = self.fake_docker.FakeState(50, 20, 10, seed=42)
+        three = self.fake_docker.FakeState(50, 20, 10, seed=43)
+        self.assertEqual(one.containers, two.containers)
+        self.assertEqual(one.images, two.images)
+        self.assertEqual(one.events, two.events)
+        self.assertNotEqual(one.containers, three.containers)
+        self.assertEqual(len(one.containers), 50)
+        self.assertEqual(len(one.images), 20)
+        self.assertEqual(len(one.events), 10)
+
+    def test_find(self):
+        state = self.fake_docker.FakeState(10, 10)
+        cntr = state.containers[3]
+        self.assertEqual(state.find_container(cntr['Name']), cntr)
+        self.assertEqual(state.find_container('/' + cntr['Name']), cntr)
+        self.assertEqual(state.find_container(cntr['Id'][:12]), cntr)
+        self.assertEqual(state.find_container('nonexisting'), None)
+        img = state.images[0]
+        self.assertEqual(state.find_image(img['RepoTags'][0]), img)
+        self.assertEqual(state.find_image(img['Id']), img)
+        self.assertEqual(state.find_image(img['Id'][7:19]), img)
+
+    def test_remove(self):
+        state = self.fake_docker.FakeState(3, 3)
+        running = state.containers[0]['Name']
+        stopped = state.containers[1]['Name']
+        self.assertEqual(state.handle('DELETE', '/containers/%s' % running)[0],
+                         409)
+        self.assertEqual(state.handle('DELETE',
+                                      '/containers/%s?force=1' % running)[0],
+                         204)
+        self.assertEqual(state.handle('DELETE', '/containers/%s' % stopped)[0],
+                         204)
+        self.assertEqual(len(state.containers), 1)
+        self.assertEqual(state.handle('GET', '/containers/%s/json'
+                                      % stopped)[0], 404)
+
+    def test_render_format(self):
+        render = self.fake_docker.render_format
+        obj = {'State': {'Pid': 42, 'Running': True}, 'Name': '/foo'}
+        self.assertEqual(render('{{.State.Pid}}', obj), '42')
+        self.assertEqual(render('{{ .State.Running }}', obj), 'true')
+        self.assertEqual(render('{{json .State}}', obj),
+                         '{"Pid": 42, "Running": true}')
+        self.assertEqual(render('{{.Nope}}', obj), '<no value>')
+
+
+class FakeCliTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import fake_docker
+        from dockertest.output import TextTable
+        self.fake_docker = fake_docker
+        self.TextTable = TextTable
+
+    def docker(self, *args):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        exit_status = self.fake_docker.main(list(args), stdout, stderr)
+        return exit_status, stdout.getvalue(), stderr.getvalue()
+
+    def test_ps(self):
+        exit_status, stdout, _ = self.docker('--fake-containers=30',
+                                             'ps', '-a', '--no-trunc')
+        self.assertEqual(exit_status, 0)
+        table = self.TextTable(stdout)
+        self.assertEqual(len(table), 30)
+        self.assertEqual(len(table[0]['CONTAINER ID']), 64)
+        self.assertEqual(table[0]['NAMES'], 'fake_000000')
+        _, stdout, _ = self.docker('--fake-containers=30', 'ps', '-q')
+        self.assertEqual(len(stdout.splitlines()), 10)
+
+    def test_images(self):
+        exit_status, stdout, _ = self.docker('--fake-images', '25',
+                                             'images', '--no-trunc')
+        self.assertEqual(exit_status, 0)
+        table = self.TextTable(stdout)
+        self.assertEqual(len(table), 25)
+        self.assertTrue(table[0]['IMAGE ID'].startswith('sha256:'))
+        self.assertEqual(table[9]['REPOSITORY'], None)  # <none>
+
+    def test_inspect(self):
+        _, stdout, _ = self.docker('--fake-containers=3', 'inspect',
+                                   '--format={{.State.Pid}}',
+                                   'fake_000000', 'fake_000001')
+        self.assertEqual(stdout.split(), ['10000', '0'])
+        exit_status, _, stderr = self.docker('inspect', 'nonexisting')
+        self.assertEqual(exit_status, 1)
+        self.assertTrue('No such object' in stderr)
+
+    def test_version_info(self):
+        from dockertest.output import DockerVersion, DockerInfo
+        _, stdout, _ = self.docker('version')
+        version = DockerVersion(stdout)
+        self.assertEqual(version.client, self.fake_docker.FAKE_VERSION)
+        self.assertEqual(version.server, self.fake_docker.FAKE_VERSION)
+        _, stdout, _ = self.docker('--fake-containers=7', 'info')
+        info = DockerInfo(stdout.encode())
+        self.assertEqual(info.get('containers'), '7')
+
+    def test_events(self):
+        _, stdout, _ = self.docker('--fake-containers=2', '--fake-events=8',
+                                   'events', '--since=0')
+        lines = stdout.splitlines()
+        self.assertEqual(len(lines), 8)
+        self.assertTrue(' container create ' in lines[0])
+        self.assertTrue('name=fake_000001' in lines[-1])
+
+    def test_bad_subcommand(self):
+        exit_status, _, stderr = self.docker('frobnicate')
+        self.assertEqual(exit_status, 1)
+        self.assertTrue('not a docker command' in stderr)
+
+
+class FakeDaemonTest(FakeCliTest):
+
+    def setUp(self):
+        super(FakeDaemonTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.sock = os.path.join(self.tmpdir, 'fake_docker.sock')
+        self.daemon = self.fake_docker.FakeDaemon(
+            self.sock, self.fake_docker.FakeState(20, 10, 10))
+        self.daemon.start()
+        self.host = '--host=unix://%s' % self.sock
+
+    def tearDown(self):
+        self.daemon.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_stateful_rm(self):
+        _, stdout, _ = self.docker(self.host, 'ps', '-a', '-q')
+        self.assertEqual(len(stdout.splitlines()), 20)
+        exit_status, stdout, _ = self.docker(self.host, 'rm', '--force=true',
+                                             'fake_000000', 'fake_000001')
+        self.assertEqual(exit_status, 0)
+        self.assertEqual(stdout.split(), ['fake_000000', 'fake_000001'])
+        _, stdout, _ = self.docker(self.host, 'ps', '-a', '-q')
+        self.assertEqual(len(stdout.splitlines()), 18)
+        exit_status, _, stderr = self.docker(self.host, 'rm', 'fake_000000')
+        self.assertEqual(exit_status, 1)
+        self.assertTrue('No such container' in stderr)
+
+    def test_stateful_rmi(self):
+        image = self.daemon.state.images[1]['RepoTags'][0]
+        exit_status, stdout, _ = self.docker(self.host, 'rmi', image)
+        self.assertEqual(exit_status, 1)  # in use by fake_000001
+        exit_status, stdout, _ = self.docker(self.host, 'rmi', '-f', image)
+        self.assertEqual(exit_status, 0)
+        self.assertTrue(stdout.startswith('Untagged: %s' % image))
+        _, stdout, _ = self.docker(self.host, 'images', '-q')
+        self.assertEqual(len(stdout.splitlines()), 9)
+
+    def test_stateful_run_rename(self):
+        image = self.daemon.state.images[0]['RepoTags'][0]
+        exit_status, stdout, _ = self.docker(self.host, 'run', '-d',
+                                             '--name', 'foo', image,
+                                             '/bin/sh', '-c', 'true')
+        self.assertEqual(exit_status, 0)
+        self.assertEqual(len(stdout.strip()), 64)
+        exit_status, _, stderr = self.docker(self.host, 'run', '-d',
+                                             '--name=foo', image)
+        self.assertEqual(exit_status, 1)
+        self.assertTrue('already in use' in stderr)
+        exit_status, _, _ = self.docker(self.host, 'rename', 'foo', 'bar')
+        self.assertEqual(exit_status, 0)
+        _, stdout, _ = self.docker(self.host, 'inspect',
+                                   '--format={{.State.Running}} {{.Name}}',
+                                   stdout.strip())
+        self.assertEqual(stdout, 'true /bar\n')
+
+    def test_socket_client(self):
+        from dockertest.docker_daemon import SocketClient
+        self.assertEqual(SocketClient(self.sock).version()['Version'],
+                         self.fake_docker.FAKE_VERSION)
+
+    def test_bad_subcommand(self):
+        exit_status, _, stderr = self.docker(self.host, 'frobnicate')
+        self.assertEqual(exit_status, 1)
+
+
+class FakeDockerScaleTest(unittest.TestCase):
+
+    """Drive the real listing code through the fake executable"""
+
+    n_containers = 2000
+    n_images = 1000
+
+    def setUp(self):
+        from dockertest import subtestbase
+        from dockertest.containers import DockerContainers
+        from dockertest.images import DockerImages
+
+        class FakeSubtest(subtestbase.SubBase):
+            config = {'docker_path': '%s %s --fake-containers=%d '
+                                     '--fake-images=%d'
+                                     % (sys.executable, FAKE_DOCKER,
+                                        self.n_containers, self.n_images),
+                      'docker_options': '',
+                      'docker_timeout': 120.0}
+            logdebug = loginfo = logwarning = lambda *_a, **_d: None
+
+        self.fake_subtest = FakeSubtest()
+        self.DockerContainers = DockerContainers
+        self.DockerImages = DockerImages
+
+    def test_list_containers(self):
+        dcs = self.DockerContainers(self.fake_subtest)
+        names = dcs.list_container_names()
+        self.assertEqual(len(names), self.n_containers)
+        self.assertEqual(len(set(names)), self.n_containers)
+        self.assertEqual(dcs.json_by_name('fake_000003')[0]['Name'],
+                         '/fake_000003')
+
+    def test_list_images(self):
+        dis = self.DockerImages(self.fake_subtest)
+        imgs = dis.list_imgs()
+        self.assertEqual(len(imgs), self.n_images)
+        self.assertEqual(len(dis.list_imgs_ids()), self.n_images)
+
+
+class FakeDockerInspectTest(unittest.TestCase):
+
+    """Batched and cached inspect through the fake daemon"""
+
+    def setUp(self):
+        from dockertest import fake_docker
+        from dockertest import subtestbase
+        from dockertest.containers import DockerContainers
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        sock = os.path.join(self.tmpdir, 'fake_docker.sock')
+        self.daemon = fake_docker.FakeDaemon(sock,
+                                             fake_docker.FakeState(200, 10))
+        self.daemon.start()
+
+        class FakeSubtest(subtestbase.SubBase):
+            config = {'docker_path': '%s %s --host=unix://%s'
+                                     % (sys.executable, FAKE_DOCKER, sock),
+                      'docker_options': '',
+                      'docker_timeout': 120.0}
+            logdebug = loginfo = logwarning = lambda *_a, **_d: None
+
+        self.dcs = DockerContainers(FakeSubtest())
+        self.commands = []
+        self.cmdlines = []
+        docker_cmd = self.dcs.docker_cmd
+
+        def counting_docker_cmd(cmd, timeout=None):
+            self.commands.append(cmd.split(None, 1)[0])
+            self.cmdlines.append(cmd)
+            return docker_cmd(cmd, timeout)
+
+        self.dcs.docker_cmd = counting_docker_cmd
+
+    def tearDown(self):
+        self.daemon.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_one_inspect(self):
+        names = ['fake_%06d' % idx for idx in range(200)]
+        jsons = self.dcs.inspect_many(names + ['nonexisting'])
+        self.assertEqual(self.commands, ['inspect'])
+        self.assertEqual(jsons['nonexisting'], None)
+        for name in names:
+            self.assertEqual(jsons[name]['Name'], '/' + name)
+
+    def test_cached(self):
+        first = self.dcs.inspect_many(['fake_000001', 'fake_000002'])
+        short_id = first['fake_000001']['Id'][:12]
+        second = self.dcs.inspect_many(['fake_000002', 'fake_000003'])
+        # Events checked no more than once per inspect_sync_interval
+        self.assertEqual(self.commands, ['inspect', 'inspect'])
+        self.assertEqual(first['fake_000002'], second['fake_000002'])
+        # Never cached, e.g. to see changes made by another instance
+        self.assertEqual(self.dcs.get_container_metadata(short_id)[0]['Name'],
+                         '/fake_000001')
+        self.assertEqual(self.commands, ['inspect', 'inspect', 'inspect'])
+
+    def test_synced(self):
+        self.dcs.inspect_sync_interval = 0
+        self.dcs.inspect_many(['fake_000001'])
+        self.dcs.inspect_many(['fake_000001'])
+        self.assertEqual(self.commands, ['inspect', 'events'])
+
+    def test_invalidated(self):
+        self.dcs.inspect_many(['fake_000001', 'fake_000002'])
+        self.dcs.docker_cmd('rm --force fake_000001')
+        jsons = self.dcs.inspect_many(['fake_000001', 'fake_000002'])
+        self.assertEqual(self.commands, ['inspect', 'rm', 'inspect'])
+        # Only the removed container was inspected again
+        self.assertEqual(self.cmdlines[-1],
+                         'inspect --type=container "fake_000001"')
+        self.assertEqual(jsons['fake_000001'], None)
+        self.assertEqual(jsons['fake_000002']['Name'], '/fake_000002')
+        self.dcs.invalidate(['fake_000002'])
+        self.dcs.inspect_many(['fake_000002'])
+        self.assertEqual(self.commands[-1], 'inspect')
+
+    def test_invalidated_by_id(self):
+        long_id = self.dcs.inspect_many(['fake_000003'])['fake_000003']['Id']
+        self.dcs.docker_cmd('rename %s renamed' % long_id[:12])
+        jsons = self.dcs.inspect_many(['fake_000003', 'renamed'])
+        self.assertEqual(jsons['fake_000003'], None)
+        self.assertEqual(jsons['renamed']['Id'], long_id)
+        self.dcs.docker_cmd('container prune --force')
+        self.assertEqual(self.dcs.inspect_many([]), {})
+        self.assertEqual(self.dcs._inspect_cache, {})
+
+
+class FakeDockerPoolTest(unittest.TestCase):
+
+    """Lease and release pooled containers through the fake daemon"""
+
+    def setUp(self):
+        from dockertest import fake_docker
+        from dockertest import subtestbase
+        from dockertest.containers import ContainerPool, DockerContainers
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        sock = os.path.join(self.tmpdir, 'fake_docker.sock')
+        self.daemon = fake_docker.FakeDaemon(sock, fake_docker.FakeState(3, 1))
+        self.daemon.start()
+
+        class FakeSubtest(subtestbase.SubBase):
+            config = {'docker_path': '%s %s --host=unix://%s'
+                                     % (sys.executable, FAKE_DOCKER, sock),
+                      'docker_options': '',
+                      'docker_timeout': 120.0,
+                      'docker_registry_host': '',
+                      'docker_registry_user': 'fake',
+                      'docker_repo_name': 'repo0000',
+                      'docker_repo_tag': 'tag0',
+                      'preserve_cnames': '',
+                      'container_pool_size': 2}
+            logdebug = loginfo = logwarning = lambda *_a, **_d: None
+
+        self.fake_subtest = FakeSubtest()
+        self.ContainerPool = ContainerPool
+        self.dcs = DockerContainers(self.fake_subtest)
+
+    def tearDown(self):
+        self.daemon.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def pooled(self):
+        return sorted(name for name in self.dcs.list_container_names()
+                      if name.startswith(self.ContainerPool.name_prefix))
+
+    def test_lease_release(self):
+        pool = self.ContainerPool(self.fake_subtest)
+        pool.fill()
+        idle = pool.idle_names()
+        self.assertEqual(len(idle), 2)
+        name = pool.lease()
+        self.assertEqual(name, idle[0].replace('_idle_', '_leased_'))
+        pool.release(name, recycle=True)  # refill may or may not be done
+        pool._wait_refill()
+        self.assertTrue(name.replace('_leased_', '_idle_') in self.pooled())
+        with pool.leased() as name:
+            self.assertTrue(name in self.pooled())
+        pool._wait_refill()
+        self.assertFalse(name in self.pooled())
+        self.assertEqual(len(pool.idle_names()), 2)
+        pool.close()
+        self.assertEqual(self.pooled(), [])
+
+    def test_on_demand(self):
+        pool = self.ContainerPool(self.fake_subtest, size=0)
+        with pool.leased() as name:
+            self.assertEqual(self.pooled(), [name])
+        self.assertEqual(self.pooled(), [])
+
+    def test_not_running(self):
+        pool = self.ContainerPool(self.fake_subtest)
+        pool.fill()
+        dead = pool.idle_names()[0]
+        self.daemon.state.find_container(dead)['Running'] = False
+        self.assertEqual(len(pool.idle_names()), 1)
+        self.assertFalse(dead in pool.idle_names())
+        pool.fill()
+        self.assertFalse(dead in self.pooled())
+        self.assertEqual(len(pool.idle_names()), 2)
+
+    def test_close_leased(self):
+        pool = self.ContainerPool(self.fake_subtest)
+        pool.fill()
+        name = pool.lease()
+        pool._wait_refill()
+        self.assertEqual(len(pool.close()), 2)
+        self.assertEqual(self.pooled(), [name])
+        self.assertEqual(pool.close(leased=True), [name])
+        self.assertEqual(self.pooled(), [])
+
+    def test_clean_all(self):
+        pool = self.ContainerPool(self.fake_subtest)
+        pool.fill()
+        name = pool.lease()
+        pool._wait_refill()
+        self.dcs.clean_all(self.dcs.list_container_names())
+        self.assertEqual(self.pooled(), sorted(pool.idle_names()))
+        self.assertFalse(name in self.pooled())
+        self.assertEqual(len(self.pooled()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,28 +25,55 @@ Note: As in other places, the terms 'repo' and 'image' are used
 # Pylint runs from another directory, ignore relative import warnings
 # pylint: disable=W0403
 
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import os.path
 import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from autotest.client import utils
 from autotest.client.shared import error
 from .config import Config
 from .config import none_if_empty
 from .config import get_as_list
+from . import names
 from .output import OutputGood, TextTable
 from .subtestbase import SubBase
 from .xceptions import DockerTestError, DockerCommandError
 from .xceptions import DockerFullNameFormatError
 
 
+def intern_str(value):
+    """
+    Return interned value if it's a string, otherwise value unmodified
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
 # Many attributes simply required here
 class DockerImage(object):  # pylint: disable=R0902
 
     """
-    Represent a repository or image as a set of instance attributes.
+    Represent a repository or image as a set of immutable instance attributes.
+
+    Instances are hashable (equal instances hash equally) so collections of
+    them may be sets.  Name components are interned, and the derived
+    ``short_id`` and ``full_name`` are only computed when first used.
     """
 
     #: There will likely be many instances, limit memory consumption.
-    __slots__ = ["repo_addr", "user", "repo", "tag", "full_name", "long_id",
-                 "short_id", "created", "size"]
+    __slots__ = ["repo_addr", "user", "repo", "tag", "long_id",
+                 "created", "size", "_short_id", "_full_name", "_hash"]
+
+    #: Attributes compared by ``__eq__()`` and ``__hash__()``
+    key_attrs = ("repo_addr", "user", "repo", "tag", "long_id",
+                 "created", "size")
 
     #: Regular expression for fully-qualified-image-name (FQIN)
     #: parsing, spec defined in docker-io documentation.  e.g.
@@ -81,21 +108,53 @@ class DockerImage(object):  # pylint: disable=R0902
         elif repo_addr is None:
             repo, _, repo_addr, _ = self.split_to_component(repo)
 
-        self.repo = repo
-        self.tag = tag
-        self.long_id = long_id
-        self.created = created
-        self.size = size
-        self.repo_addr = repo_addr
-        self.user = user
-
-        self.short_id = long_id[:12]
-        # docker-1.10 output includes a prefix describing the hash type
-        colon = long_id.find(":")
-        if colon >= 3:
-            self.short_id = long_id[colon + 1:colon + 13]
-        self.full_name = self.full_name_from_component(repo, tag,
-                                                       repo_addr, user)
+        setattr_ = super(DockerImage, self).__setattr__
+        setattr_('repo', intern_str(repo))
+        setattr_('tag', intern_str(tag))
+        setattr_('long_id', long_id)
+        setattr_('created', intern_str(created))
+        setattr_('size', intern_str(size))
+        setattr_('repo_addr', intern_str(repo_addr))
+        setattr_('user', intern_str(user))
+        setattr_('_short_id', None)
+        setattr_('_full_name', None)
+        setattr_('_hash', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s instances are immutable, can't set %s"
+                             % (self.__class__.__name__, name))
+
+    @property
+    def short_id(self):
+        """
+        Represent first 12 characters of ID, without any hash-type prefix
+        """
+        if self._short_id is None:
+            long_id = self.long_id
+            short_id = long_id[:12]
+            # docker-1.10 output includes a prefix describing the hash type
+            colon = long_id.find(":")
+            if colon >= 3:
+                short_id = long_id[colon + 1:colon + 13]
+            super(DockerImage, self).__setattr__('_short_id', short_id)
+        return self._short_id
+
+    @property
+    def full_name(self):
+        """
+        Represent FQIN, Fully Qualified Image Name, formed from components
+        """
+        if self._full_name is None:
+            full_name = intern_str(self.full_name_from_component(
+                self.repo, self.tag, self.repo_addr, self.user))
+            super(DockerImage, self).__setattr__('_full_name', full_name)
+        return self._full_name
+
+    def key(self):
+        """
+        Return tuple of all attributes determining equality
+        """
+        return tuple(getattr(self, name) for name in self.key_attrs)
 
     def __eq__(self, other):
         """
@@ -104,12 +163,16 @@ class DockerImage(object):  # pylint: disable=R0902
         :param other: An instance of this class (or subclass) for comparison.
         """
 
-        self_val = [getattr(self, name) for name in self.__slots__]
-        other_val = [getattr(other, name) for name in self.__slots__]
-        for _self, _other in zip(self_val, other_val):
-            if _self != _other:
-                return False
-        return True
+        if self is other:
+            return True
+        if not isinstance(other, DockerImage):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __hash__(self):
+        if self._hash is None:
+            super(DockerImage, self).__setattr__('_hash', hash(self.key()))
+        return self._hash
 
     def __str__(self):
         """
@@ -419,23 +482,19 @@ class DockerImages(object):
         :param prefix: Name prefix
         :param suffix: Name suffix
         :param length: Length of random string (greater than 1)
-        :return: Image name guaranteed to not be in-use.
+        :return: Image name, unique to this run without listing
+                 images (see ``names`` module)
         """
 
         assert length > 1
         if prefix:
-            _name = "%s_%s_%%s" % (self.subtest.__class__.__name__, prefix)
+            _name = "%s_%s" % (self.subtest.__class__.__name__, prefix)
         else:
-            _name = "%s_%%s" % self.subtest.__class__.__name__
-        all_images = self.list_imgs_full_name()
-        if suffix:
-            _name += suffix
-        for _ in range(1000):
-            name = _name % utils.generate_random_string(length)
-            if self.gen_lower_only:
-                name = name.lower()
-            if name not in all_images:
-                return name
+            _name = self.subtest.__class__.__name__
+        if self.gen_lower_only:
+            _name = _name.lower()
+            suffix = suffix.lower()
+        return names.registry().new_name('image', _name, suffix, length)
 
     # Tests may subclass and override this to be stateful, therefor
     # it cannot be defined as a static or class method.
@@ -660,3 +719,279 @@ class DockerImages(object):
                     continue
         finally:
             self.verbose = self.__class__.verbose
+
+
+class ImageCache(object):
+
+    """
+    Content-addressed cache of ``docker save`` tarballs for restoring images
+
+    Tarballs are named by image ID, so images with several names are only
+    stored once.  An ``index.json`` file in cache_dir records each FQIN's
+    image ID, plus the sha256, size, and time last used of each tarball.
+    Jobs sharing cache_dir only update it while holding ``index.lock``.
+
+    :param subtest: A subtest.SubBase subclass instance
+    :param cache_dir: Directory holding tarballs, None for
+                      ``image_cache_dir`` config. option
+    :param max_bytes: Total tarball size beyond which least-recently-used
+                      are removed, None for ``image_cache_max_mb`` config.
+                      option, 0 for no limit.
+    :param workers: Max number of ``docker load`` to run in parallel
+    :raises DockerTestError: If no cache_dir is configured
+    """
+
+    #: Name of index file in cache_dir
+    index_name = 'index.json'
+
+    #: Name of file in cache_dir locked while updating index and tarballs
+    lock_name = 'index.lock'
+
+    #: Bytes read at a time when verifying tarballs
+    chunk_size = 1024 * 1024
+
+    def __init__(self, subtest, cache_dir=None, max_bytes=None, workers=4):
+        if cache_dir is None:
+            cache_dir = subtest.config.get('image_cache_dir', '').strip()
+        if not cache_dir:
+            raise DockerTestError("No image_cache_dir configured")
+        if max_bytes is None:
+            max_bytes = float(subtest.config.get('image_cache_max_mb',
+                                                 0)) * 1024 * 1024
+        self.subtest = subtest
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.workers = int(workers)
+        self.images = DockerImages(subtest)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.index = self.read_index()
+
+    @property
+    def index_path(self):
+        """
+        Absolute path to index file
+        """
+        return os.path.join(self.cache_dir, self.index_name)
+
+    def read_index(self):
+        """
+        Return index dictionary loaded from cache_dir (or a new, empty one)
+        """
+        try:
+            with open(self.index_path) as index_file:
+                index = json.load(index_file)
+        except (IOError, OSError, ValueError):
+            index = {}
+        index.setdefault('fqins', {})
+        index.setdefault('tarballs', {})
+        return index
+
+    @contextlib.contextmanager
+    def locked(self):
+        """
+        Context holding exclusive lock on cache_dir, index re-read on entry
+
+        Changes to ``self.index`` made inside the context must be written
+        with ``write_index()`` before leaving it.
+        """
+        with open(os.path.join(self.cache_dir, self.lock_name),
+                  'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                self.index = self.read_index()
+                yield self.index
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def write_index(self):
+        """
+        Atomically replace index file with current index
+        """
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as index_file:
+            json.dump(self.index, index_file, indent=2, sort_keys=True)
+        os.rename(tmp_path, self.index_path)
+
+    def tarball_path(self, image_id):
+        """
+        Return path to tarball for image_id
+        """
+        return os.path.join(self.cache_dir,
+                            "%s.tar" % image_id.replace(':', '-'))
+
+    def sha256(self, path):
+        """
+        Return hex sha256 digest of file at path
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as infile:
+            for chunk in iter(lambda: infile.read(self.chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def image_ids(self, fqins):
+        """
+        Return mapping of each of fqins present on host to it's image ID
+        """
+        dis = self.images.list_imgs()
+        result = {}
+        for fqin in fqins:
+            for di in dis:
+                if di.cmp_full_name(fqin):
+                    result[fqin] = di.long_id
+                    break
+        return result
+
+    def save_tarball(self, fqin, image_id):
+        """
+        Save fqin to a temporary tarball, return it's path and index entry
+
+        :return: Tuple of path and entry, or None (with a warning) on error
+        """
+        # Unique, other jobs may be saving the same image
+        tmp_path = "%s.%d.tmp" % (self.tarball_path(image_id), os.getpid())
+        self.subtest.logdebug("Saving %s to image cache", fqin)
+        try:
+            self.images.docker_cmd("save -o '%s' %s" % (tmp_path, fqin))
+            return tmp_path, {'sha256': self.sha256(tmp_path),
+                              'size': os.path.getsize(tmp_path)}
+        except (DockerCommandError, IOError, OSError) as xcept:
+            self.subtest.logwarning("Saving %s to image cache: %s",
+                                    fqin, xcept)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return None
+
+    def save(self, fqins):
+        """
+        Add tarballs of fqins to cache, if not already there, then evict
+
+        :param fqins: Iterable of FQINs present on host
+        :return: List of FQINs whose image wasn't already cached
+        """
+        present = self.image_ids(fqins)
+        self.index = self.read_index()  # Other jobs may have added some
+        new = {}  # image ID to tuple of fqin, tmp_path and entry
+        for fqin, image_id in list(present.items()):
+            if image_id in self.index['tarballs'] or image_id in new:
+                continue
+            result = self.save_tarball(fqin, image_id)
+            if result is not None:
+                new[image_id] = (fqin,) + result
+        saved = []
+        with self.locked():
+            tarballs = self.index['tarballs']
+            for image_id, (fqin, tmp_path, entry) in list(new.items()):
+                if image_id in tarballs:  # Another job beat us to it
+                    os.unlink(tmp_path)
+                    continue
+                os.rename(tmp_path, self.tarball_path(image_id))
+                tarballs[image_id] = entry
+                saved.append(fqin)
+            for fqin, image_id in list(present.items()):
+                if image_id in tarballs:
+                    self.index['fqins'][fqin] = image_id
+                    tarballs[image_id]['used'] = time.time()
+            self.evict()
+            self.write_index()
+        return saved
+
+    def verify(self, image_id):
+        """
+        Return True if tarball of image_id exists and is unmodified
+        """
+        path = self.tarball_path(image_id)
+        entry = self.index['tarballs'][image_id]
+        return (os.path.isfile(path) and
+                os.path.getsize(path) == entry['size'] and
+                self.sha256(path) == entry['sha256'])
+
+    def forget(self, image_id):
+        """
+        Remove image_id's tarball and all references to it from index
+        """
+        self.index['tarballs'].pop(image_id, None)
+        for fqin, fqin_id in list(self.index['fqins'].items()):
+            if fqin_id == image_id:
+                del self.index['fqins'][fqin]
+        try:
+            os.unlink(self.tarball_path(image_id))
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Forget least-recently-used tarballs until total size <= max_bytes
+        """
+        if not self.max_bytes:
+            return
+        tarballs = self.index['tarballs']
+        by_use = sorted(tarballs, key=lambda image_id:
+                        tarballs[image_id].get('used', 0))
+        total = sum(entry['size'] for entry in list(tarballs.values()))
+        for image_id in by_use:
+            if total <= self.max_bytes:
+                break
+            self.subtest.logdebug("Evicting %s from image cache", image_id)
+            total -= tarballs[image_id]['size']
+            self.forget(image_id)
+
+    def load(self, image_id, fqins):
+        """
+        Verify and load tarball of image_id, tag it fqins
+
+        :return: True on success, False on docker error, None if the
+                 tarball failed verification.
+        """
+        if not self.verify(image_id):
+            self.subtest.logwarning("Image cache tarball %s failed "
+                                    "verification, removing it",
+                                    self.tarball_path(image_id))
+            return None
+        try:
+            self.images.docker_cmd("load -i '%s'"
+                                   % self.tarball_path(image_id))
+            # Tarball only has name(s) it was saved with
+            for fqin in fqins:
+                self.images.docker_cmd("tag %s %s" % (image_id, fqin))
+        except DockerCommandError as xcept:
+            self.subtest.logwarning("Restoring %s from image cache: %s",
+                                    fqins, xcept)
+            return False
+        return True
+
+    def restore(self, fqins):
+        """
+        Load cached tarball for each of fqins missing from host
+
+        :param fqins: Iterable of FQINs
+        :return: List of FQINs restored
+        """
+        present = self.image_ids(fqins)
+        by_id = {}
+        for fqin in fqins:
+            image_id = self.index['fqins'].get(fqin)
+            if (fqin not in present and
+                    image_id in self.index['tarballs']):
+                by_id.setdefault(image_id, []).append(fqin)
+        if not by_id:
+            return []
+        restored = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            loads = dict((image_id, executor.submit(self.load, image_id,
+                                                    by_id[image_id]))
+                         for image_id in by_id)
+        with self.locked():
+            for image_id, future in list(loads.items()):
+                loaded = future.result()
+                if loaded and image_id in self.index['tarballs']:
+                    self.index['tarballs'][image_id]['used'] = time.time()
+                elif loaded is None:
+                    self.forget(image_id)
+                if loaded:
+                    restored += by_id[image_id]
+            self.write_index()
+        return restored
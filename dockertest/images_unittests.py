@@ -330,6 +330,26 @@ class DockerImageTestBasic(ImageTestBase):
         self.assertEqual(di.long_id, long_id)
         self.assertEqual(di.short_id, id_components[1])
 
+    def test_immutable_hashable(self):
+        DI = self.images.DockerImage
+        long_id = '0123456789ab' + 'c' * 52
+        di1 = DI("myrepo", "a", long_id, "5 weeks ago", "1 MB", "dd")
+        di2 = DI("".join(["my", "repo"]), "a", long_id, "5 weeks ago",
+                 "1 MB", "dd")
+        self.assertRaises(AttributeError, setattr, di1, 'tag', 'b')
+        self.assertRaises(AttributeError, setattr, di1, 'short_id', 'b')
+        self.assertFalse(hasattr(di1, '__dict__'))
+        # Equal instances have identical (interned) name strings
+        self.assertTrue(di1.repo is di2.repo)
+        self.assertEqual(di1, di2)
+        self.assertEqual(hash(di1), hash(di2))
+        self.assertEqual(len(set([di1, di2])), 1)
+        di3 = DI("myrepo", "b", long_id, "5 weeks ago", "1 MB", "dd")
+        self.assertNotEqual(di1, di3)
+        self.assertTrue(di3 not in set([di1, di2]))
+        self.assertEqual(di3.full_name, 'dd/myrepo:b')
+        self.assertEqual(di3.short_id, '0123456789ab')
+
     def test_bastard_repo(self):
         test = "bAsTaRd-rEPo.lOcAl_hOsT:1073741824/.b+o-F_H./a.s-d_f:F.d-S_a"
         DI = self.images.DockerImage
@@ -422,5 +442,149 @@ class DockerImageTestBasic(ImageTestBase):
         self.assertEqual(cleaned_names, expected)
         self.assertTrue(cleaned_names.isdisjoint(preserve))
 
+
+class FakeDocker(object):
+
+    """Stateful stand-in for utils.run, handling just the image cache's use"""
+
+    def __init__(self, images):
+        self.images = dict(images)  # fqin -> image ID
+        self.commands = []
+
+    def table(self):
+        row = "%-20s%-10s%-80s%-20s%s"
+        lines = [row % ('REPOSITORY', 'TAG', 'IMAGE ID', 'CREATED',
+                        'VIRTUAL SIZE')]
+        for fqin, image_id in sorted(self.images.items()):
+            repo, tag = fqin.rsplit(':', 1)
+            lines.append(row % (repo, tag, image_id, '5 weeks ago', '1 MB'))
+        return "\n".join(lines) + "\n"
+
+    def __call__(self, command, *_args, **_dargs):
+        import shlex
+        args = shlex.split(command)[1:]
+        self.commands.append(args[0])
+        stdout = ''
+        if args[0] == 'images':
+            stdout = self.table()
+        elif args[0] == 'save':
+            with open(args[2], 'w') as tarball:
+                tarball.write("%s %s" % (self.images[args[3]], args[3]))
+        elif args[0] == 'load':
+            with open(args[2]) as tarball:
+                image_id, fqin = tarball.read().split()
+            self.images[fqin] = image_id
+        elif args[0] == 'tag':
+            self.images[args[2]] = args[1]
+        return FakeCmdResult(command=command, stdout=stdout, stderr='',
+                             exit_status=0, duration=0)
+
+
+class ImageCacheTest(ImageTestBase):
+
+    defaults = {'docker_path': '/foo/bar', 'docker_options': '',
+                'docker_timeout': 60.0, 'image_cache_dir': '',
+                'image_cache_max_mb': 0}
+
+    def setUp(self):
+        super(ImageCacheTest, self).setUp()
+        self.cache_dir = tempfile.mkdtemp(self.__class__.__name__)
+        self.fake_docker = FakeDocker({'foo:1': 'sha256:' + '1' * 64,
+                                       'bar:2': 'sha256:' + '2' * 64,
+                                       'baz:1': 'sha256:' + '1' * 64})
+        self.utils = mock('autotest.client.utils')
+        self.utils.run = self.fake_docker
+
+    def tearDown(self):
+        self.utils.run = run
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super(ImageCacheTest, self).tearDown()
+
+    def image_cache(self, max_bytes=0):
+        return self.images.ImageCache(self.fake_subtest, self.cache_dir,
+                                      max_bytes)
+
+    def test_unconfigured(self):
+        from .xceptions import DockerTestError
+        self.assertRaises(DockerTestError, self.images.ImageCache,
+                          self.fake_subtest)
+
+    def test_save_restore(self):
+        cache = self.image_cache()
+        # Same ID saved once
+        self.assertEqual(sorted(cache.save(['foo:1', 'bar:2', 'baz:1'])),
+                         ['bar:2', 'foo:1'])
+        # + index and it's lock
+        self.assertEqual(len(os.listdir(self.cache_dir)), 4)
+        self.assertEqual(cache.save(['foo:1']), [])
+        self.fake_docker.images = {'bar:2': 'sha256:' + '2' * 64}
+        self.fake_docker.commands = []
+        # New instance reads index
+        cache = self.image_cache()
+        self.assertEqual(sorted(cache.restore(['foo:1', 'bar:2', 'baz:1',
+                                               'nonexisting:1'])),
+                         ['baz:1', 'foo:1'])
+        self.assertEqual(self.fake_docker.images['baz:1'], 'sha256:' + '1' * 64)
+        self.assertEqual(self.fake_docker.commands.count('load'), 1)
+        self.assertEqual(cache.restore(['foo:1', 'baz:1']), [])
+
+    def test_save_error(self):
+        from .xceptions import DockerCommandError
+        cache = self.image_cache()
+        docker_cmd = cache.images.docker_cmd
+
+        def failing_docker_cmd(cmd, timeout=None):
+            if cmd.startswith('save') and cmd.endswith(' bar:2'):
+                with open(cmd.split("'")[1], 'w') as tarball:
+                    tarball.write("partial")
+                raise DockerCommandError(cmd)
+            return docker_cmd(cmd, timeout)
+
+        cache.images.docker_cmd = failing_docker_cmd
+        self.assertEqual(cache.save(['foo:1', 'bar:2']), ['foo:1'])
+        # No partial tarball left behind
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ['index.json', 'index.lock',
+                          os.path.basename(cache.tarball_path('sha256:' +
+                                                              '1' * 64))])
+        self.assertEqual(list(self.image_cache().index['fqins']), ['foo:1'])
+
+    def test_shared(self):
+        cache = self.image_cache()
+        other = self.image_cache()
+        cache.save(['foo:1'])
+        other.save(['bar:2'])
+        # Neither job's changes lost
+        self.assertEqual(sorted(self.image_cache().index['fqins']),
+                         ['bar:2', 'foo:1'])
+        self.fake_docker.commands = []
+        # Already saved by other job
+        self.assertEqual(cache.save(['bar:2']), [])
+        self.assertEqual(self.fake_docker.commands, ['images'])
+
+    def test_corrupt(self):
+        cache = self.image_cache()
+        cache.save(['foo:1'])
+        with open(cache.tarball_path('sha256:' + '1' * 64), 'a') as tarball:
+            tarball.write('garbage')
+        self.fake_docker.images = {}
+        self.assertEqual(cache.restore(['foo:1']), [])
+        self.assertFalse('load' in self.fake_docker.commands)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ['index.json', 'index.lock'])
+        self.assertEqual(self.image_cache().index['fqins'], {})
+
+    def test_evict(self):
+        cache = self.image_cache()
+        cache.save(['foo:1'])
+        cache.save(['bar:2'])
+        cache.index['tarballs']['sha256:' + '2' * 64]['used'] -= 10
+        cache.max_bytes = 100  # fake tarballs are 77 bytes each
+        cache.evict()
+        self.assertEqual(list(cache.index['tarballs']),
+                         ['sha256:' + '1' * 64])
+        self.assertEqual(list(cache.index['fqins']), ['foo:1'])
+
+
 if __name__ == '__main__':
     unittest.main()
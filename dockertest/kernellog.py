@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+
+"""
+Run-wide incremental monitoring of kernel log for oops/panic/hung-tasks
+
+Only records logged after the monitor was started are considered.  Each
+poll reads just the new records, from ``/dev/kmsg`` (remembering the last
+sequence number) or from the journal (remembering a cursor) when
+``/dev/kmsg`` isn't readable.  Problems are attributed to the activity most
+recently ``note()``'d before the record was logged (e.g. a subtest step or
+docker command).
+
+Every autotest step runs in it's own process, so the read position, the
+problems found and the noted activities are kept in a state file (see
+``configure()``), making marks valid across all steps of a job.  The
+first step to ``start()`` creates it, so mark 0 means since the job started.
+Kernel logs are host-wide, nothing is checked unless explicitly asked for
+(e.g. by the ``garbage_check`` intratest, using ``checked()``).
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!
+"""
+
+import collections
+import errno
+import json
+import logging
+import os
+import re
+import subprocess
+import time
+
+#: Regular expression matching messages indicating a kernel problem
+PROBLEM_REGEX = re.compile(r'oops|kernel panic|\bBUG:|general protection fault'
+                           r'|blocked for more than \d+ seconds'
+                           r'|soft lockup|hard lockup|Call Trace',
+                           re.IGNORECASE)
+
+#: Least-severe syslog priority examined (warning)
+MAX_PRIORITY = 4
+
+#: Name of state file, in job's results directory
+STATE_FILENAME = 'kernellog.json'
+
+
+class KernelProblem(collections.namedtuple('KernelProblem',
+                                           ['timestamp', 'message',
+                                            'label'])):
+
+    """
+    Kernel log message indicating a problem
+
+    :param timestamp: Source clock value when message was logged
+    :param message: The kernel log message string
+    :param label: Activity ``note()``'d before message was logged, or None
+    """
+
+    def __str__(self):
+        if self.label is None:
+            return self.message
+        return "%s (during %s)" % (self.message, self.label)
+
+
+class NullSource(object):
+
+    """
+    Kernel log source used when no other is available, never has records
+    """
+
+    #: Short description of source
+    name = 'none'
+
+    #: True if ``clock()`` is wall-clock time, False if time since boot
+    realtime = True
+
+    @staticmethod
+    def clock():
+        """
+        Return current time in the same units as record timestamps
+        """
+        return time.time()
+
+    def read(self):  # pylint: disable=R0201
+        """
+        Return list of new (timestamp, priority, message) tuples
+        """
+        return []
+
+    def position(self):  # pylint: disable=R0201
+        """
+        Return JSON-able read position, for ``resume()`` in another process
+        """
+        return None
+
+    def resume(self, position):
+        """
+        Continue reading after position returned by ``position()``
+        """
+        pass
+
+
+class KmsgSource(NullSource):
+
+    """
+    Read new records from ``/dev/kmsg``, starting from the end at creation
+
+    :param path: Path to kernel message device
+    :raise OSError: If path can't be opened for reading
+    """
+
+    name = 'kmsg'
+
+    realtime = False
+
+    #: Sequence number of last record read, None if none read
+    last_seq = None
+
+    def __init__(self, path='/dev/kmsg'):
+        self.fileno = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        # Sequence numbers of existing records are needed by resume()
+        self.read()
+
+    @staticmethod
+    def clock():
+        # Records are stamped in microseconds since boot
+        return time.monotonic()
+
+    def position(self):
+        return self.last_seq
+
+    def resume(self, position):
+        if position is None:
+            return
+        # Next read() re-reads whole buffer, skipping records up to position
+        os.lseek(self.fileno, 0, os.SEEK_SET)
+        self.last_seq = position
+
+    def read(self):
+        records = []
+        while True:
+            try:
+                record = os.read(self.fileno, 8192)
+            except OSError as xcept:
+                if xcept.errno == errno.EPIPE:  # records were overwritten
+                    continue
+                if xcept.errno == errno.EAGAIN:  # no more records
+                    break
+                raise
+            if not record:
+                break
+            prefix, message = record.decode('utf-8',
+                                            'replace').split(';', 1)
+            fields = prefix.split(',')
+            seq = int(fields[1])
+            if self.last_seq is not None and seq <= self.last_seq:
+                continue  # Already read by another process
+            self.last_seq = seq
+            # Continuation lines (key=value) follow message on next lines
+            records.append((int(fields[2]) / 1000000.0,
+                            int(fields[0]) & 7,
+                            message.split('\n', 1)[0]))
+        return records
+
+
+class JournalSource(NullSource):
+
+    """
+    Read new kernel records from the journal, starting after current cursor
+
+    :param command: journalctl command path
+    :raise OSError: If journal can't be queried
+    """
+
+    name = 'journal'
+
+    #: Common journalctl arguments
+    ARGS = '--no-pager --all --dmesg --boot --quiet'
+
+    def __init__(self, command='journalctl'):
+        self.command = command
+        # Only shows a cursor after showing at least one entry
+        output = self._journalctl('--lines=1 --show-cursor')
+        self.cursor = None
+        #: Start time when there's no cursor (no kernel entries yet)
+        self.since = None
+        for line in output.splitlines():
+            if line.startswith('-- cursor:'):
+                self.cursor = line.split(':', 1)[1].strip()
+        if self.cursor is None:
+            self.since = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _journalctl(self, args):
+        try:
+            return subprocess.check_output('%s %s %s'
+                                           % (self.command, self.ARGS, args),
+                                           shell=True,
+                                           stderr=subprocess.STDOUT,
+                                           universal_newlines=True)
+        except subprocess.CalledProcessError as xcept:
+            raise OSError(xcept.returncode, str(xcept))
+
+    @staticmethod
+    def clock():
+        return time.time()
+
+    def position(self):
+        return self.cursor
+
+    def resume(self, position):
+        if position is not None:
+            self.cursor = position
+
+    def read(self):
+        args = '--output=json --priority=%d' % MAX_PRIORITY
+        if self.cursor is not None:
+            args += " --after-cursor='%s'" % self.cursor
+        elif self.since is not None:
+            args += " --since='%s'" % self.since
+        records = []
+        for line in self._journalctl(args).splitlines():
+            if not line.startswith('{'):
+                continue
+            entry = json.loads(line)
+            self.cursor = entry['__CURSOR']
+            message = entry.get('MESSAGE', '')
+            if isinstance(message, list):  # non-utf8 encoded as bytes
+                message = bytes(message).decode('utf-8', 'replace')
+            records.append((int(entry['__REALTIME_TIMESTAMP']) / 1000000.0,
+                            int(entry.get('PRIORITY', MAX_PRIORITY)),
+                            message))
+        return records
+
+
+def default_source():
+    """
+    Return the cheapest available kernel log source instance
+    """
+    for source_class in (KmsgSource, JournalSource):
+        try:
+            return source_class()
+        except (OSError, IOError, ValueError) as xcept:
+            logging.debug("Kernel log source %s unavailable: %s",
+                          source_class.name, xcept)
+    logging.warning("No kernel log source available, kernel problems "
+                    "will not be detected")
+    return NullSource()
+
+
+class KernelLogMonitor(object):
+
+    """
+    Accumulate kernel problems logged since creation, attributing each
+
+    :param source: Source instance (e.g. ``KmsgSource``), None for default
+    :param state_path: JSON file to continue from and save state to, None
+                       to keep state only in this process.
+    """
+
+    #: Maximum number of ``note()``'d activities remembered
+    history_size = 1000
+
+    #: Mark returned by previous ``checked()``, 0 if never called
+    checked_mark = 0
+
+    def __init__(self, source=None, state_path=None):
+        if source is None:
+            source = default_source()
+        self.source = source
+        self.state_path = state_path
+        #: List of all ``KernelProblem`` found so far
+        self.problems = []
+        self.history = collections.deque(maxlen=self.history_size)
+        self.load()
+
+    def load(self):
+        """
+        Continue from state saved by another process, if any
+        """
+        if self.state_path is None:
+            return
+        try:
+            with open(self.state_path) as state_file:
+                state = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return
+        if state.get('source') != self.source.name:
+            return  # Position and timestamps meaningless to this source
+        self.source.resume(state['position'])
+        self.problems = [KernelProblem(*problem)
+                         for problem in state['problems']]
+        self.history.extend(tuple(noted) for noted in state['history'])
+        self.checked_mark = state.get('checked_mark', 0)
+
+    def save(self):
+        """
+        Atomically write state for use by other processes, ignoring errors
+        """
+        if self.state_path is None:
+            return
+        state = {'source': self.source.name,
+                 'position': self.source.position(),
+                 'problems': [list(problem) for problem in self.problems],
+                 'history': [list(noted) for noted in self.history],
+                 'checked_mark': self.checked_mark}
+        tmp_path = '%s.%d' % (self.state_path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as state_file:
+                json.dump(state, state_file)
+            os.rename(tmp_path, self.state_path)
+        except (IOError, OSError) as xcept:
+            logging.debug("Kernel log state not saved: %s", xcept)
+
+    def note(self, label, when=None):
+        """
+        Record label as activity starting at when (source clock), or now
+
+        :param label: Description of activity
+        :param when: Source clock value, None for ``source.clock()``
+        """
+        if when is None:
+            when = self.source.clock()
+        self.history.append((when, label))
+
+    def label_at(self, timestamp):
+        """
+        Return most recent activity label noted before timestamp, or None
+        """
+        for noted, label in reversed(self.history):
+            if noted <= timestamp:
+                return label
+        return None
+
+    def poll(self):
+        """
+        Read new records, return list of any new ``KernelProblem``
+        """
+        try:
+            records = self.source.read()
+        except (OSError, IOError, ValueError) as xcept:
+            logging.warning("Reading kernel log from %s failed, kernel "
+                            "problems will not be detected: %s",
+                            self.source.name, xcept)
+            self.source = NullSource()
+            return []
+        new = [KernelProblem(timestamp, message, self.label_at(timestamp))
+               for timestamp, priority, message in records
+               if priority <= MAX_PRIORITY and PROBLEM_REGEX.search(message)]
+        self.problems += new
+        self.save()
+        return new
+
+    def mark(self):
+        """
+        Return opaque mark representing all problems logged until now
+        """
+        self.poll()
+        return len(self.problems)
+
+    def new_kernel_problems_since(self, mark=0):
+        """
+        Return list of ``KernelProblem`` logged after mark was taken
+
+        :param mark: Value returned by ``mark()``, 0 for since creation.
+        """
+        self.poll()
+        return self.problems[mark:]
+
+    def checked(self):
+        """
+        Return mark of previous call, making a new one for the next call
+
+        :return: Value for ``new_kernel_problems_since()``, to check the
+                 problems logged since previous call (or creation).
+        """
+        previous = self.checked_mark
+        self.checked_mark = self.mark()
+        self.save()
+        return previous
+
+
+#: Private, run-wide monitor instance, use ``monitor()`` to access
+_monitor = None
+
+#: Private, state file of run-wide monitor, use ``configure()`` to set
+_state_path = None
+
+#: Private, (monotonic, wall-clock, label) noted before monitor was created
+_notes = collections.deque(maxlen=KernelLogMonitor.history_size)
+
+
+def configure(state_path):
+    """
+    Set state file of the run-wide monitor, e.g. in job's results directory
+    """
+    global _state_path, _monitor  # pylint: disable=W0603
+    if state_path != _state_path:
+        _state_path = state_path
+        _monitor = None  # Re-created from state_path on next use
+
+
+def monitor():
+    """
+    Return the run-wide ``KernelLogMonitor``, creating it on first use
+    """
+    global _monitor  # pylint: disable=W0603
+    if _monitor is None:
+        _monitor = KernelLogMonitor(state_path=_state_path)
+        for monotonic, realtime, label in _notes:
+            if _monitor.source.realtime:
+                _monitor.note(label, realtime)
+            else:
+                _monitor.note(label, monotonic)
+        _notes.clear()
+    return _monitor
+
+
+def start():
+    """
+    Create the run-wide monitor, saving it's state for later steps
+
+    Called at the start of every step, the first one starts monitoring
+    for the job.  Activities noted until now are kept for attribution.
+    """
+    monitor().save()
+
+
+def note(label):
+    """
+    Record label as the activity now running, for attributing problems
+
+    Cheap, the kernel log isn't read until problems are asked for.  Once
+    the monitor is started the note is also saved, for later steps.
+    """
+    if _monitor is None:
+        _notes.append((time.monotonic(), time.time(), label))
+    else:
+        _monitor.note(label)
+        _monitor.save()
+
+
+def mark():
+    """
+    Return opaque mark of the run-wide monitor, see ``KernelLogMonitor``
+    """
+    return monitor().mark()
+
+
+def new_kernel_problems_since(mark_value=0):
+    """
+    Return problems logged after mark_value on the run-wide monitor
+    """
+    return monitor().new_kernel_problems_since(mark_value)
+
+
+def checked():
+    """
+    Return mark of previous call on the run-wide monitor, see ``mark()``
+    """
+    return monitor().checked()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import errno
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+
+class FakeSource(object):
+
+    name = 'fake'
+
+    def __init__(self):
+        self.now = 100.0
+        self.pending = []
+
+    def clock(self):
+        return self.now
+
+    def read(self):
+        records = self.pending
+        self.pending = []
+        if records:
+            self.cursor = records[-1][0]
+        return records
+
+    cursor = None
+    realtime = True
+
+    def position(self):
+        return self.cursor
+
+    def resume(self, position):
+        self.cursor = position
+
+
+class KernelLogMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import kernellog
+        self.kernellog = kernellog
+        self.source = FakeSource()
+        self.monitor = kernellog.KernelLogMonitor(self.source)
+
+    def test_filter(self):
+        self.source.pending = [(101.0, 6, 'oops: not important enough'),
+                               (101.0, 4, 'usb 1-1: new device'),
+                               (101.0, 4, 'Oops: 0002 [#1] SMP'),
+                               (102.0, 3, 'INFO: task foo:123 blocked for '
+                                          'more than 120 seconds.')]
+        problems = self.monitor.poll()
+        self.assertEqual(len(problems), 2)
+        self.assertEqual(problems[0].message, 'Oops: 0002 [#1] SMP')
+        self.assertEqual(problems[0].label, None)
+
+    def test_marks(self):
+        mark = self.monitor.mark()
+        self.assertEqual(self.monitor.new_kernel_problems_since(mark), [])
+        self.source.pending = [(101.0, 0, 'Kernel panic - not syncing')]
+        self.assertEqual(len(self.monitor.new_kernel_problems_since(mark)), 1)
+        mark = self.monitor.mark()
+        self.assertEqual(self.monitor.new_kernel_problems_since(mark), [])
+        self.assertEqual(len(self.monitor.new_kernel_problems_since(0)), 1)
+
+    def test_attribution(self):
+        self.monitor.note('first')
+        self.source.now = 200.0
+        self.monitor.note('second')
+        self.source.pending = [(99.0, 4, 'BUG: early'),
+                               (150.0, 4, 'BUG: during first'),
+                               (250.0, 4, 'BUG: during second')]
+        labels = [problem.label for problem in self.monitor.poll()]
+        self.assertEqual(labels, [None, 'first', 'second'])
+        self.assertTrue('(during second)'
+                        in str(self.monitor.problems[-1]))
+
+    def test_source_failure(self):
+        def broken():
+            raise OSError(errno.EIO, 'broken')
+        self.source.read = broken
+        self.assertEqual(self.monitor.poll(), [])
+        self.assertEqual(self.monitor.source.name, 'none')
+
+
+class StateTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import kernellog
+        self.kernellog = kernellog
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.state_path = os.path.join(self.tmpdir,
+                                       kernellog.STATE_FILENAME)
+
+    def tearDown(self):
+        self.kernellog.configure(None)
+        self.kernellog._notes.clear()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_marks_across_processes(self):
+        source = FakeSource()
+        first = self.kernellog.KernelLogMonitor(source, self.state_path)
+        first.note('step one')
+        mark = first.mark()
+        source.pending = [(101.0, 4, 'BUG: in step one')]
+        first.poll()
+        # Next step's process continues from saved state
+        source = FakeSource()
+        second = self.kernellog.KernelLogMonitor(source, self.state_path)
+        self.assertEqual(source.cursor, 101.0)
+        problems = second.new_kernel_problems_since(mark)
+        self.assertEqual([problem.label for problem in problems],
+                         ['step one'])
+        self.assertEqual(second.new_kernel_problems_since(second.mark()), [])
+
+    def test_other_source(self):
+        first = self.kernellog.KernelLogMonitor(FakeSource(),
+                                                self.state_path)
+        first.problems.append(self.kernellog.KernelProblem(1.0, 'BUG', None))
+        first.save()
+        second = self.kernellog.KernelLogMonitor(self.kernellog.NullSource(),
+                                                 self.state_path)
+        self.assertEqual(second.problems, [])
+
+    def test_checked(self):
+        source = FakeSource()
+        first = self.kernellog.KernelLogMonitor(source, self.state_path)
+        self.assertEqual(first.checked(), 0)
+        source.pending = [(101.0, 4, 'BUG: after first check')]
+        second = self.kernellog.KernelLogMonitor(FakeSource(),
+                                                 self.state_path)
+        self.assertEqual(second.checked_mark, 0)
+        second.source.pending = source.pending
+        mark = second.checked()
+        self.assertEqual(len(second.new_kernel_problems_since(mark)), 1)
+        third = self.kernellog.KernelLogMonitor(FakeSource(),
+                                                self.state_path)
+        self.assertEqual(third.new_kernel_problems_since(third.checked()),
+                         [])
+
+    def test_start_saves_notes(self):
+        default_source = self.kernellog.default_source
+        self.kernellog.default_source = FakeSource
+        try:
+            self.kernellog.configure(self.state_path)
+            self.kernellog.note('early')
+            self.kernellog.start()
+            self.kernellog.note('later')
+        finally:
+            self.kernellog.default_source = default_source
+        # Next step's process sees notes from this one
+        monitor = self.kernellog.KernelLogMonitor(FakeSource(),
+                                                  self.state_path)
+        self.assertEqual([label for _, label in monitor.history],
+                         ['early', 'later'])
+
+    def test_note_without_monitor(self):
+        self.kernellog.configure(self.state_path)
+        self.kernellog.note('early')
+        # Noting doesn't read the kernel log
+        self.assertEqual(self.kernellog._monitor, None)
+        self.assertEqual([noted[2] for noted in self.kernellog._notes],
+                         ['early'])
+
+
+class JournalSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import kernellog
+        self.kernellog = kernellog
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.journalctl = os.path.join(self.tmpdir, 'journalctl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def fake_journalctl(self, script):
+        with open(self.journalctl, 'w') as journalctl:
+            journalctl.write('#!/bin/sh\n%s\n' % script)
+        os.chmod(self.journalctl, stat.S_IRWXU)
+
+    def test_cursor(self):
+        self.fake_journalctl('echo "Jan 01 kernel: last entry"; '
+                             'echo "-- cursor: s=abc;i=1"')
+        source = self.kernellog.JournalSource(self.journalctl)
+        self.assertEqual(source.cursor, 's=abc;i=1')
+        self.assertEqual(source.since, None)
+
+    def test_no_entries(self):
+        self.fake_journalctl('echo "$@" >> %s.args' % self.journalctl)
+        source = self.kernellog.JournalSource(self.journalctl)
+        self.assertEqual(source.cursor, None)
+        self.assertEqual(source.read(), [])
+        with open(self.journalctl + '.args') as args:
+            # Never everything from whole boot
+            self.assertTrue('--since=' in args.read().splitlines()[-1])
+
+
+class KmsgSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import kernellog
+        self.kernellog = kernellog
+        self.rfd, self.wfd = os.pipe()
+
+    def tearDown(self):
+        os.close(self.rfd)
+        os.close(self.wfd)
+
+    def test_read(self):
+        source = self.kernellog.KmsgSource.__new__(self.kernellog.KmsgSource)
+        source.fileno = self.rfd
+        os.set_blocking(self.rfd, False)
+        self.assertEqual(source.read(), [])
+        os.write(self.wfd, b'4,1234,5000000,-;BUG: bad\n SUBSYSTEM=foo\n')
+        self.assertEqual(source.read(), [(5.0, 4, 'BUG: bad')])
+        self.assertEqual(source.position(), 1234)
+        # Records already read by another process are skipped
+        os.write(self.wfd, b'4,1234,5000000,-;BUG: bad\n')
+        self.assertEqual(source.read(), [])
+        os.write(self.wfd, b'4,1235,6000000,-;BUG: worse\n')
+        self.assertEqual(source.read(), [(6.0, 4, 'BUG: worse')])
+
+
+if __name__ == '__main__':
+    unittest.main()
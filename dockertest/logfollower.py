@@ -0,0 +1,257 @@
+"""
+Incremental access to a container's log through ``docker logs --follow``
+
+One long-running ``docker logs --follow --timestamps`` process feeds lines
+as they're logged, so waiting for output costs in proportion to the new
+output, rather than re-reading the entire log on every poll.  Should the
+stream end (container stopped/restarted or docker daemon restarted), it's
+resumed from the last timestamp seen, without repeating lines.
+"""
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from .xceptions import DockerTestFail
+
+
+def timestamp_key(timestamp):
+    """
+    Return sortable form of RFC3339Nano UTC timestamp
+
+    Docker trims trailing zeros from the fraction, pad it back to 9 digits
+    and drop the ``Z`` so string comparison orders keys correctly.
+    """
+    if '.' not in timestamp:
+        return timestamp.rstrip('Z') + '.000000000'
+    seconds, fraction = timestamp.rstrip('Z').split('.', 1)
+    return '%s.%s' % (seconds, fraction.ljust(9, '0'))
+
+
+class ContainerLogFollower(object):
+
+    """
+    Follow log of a container from start, collecting lines as logged
+
+    Usable as a context manager, otherwise call ``stop()`` when finished.
+
+    :param subtest: A subtest.SubBase or subclass instance
+    :param container: Name or ID of container
+    :param stderr: Also collect container's stderr (interleaved)
+    """
+
+    #: Minimum seconds between resuming an ended log stream
+    resume_interval = 0.5
+
+    #: Max seconds each wait blocks before checking whether to resume
+    wait_step = 0.1
+
+    def __init__(self, subtest, container, stderr=True):
+        self.subtest = subtest
+        self.container = container
+        self.stderr = stderr
+        #: List of log lines (without timestamps) in order logged
+        self.lines = []
+        #: List of timestamp_key() for each of lines
+        self.timestamps = []
+        #: Index into lines of next line returned by ``new_lines()``
+        self.idx = 0
+        self._cond = threading.Condition()
+        self._proc = None
+        self._reader = None
+        self._started = 0.0
+        self._stopped = False
+        self.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def command(self):
+        """
+        String of docker logs command, resuming after last timestamp seen
+        """
+        config = self.subtest.config
+        args = ['logs', '--follow', '--timestamps']
+        if self.timestamps:
+            # Docker always logs UTC timestamps
+            args.append("--since='%sZ'" % self.timestamps[-1])
+        args.append(self.container)
+        command = "%s %s %s" % (config['docker_path'].strip(),
+                                config['docker_options'].strip(),
+                                " ".join(args))
+        if self.stderr:
+            command += " 2>&1"
+        return command
+
+    def start(self):
+        """
+        Start (or resume) following log, no-op if already following
+        """
+        if self._stopped or (self._reader is not None and
+                             self._reader.is_alive()):
+            return
+        if self._proc is not None:  # previous stream ended
+            self._proc.wait()
+            self._proc.stdout.close()
+        self._started = time.time()
+        self._proc = subprocess.Popen(self.command, shell=True,
+                                      close_fds=True,
+                                      stdin=subprocess.DEVNULL,
+                                      stdout=subprocess.PIPE,
+                                      universal_newlines=True,
+                                      errors='replace',
+                                      start_new_session=True)
+        self._reader = threading.Thread(target=self._read,
+                                        args=(self._proc,))
+        self._reader.daemon = True
+        self._reader.start()
+
+    def stop(self):
+        """
+        Stop following log, collected lines remain available
+        """
+        self._stopped = True
+        if self._proc is not None and self._proc.poll() is None:
+            # Shell may not exec docker, make sure it's killed too
+            os.killpg(self._proc.pid, signal.SIGKILL)
+        if self._reader is not None:
+            self._reader.join()
+        if self._proc is not None:
+            self._proc.wait()
+            self._proc.stdout.close()
+
+    def _read(self, proc):
+        """
+        Collect lines from proc stdout until it ends, for use in a thread
+        """
+        # Resumed streams repeat lines logged at the resume timestamp
+        if self.timestamps:
+            last = self.timestamps[-1]
+            skip = self.timestamps.count(last)
+        else:
+            last = None
+            skip = 0
+        for line in proc.stdout:
+            timestamp, _, text = line.rstrip('\n').partition(' ')
+            key = timestamp_key(timestamp)
+            if last is not None and key <= last:
+                if key < last or skip > 0:
+                    skip -= int(key == last)
+                    continue
+            with self._cond:
+                self.timestamps.append(key)
+                self.lines.append(text)
+                self._cond.notify_all()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait(self, count, endtime):
+        """
+        Wait until there are more than count lines or endtime, resuming
+        """
+        while len(self.lines) <= count:
+            remaining = endtime - time.time()
+            if remaining <= 0:
+                return False
+            if (not self._reader.is_alive() and
+                    time.time() - self._started >= self.resume_interval):
+                self.start()
+            with self._cond:
+                if len(self.lines) <= count:
+                    self._cond.wait(min(remaining, self.wait_step))
+        return True
+
+    def new_lines(self, timeout=0):
+        """
+        Return list of lines not previously returned, waiting up to timeout
+        """
+        self._wait(self.idx, time.time() + timeout)
+        new = self.lines[self.idx:]
+        self.idx += len(new)
+        return new
+
+    def wait_for_growth(self, count, timeout=5):
+        """
+        Return True if more than count lines are logged within timeout
+        """
+        return self._wait(count, time.time() + timeout)
+
+    def wait_for_line(self, predicate, timeout=5, start=0):
+        """
+        Return index of first line at/after start satisfying predicate
+
+        Only newly logged lines are examined while waiting.
+
+        :param predicate: Callable given line string, returning True on match
+        :param timeout: Max seconds to wait for a matching line
+        :param start: Index into lines to begin search from
+        :return: Index of matching line or None on timeout
+        """
+        endtime = time.time() + timeout
+        idx = start
+        while True:
+            while idx < len(self.lines):
+                if predicate(self.lines[idx]):
+                    return idx
+                idx += 1
+            if not self._wait(idx, endtime):
+                return None
+
+    def expect(self, lines, bad_lines=None, timeout=5, start=0):
+        """
+        Wait for lines to appear in order (others between are ignored)
+
+        :param lines: List of expected lines, in order
+        :param bad_lines: List of lines which must not appear at all
+        :param timeout: Max seconds to wait for all lines
+        :param start: Index into lines to begin search from
+        :raise DockerTestFail: If a bad line appears or on timeout
+        :return: Index after line matching last of lines
+        """
+        if bad_lines is None:
+            bad_lines = []
+        bad_lines = set(bad_lines)
+        found = 0
+
+        def check_bad(line):  # private, no docstring pylint: disable=C0111
+            if line in bad_lines:
+                raise DockerTestFail("Check output fail; found bad line "
+                                     "%r:\nlines:\n%s\nbad_lines:\n%s\n"
+                                     "output:\n%s" % (line, lines,
+                                                      sorted(bad_lines),
+                                                      self.lines))
+
+        def matches(line):
+            nonlocal found
+            check_bad(line)
+            if line == lines[found]:
+                found += 1
+            return found == len(lines)
+
+        if not lines:
+            # Nothing to wait for, only lines logged so far can be checked
+            for line in self.lines[start:]:
+                check_bad(line)
+            return start
+        idx = self.wait_for_line(matches, timeout, start)
+        if idx is None:
+            raise DockerTestFail("Check output fail, found %d of %d lines "
+                                 "within %s seconds:\ncheck_lines:\n%s\n"
+                                 "bad_lines:\n%s\ndocker_output:\n%s"
+                                 % (found, len(lines), timeout, lines,
+                                    sorted(bad_lines), self.lines))
+        # Lines already logged after the last expected one can't be bad either
+        for line in self.lines[idx + 1:]:
+            check_bad(line)
+        return idx + 1
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+
+# DO NOT allow this function to get loose in the wild!
+def mock(mod_path):
+    """
+    Recursivly inject tree of mocked modules from entire mod_path
+    """
+    name_list = mod_path.split('.')
+    child_name = name_list.pop()
+    child_mod = sys.modules.get(mod_path, types.ModuleType(child_name))
+    if len(name_list) == 0:  # child_name is left-most basic module
+        if child_name not in sys.modules:
+            sys.modules[child_name] = child_mod
+        return sys.modules[child_name]
+    else:
+        # New or existing child becomes parent
+        recurse_path = ".".join(name_list)
+        parent_mod = mock(recurse_path)
+        if not hasattr(sys.modules[recurse_path], child_name):
+            setattr(parent_mod, child_name, child_mod)
+            # full-name also points at child module
+            sys.modules[mod_path] = child_mod
+        return sys.modules[mod_path]
+
+
+class DockerTestFail(Exception):
+    pass
+
+setattr(mock('autotest.client.shared.error'), 'CmdError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestFail', DockerTestFail)
+setattr(mock('autotest.client.shared.error'), 'TestError', Exception)
+setattr(mock('autotest.client.shared.error'), 'TestNAError', Exception)
+setattr(mock('autotest.client.shared.error'), 'AutotestError', Exception)
+
+#: Emulates 'docker logs --follow --timestamps [--since=X] <log file>',
+#: stream ends once '<log file>.stop' exists.
+FAKE_DOCKER = r'''
+import os, sys, time
+def key(timestamp):
+    seconds, fraction = timestamp.strip("'Z").split('.')
+    return seconds + fraction.ljust(9, '0')
+path = sys.argv[-1]
+since = [arg.split('=', 1)[1] for arg in sys.argv if arg.startswith('--since')]
+since = key(since[0]) if since else ''
+seen = 0
+while True:
+    with open(path) as logfile:
+        lines = logfile.readlines()
+    for line in lines[seen:]:
+        if key(line.split(' ', 1)[0]) >= since:
+            sys.stdout.write(line)
+    sys.stdout.flush()
+    seen = len(lines)
+    if os.path.exists(path + '.stop'):
+        break
+    time.sleep(0.01)
+'''
+
+
+class ContainerLogFollowerTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import logfollower
+        self.logfollower = logfollower
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.log = os.path.join(self.tmpdir, 'container.log')
+        self.seconds = 0
+        open(self.log, 'w').close()
+        script = os.path.join(self.tmpdir, 'docker.py')
+        with open(script, 'w') as outfile:
+            outfile.write(FAKE_DOCKER)
+
+        class FakeSubtest(object):
+            config = {'docker_path': '%s %s' % (sys.executable, script),
+                      'docker_options': ''}
+
+        self.fake_subtest = FakeSubtest()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def log_lines(self, *lines, **dargs):
+        with open(self.log, 'a') as logfile:
+            for line in lines:
+                if not dargs.get('same_time'):
+                    self.seconds += 1
+                logfile.write('2017-01-01T00:00:%02d.5Z %s\n'
+                              % (self.seconds, line))
+
+    def follower(self):
+        return self.logfollower.ContainerLogFollower(self.fake_subtest,
+                                                     self.log)
+
+    def test_timestamp_key(self):
+        key = self.logfollower.timestamp_key
+        self.assertTrue(key('2017-01-01T00:00:00.1Z') >
+                        key('2017-01-01T00:00:00.09Z'))
+        self.assertTrue(key('2017-01-01T00:00:01Z') >
+                        key('2017-01-01T00:00:00.999Z'))
+
+    def test_incremental(self):
+        self.log_lines('a', 'b')
+        with self.follower() as follower:
+            self.assertTrue(follower.wait_for_growth(1, 5))
+            self.assertEqual(follower.new_lines(), ['a', 'b'])
+            self.assertEqual(follower.new_lines(), [])
+            self.log_lines('c')
+            self.assertEqual(follower.new_lines(5), ['c'])
+            self.assertFalse(follower.wait_for_growth(3, 0.2))
+
+    def test_expect(self):
+        self.log_lines('start', 'noise', 'ready')
+        with self.follower() as follower:
+            self.assertEqual(follower.expect(['start', 'ready'], ['bad']), 3)
+            self.log_lines('more', 'bad', 'done')
+            self.assertRaises(DockerTestFail, follower.expect,
+                              ['done'], ['bad'], 5, 3)
+            self.assertRaises(DockerTestFail, follower.expect,
+                              ['never'], None, 0.2)
+
+    def test_expect_only_bad(self):
+        self.log_lines('start', 'ready', 'bad', 'after')
+        with self.follower() as follower:
+            follower.expect(['after'])
+            # No lines expected, existing lines still checked
+            self.assertEqual(follower.expect([], ['good']), 0)
+            self.assertRaises(DockerTestFail, follower.expect, [], ['bad'])
+            self.assertRaises(DockerTestFail, follower.expect, ['ready'],
+                              ['bad'])
+
+    def test_resume(self):
+        self.log_lines('one', 'two')
+        with self.follower() as follower:
+            follower.resume_interval = 0
+            follower.expect(['two'])
+            open(self.log + '.stop', 'w').close()
+            self.log_lines('three')
+            self.log_lines('four', same_time=True)
+            follower.expect(['four'])
+            self.assertEqual(len(follower), 4)
+            os.unlink(self.log + '.stop')
+            self.log_lines('five', same_time=True)
+            follower.expect(['five'])
+            self.log_lines('six')
+            follower.expect(['six'])
+            self.assertEqual(follower.lines,
+                             ['one', 'two', 'three', 'four', 'five', 'six'])
+
+
+if __name__ == '__main__':
+    unittest.main()
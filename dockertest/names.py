@@ -0,0 +1,108 @@
+"""
+Allocation of unique container and image names, without listing either
+
+Names are built from the step (subtest class) name, a run ID shared by
+all steps of a run (``RUN_ID_ENV`` environment variable, set by the
+control file) and a random token.  With that much entropy, collisions
+with existing names are so unlikely they're not checked at all.  Every
+name handed out is remembered in a per-process registry, so no two
+callers in the same process are ever given the same name.
+"""
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import binascii
+import os
+import threading
+
+#: Environment variable holding ID of current run, inherited by steps
+RUN_ID_ENV = 'DOCKERTEST_RUN_ID'
+
+#: Minimum length of random token in every name (hex digits)
+MIN_TOKEN_LENGTH = 8
+
+
+def random_token(length):
+    """
+    Return string of length random lowercase hex digits
+    """
+    return binascii.hexlify(os.urandom((length + 1) // 2))[:length].decode()
+
+
+def run_id():
+    """
+    Return ID of current run, creating one (for this process) if not set
+    """
+    value = os.environ.get(RUN_ID_ENV)
+    if not value:
+        value = os.environ[RUN_ID_ENV] = random_token(6)
+    return value
+
+
+class NameRegistry(object):
+
+    """
+    Registry of names reserved by this process, for each kind of object
+
+    :param run_id_value: ID of run shared by all names, None for ``run_id()``
+    """
+
+    def __init__(self, run_id_value=None):
+        if run_id_value is None:
+            run_id_value = run_id()
+        self.run_id = run_id_value
+        #: Mapping of kind (e.g. ``container``) to list of names reserved
+        self.reserved = {}
+        self._lock = threading.Lock()
+
+    def new_name(self, kind, base, suffix='', length=4, separator='_'):
+        """
+        Reserve and return a name no other caller in this process has
+
+        :param kind: Kind of object named, e.g. ``container`` or ``image``
+        :param base: Leading part of name, e.g. step name and prefix
+        :param suffix: Trailing part of name, appended as-is
+        :param length: Requested length of random token (at least
+                       ``MIN_TOKEN_LENGTH`` is always used)
+        :param separator: String joining base and run ID + token
+        :return: Name string
+        """
+        length = max(length, MIN_TOKEN_LENGTH)
+        with self._lock:
+            reserved = self.reserved.setdefault(kind, [])
+            while True:
+                parts = [base, self.run_id + random_token(length)]
+                name = separator.join(part for part in parts if part) + suffix
+                if name not in reserved:
+                    reserved.append(name)
+                    return name
+
+    def names(self, kind):
+        """
+        Return list of names of kind reserved so far, oldest first
+        """
+        with self._lock:
+            return list(self.reserved.get(kind, []))
+
+    def release(self, kind, name):
+        """
+        Forget name was reserved (e.g. after the object was removed)
+        """
+        with self._lock:
+            if name in self.reserved.get(kind, []):
+                self.reserved[kind].remove(name)
+
+
+#: Private, per-process registry instance, use ``registry()`` to access
+_registry = None
+
+
+def registry():
+    """
+    Return the per-process ``NameRegistry``, creating it on first use
+    """
+    global _registry  # pylint: disable=W0603
+    if _registry is None:
+        _registry = NameRegistry()
+    return _registry
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import unittest
+
+
+class NameRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import names
+        self.names = names
+        self.registry = names.NameRegistry('abc123')
+
+    def test_run_id(self):
+        run_id = self.names.run_id()
+        self.assertEqual(self.names.run_id(), run_id)
+        self.assertEqual(self.names.os.environ[self.names.RUN_ID_ENV],
+                         run_id)
+
+    def test_new_name(self):
+        name = self.registry.new_name('container', 'foo-bar', '_baz')
+        self.assertTrue(name.startswith('foo-bar_abc123'))
+        self.assertTrue(name.endswith('_baz'))
+        # Short lengths are raised to the minimum
+        token = name[len('foo-bar_abc123'):-len('_baz')]
+        self.assertEqual(len(token), self.names.MIN_TOKEN_LENGTH)
+        self.assertTrue(set(token) <= set('0123456789abcdef'))
+        image = self.registry.new_name('image', 'foo', ':tag', 12)
+        self.assertTrue(image.endswith(':tag'))
+        self.assertEqual(len(image), len('foo_abc123:tag') + 12)
+        self.assertEqual(self.registry.names('container'), [name])
+        self.assertEqual(self.registry.names('image'), [image])
+        self.assertEqual(self.registry.names('volume'), [])
+
+    def test_unique(self):
+        random_token = self.names.random_token
+        tokens = iter('aabc')
+        self.names.random_token = lambda length: next(tokens) * length
+        try:
+            first = self.registry.new_name('container', 'x')
+            second = self.registry.new_name('container', 'x')
+        finally:
+            self.names.random_token = random_token
+        self.assertEqual(first, 'x_abc123' + 'a' * 8)
+        self.assertEqual(second, 'x_abc123' + 'b' * 8)
+
+    def test_release(self):
+        name = self.registry.new_name('image', 'x')
+        self.registry.release('image', name)
+        self.registry.release('image', 'unknown')
+        self.assertEqual(self.registry.names('image'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,52 @@
 API compatibility: on 2016-04-29 output.py got split up into a
 package with four smaller, more maintainable submodules. This init
 allows existing clients to continue importing as a single unit.
+
+Submodules are only imported when one of their names is first used,
+so importing the package alone (as every test step does) stays cheap.
 """
 
-from . dockertime import DockerTime
-from . dockerinfo import DockerInfo
-from . dockerversion import DockerVersion
-from . texttable import TextTable, ColumnRanges
-from . validate import OutputGood, OutputGoodBase, OutputNotBad
-from . validate import wait_for_output, mustpass, mustfail
-from . unseenlines import UnseenLines, UnseenlineMatchTimeout, UnseenlineMatch
-from . unseenlines import UnseenlineMatchPeek, NoUnseenlineMatch
+import importlib
+
+#: Mapping of each public name to the submodule defining it
+NAME_MODULES = {
+    'DockerTime': 'dockertime',
+    'DockerInfo': 'dockerinfo',
+    'DockerVersion': 'dockerversion',
+    'TextTable': 'texttable',
+    'ColumnRanges': 'texttable',
+    'OutputGood': 'validate',
+    'OutputGoodBase': 'validate',
+    'OutputNotBad': 'validate',
+    'OutputScanner': 'validate',
+    'PatternCheck': 'validate',
+    'wait_for_output': 'validate',
+    'mustpass': 'validate',
+    'mustfail': 'validate',
+    'UnseenLines': 'unseenlines',
+    'UnseenlineMatchTimeout': 'unseenlines',
+    'UnseenlineMatch': 'unseenlines',
+    'UnseenlineMatchPeek': 'unseenlines',
+    'NoUnseenlineMatch': 'unseenlines'}
+
+#: Names of all submodules
+SUBMODULES = frozenset(NAME_MODULES.values())
+
+__all__ = sorted(NAME_MODULES)
+
+
+def __getattr__(name):
+    """Import submodule (or submodule defining name) on first access"""
+    if name in SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name not in NAME_MODULES:
+        raise AttributeError("module %s has no attribute %s"
+                             % (__name__, name))
+    module = importlib.import_module('.' + NAME_MODULES[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value  # Don't come back here next time
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(NAME_MODULES) | SUBMODULES)
@@ -6,10 +6,10 @@ Handlers for command-line output processing, crash/panic detection, etc.
 # pylint: disable=W0403
 
 import re
-import subprocess
 from string import printable
 from autotest.client import utils
 from dockertest.xceptions import DockerExecError, DockerOutputError
+from dockertest import kernellog
 from . dockerversion import DockerVersion
 
 
@@ -119,6 +119,115 @@ class AllGoodBase(object):
         return dict(results)
 
 
+class PatternCheck(object):
+
+    """
+    A ``*_check`` defined by a regular expression, usable as a staticmethod
+
+    Calling an instance with an output string returns True if the pattern
+    is **not** found.  Instances assigned to ``OutputGoodBase`` subclass
+    attributes are combined with all others into a single compiled scanner,
+    so every stream is searched once for all of them together.
+
+    :param pattern: Regular expression string, must not match across lines
+    :param flags: Regular expression flags for pattern
+    :param doc: Docstring to use for the instance
+    :param lead: Optional regular expression matching (only) any possible
+                 first character of pattern, allows skipping ahead quickly
+                 when scanning.
+    """
+
+    def __init__(self, pattern, flags=0, doc=None, lead=None):
+        self.pattern = pattern
+        self.flags = flags
+        self.regex = re.compile(pattern, flags)
+        self.__doc__ = doc
+        self.lead = lead
+
+    def __call__(self, output):
+        return not bool(self.regex.search(output))
+
+    @property
+    def scoped_pattern(self):
+        """
+        Represent pattern with it's flags scoped to only itself
+        """
+        flags = ''
+        if self.flags & re.IGNORECASE:
+            flags += 'i'
+        if self.flags & re.MULTILINE:
+            flags += 'm'
+        if self.flags & re.DOTALL:
+            flags += 's'
+        if flags:
+            return '(?%s:%s)' % (flags, self.pattern)
+        return '(?:%s)' % self.pattern
+
+
+class OutputScanner(object):
+
+    """
+    Single-pass search of output for all pattern checks of a checker class
+
+    Data may be given all at once or in chunks through ``feed()``.  Since
+    patterns never match across lines, only complete lines are searched
+    until ``close()`` is called, at most one (partial) line is buffered.
+
+    :param checker_cls: ``OutputGoodBase`` subclass defining pattern checks
+    :param skip: Iterable of check names to bypass, None to run all
+    """
+
+    def __init__(self, checker_cls, skip=None):
+        self.checker_cls = checker_cls
+        patterns, _ = checker_cls.check_table()
+        if skip is None:
+            skip = []
+        #: Mapping of check name to True/False, filled in as data is scanned
+        self.results = dict([(name, True) for name in patterns
+                             if name not in skip])
+        self._pending = frozenset(self.results)
+        self._partial = ''
+
+    def _scan(self, data):
+        pos = 0
+        while self._pending:
+            mobj = self.checker_cls.scanner(self._pending).search(data, pos)
+            if mobj is None:
+                return
+            # Other pending patterns may also match at this same position
+            self.results[mobj.lastgroup] = False
+            self._pending = self._pending - set([mobj.lastgroup])
+            pos = mobj.start()
+
+    def feed(self, data):
+        """
+        Scan all complete lines of data, buffering any trailing partial line
+        """
+        if not self._pending:
+            return
+        data = self._partial + data
+        end = data.rfind('\n') + 1
+        self._partial = data[end:]
+        if end:
+            self._scan(data[:end])
+
+    def close(self):
+        """
+        Scan any buffered partial line, return results dictionary
+        """
+        if self._partial:
+            self._scan(self._partial)
+            self._partial = ''
+        return self.results
+
+    def check(self, data):
+        """
+        Scan complete data in one pass, return results dictionary
+        """
+        self.feed(data)
+        return self.close()
+
+
 class OutputGoodBase(AllGoodBase):
 
     """
@@ -127,6 +236,9 @@ class OutputGoodBase(AllGoodBase):
     :param cmdresult: autotest.client.utils.CmdResult instance
     :param ignore_error: Raise xceptions.DockerOutputError if False
     :param skip: Iterable of checks to bypass, None to run all
+    :param scanners: Optional dict of ``'stdout'`` and/or ``'stderr'`` to
+                     already fed ``OutputScanner`` instances, used for
+                     pattern checks instead of re-scanning ``cmdresult``.
     """
 
     #: Reference to original CmdResult instance
@@ -138,16 +250,26 @@ class OutputGoodBase(AllGoodBase):
     #: Stripped standard-error string
     stderr_strip = None
 
-    def __init__(self, cmdresult, ignore_error=False, skip=None):
+    #: Private per-class cache of check_table() results, do not use.
+    _check_table = None
+
+    #: Private per-class cache of compiled scanners, do not use.
+    _scanners = None
+
+    def __init__(self, cmdresult, ignore_error=False, skip=None,
+                 scanners=None):
         # Base class __init__ is abstract
         # pylint: disable=W0231
         self.cmdresult = cmdresult
         self.stdout_strip = cmdresult.stdout.strip()
         self.stderr_strip = cmdresult.stderr.strip()
+        if isinstance(skip, str):
+            skip = [skip]
+        if scanners is None:
+            scanners = {}
+        self.scanners = scanners
         # All methods called twice with mangled names, mangle skips also
         if skip is not None:
-            if isinstance(skip, str):
-                skip = [skip]
             newskip = []
             for checker in skip:
                 newskip.append(checker + '_stdout')
@@ -155,7 +277,8 @@ class OutputGoodBase(AllGoodBase):
         else:
             newskip = skip
         self.__instattrs__(newskip)
-        for checker in [name for name in dir(self) if name.endswith('_check')]:
+        _, methods = self.check_table()
+        for checker in methods:
             self.callables[checker + '_stdout'] = getattr(self, checker)
             self.callables[checker + '_stderr'] = getattr(self, checker)
         self.call_callables()
@@ -171,6 +294,69 @@ class OutputGoodBase(AllGoodBase):
                                                      self.stderr_strip)
         return super(OutputGoodBase, self).__str__()
 
+    @classmethod
+    def check_table(cls):
+        """
+        Return (cached) tuple of pattern-check names and method-check names
+        """
+        if cls.__dict__.get('_check_table') is None:
+            patterns = []
+            methods = []
+            for name in dir(cls):
+                if not name.endswith('_check'):
+                    continue
+                if isinstance(getattr(cls, name), PatternCheck):
+                    patterns.append(name)
+                else:
+                    methods.append(name)
+            cls._check_table = (tuple(patterns), tuple(methods))
+            cls._scanners = {}
+        return cls._check_table
+
+    @classmethod
+    def scanner(cls, names):
+        """
+        Return (cached) compiled regex matching any pattern-check in names
+
+        :param names: frozenset of pattern-check names
+        :return: Compiled regular expression, ``lastgroup`` is check name
+        """
+        cls.check_table()  # make sure cache exists for this class
+        regex = cls._scanners.get(names)
+        if regex is None:
+            alternatives = ['(?P<%s>%s)' % (name,
+                                            getattr(cls, name).scoped_pattern)
+                            for name in sorted(names)]
+            leads = [getattr(cls, name).lead for name in sorted(names)]
+            if None in leads:
+                regex = re.compile('|'.join(alternatives))
+            else:
+                # Cheap single-character test before trying any alternative
+                regex = re.compile('(?=%s)(?:%s)' % ('|'.join(leads),
+                                                     '|'.join(alternatives)))
+            cls._scanners[names] = regex
+        return regex
+
+    def call_callables(self):
+        """
+        Call method-checks, then scan each stream once for all pattern-checks
+        """
+        _results = {}
+        for name, call in list(self.callables.items()):
+            if callable(call) and name not in self.skip:
+                _results[name] = call(**self.callable_args(name))
+        for stream in ('stdout', 'stderr'):
+            scanner = self.scanners.get(stream)
+            if scanner is None:
+                skip = [name[:-len(stream) - 1] for name in self.skip
+                        if name.endswith('_' + stream)]
+                scanner = OutputScanner(self.__class__, skip)
+                scanner.check(getattr(self, stream + '_strip'))
+            for name, passed in list(scanner.results.items()):
+                if name + '_' + stream not in self.skip:
+                    _results[name + '_' + stream] = passed
+        self.results.update(self.prepare_results(_results))
+
     def callable_args(self, name):
         if name.endswith('_stdout'):
             return {'output': self.stdout_strip}
@@ -204,64 +390,32 @@ class OutputGood(OutputGoodBase):
     Container of standard checks, and one optional (nonprintables_check)
     """
 
-    @staticmethod
-    def crash_check(output):
-        """
-        Return False if Go panic string found in output
-
-        :param output: Stripped output string
-        :return: True if Go panic pattern **not** found
-        """
-        regex = re.compile(r'\s*panic:\s*.+error.*')
-        for line in output.splitlines():
-            if bool(regex.search(line.strip())):
-                return False  # panic message found
-        return True  # panic message not found
-
-    @staticmethod
-    def usage_check(output):
-        """
-        Return False if 'Docker usage' pattern found in output
-
-        :param output: Stripped output string
-        :return: True if usage message pattern **not** found
-        """
-        regex = re.compile(r'\s*usage:\s+docker\s+.*', re.IGNORECASE)
-        for line in output.splitlines():
-            if bool(regex.search(line.strip())):
-                return False  # usage message found
-        return True  # usage message not found
-
-    @staticmethod
-    def error_check(output):
-        """
-        Return False if 'Error: ' pattern found in output
-
-        :param output: Stripped output string
-        :return: True if 'Error: ' does **not** sppear
-        """
-        return output.lower().strip().find('error') == -1
+    #: Return False if Go panic string found in output
+    crash_check = PatternCheck(r'panic:[^\S\n]*.+error', lead='p',
+                               doc="Return False if Go panic string found "
+                                   "in output")
 
-    @staticmethod
-    def fata_check(output):
-        """
-        Return False if 'FATA[xxxx]' pattern found in output
+    #: Return False if 'Docker usage' pattern found in output
+    usage_check = PatternCheck(r'usage:[^\S\n]+docker[^\S\n]+\S',
+                               re.IGNORECASE, lead='[uU]',
+                               doc="Return False if 'Docker usage' pattern "
+                                   "found in output")
 
-        :param output: Stripped output string
-        :return: True if 'FATA ' does **not** sppear
-        """
-        regex = re.compile(r'FATA\[\d+')
-        return not bool(regex.search(output))
+    #: Return False if 'Error: ' pattern found in output
+    error_check = PatternCheck(r'error', re.IGNORECASE, lead='[eE]',
+                               doc="Return False if 'Error: ' pattern found "
+                                   "in output")
 
-    @staticmethod
-    def nonprintables_check(output):
-        """
-        Return False if non-printable characters are found in output.
+    #: Return False if 'FATA[xxxx]' pattern found in output
+    fata_check = PatternCheck(r'FATA\[\d+', lead='F',
+                              doc="Return False if 'FATA[xxxx]' pattern "
+                                  "found in output")
 
-        :note: Must be explicitly enabled by calling enable_nonprintables()
-        """
-        regex = re.compile(r"[^%s]" % re.escape(printable))
-        return not bool(regex.search(output))
+    #: Return False if non-printable characters are found in output.
+    nonprintables_check = PatternCheck(r"[^%s]" % re.escape(printable),
+                                       doc="Return False if non-printable "
+                                           "characters are found in output",
+                                       lead=r"[^%s]" % re.escape(printable))
 
 
 class OutputNotBad(OutputGood):
@@ -270,17 +424,8 @@ class OutputNotBad(OutputGood):
     Same as OutputGood, except only check for egregious, horrible problems.
     """
 
-    #: Full command line that outputs string to search for kernel oopses
-    GET_PANIC_CMD = ('journalctl --no-pager --all --reverse '
-                     '--dmesg --boot --priority=warning')
-
-    #: Kernel oops string to look for
-    OOPS_STRING = 'oops'
-
-    #: Caches output value from running GET_PANIC_CMD, None if Error
-    _dmesg_cache = None
-
-    def __init__(self, cmdresult, ignore_error=False, skip=None):
+    def __init__(self, cmdresult, ignore_error=False, skip=None,
+                 scanners=None):
         defaults = ['error_check', 'usage_check', 'nonprintables_check']
         if skip is None:
             skip = defaults
@@ -289,24 +434,24 @@ class OutputNotBad(OutputGood):
                 skip = defaults + [skip]
             else:
                 skip = defaults + skip
-        super(OutputNotBad, self).__init__(cmdresult, ignore_error, skip)
+        super(OutputNotBad, self).__init__(cmdresult, ignore_error, skip,
+                                           scanners)
 
-    def kernel_panic(self, output):
-        """
-        Checks output from ``GET_PANIC_CMD`` for ``OOPS_STRING``
+    @staticmethod
+    def kernel_panic(output, mark=0):
         """
-        del output  # not used
-        return self.dmesg.lower().strip().find(self.OOPS_STRING) == -1
+        Return False if kernel problems were logged since mark
 
-    @property
-    def dmesg(self):
-        """
-        Represents (cached) ``GET_PANIC_CMD`` output last obtained.
+        Not run as part of output checking (kernel log is host-wide state,
+        unrelated to any one command), call explicitly or use
+        ``SubBase.failif_kernel_problems()``.
+
+        :param output: Stripped output string (not used)
+        :param mark: Value from ``kernellog.mark()``, 0 for since job start
+        :return: True if no new oops/panic/hung-task messages were logged
         """
-        if self._dmesg_cache is None:
-            self._dmesg_cache = subprocess.check_output(self.GET_PANIC_CMD,
-                                                        shell=True)
-        return self._dmesg_cache
+        del output  # not used
+        return not kernellog.new_kernel_problems_since(mark)
 
 
 def wait_for_output(output_fn, pattern, timeout=60, timestep=0.2):
@@ -120,6 +120,89 @@ class BaseInterfaceTest(unittest.TestCase):
         self.assertRaises(self.DockerOutputError,
                           self.output.OutputGood, cmdresult)
 
+    def test_pattern_results(self):
+        cmdresult = FakeCmdResult('docker', 0, "FATA[0000] bad\nfoo",
+                                  "all\n  usage: docker foo\n", 123)
+        good = self.output.OutputGood(cmdresult, True, ['error_check'])
+        self.assertFalse(good)
+        self.assertFalse(good.results['fata_check_stdout'])
+        self.assertTrue(good.results['fata_check_stderr'])
+        self.assertTrue(good.results['usage_check_stdout'])
+        self.assertFalse(good.results['usage_check_stderr'])
+        self.assertTrue(good.results['crash_check_stdout'])
+        self.assertTrue('error_check_stdout' not in good.results)
+        # Still usable as plain functions
+        self.assertFalse(self.output.OutputGood.fata_check("FATA[0001]"))
+        self.assertTrue(self.output.OutputGood.usage_check("usage: docker"))
+
+    def test_mixed_checks(self):
+        class Mixed(self.output.OutputGood):
+
+            def actual_check(fake_self, output):
+                return fake_self.cmdresult.exit_status == 0
+        self.assertTrue(Mixed(self.good_cmdresult))
+        self.assertFalse(Mixed(self.bad_cmdresult, ignore_error=True))
+        self.assertEqual(len(Mixed(self.good_cmdresult).results), 12)
+
+    def test_not_bad(self):
+        from dockertest import kernellog
+        kernellog._monitor = kernellog.KernelLogMonitor(
+            kernellog.NullSource())
+        cmdresult = FakeCmdResult('docker', 1, "Error: nope",
+                                  "Usage: docker x")
+        self.assertTrue(self.output.OutputNotBad(cmdresult))
+
+    def test_not_bad_kernel(self):
+        from dockertest import kernellog
+        source = kernellog.NullSource()
+        kernellog._monitor = kernellog.KernelLogMonitor(source)
+        source.read = lambda: [(source.clock(), 1, 'Oops: 0002 [#1]')]
+        # Host-wide kernel log isn't part of checking command output
+        self.assertTrue(self.output.OutputNotBad(self.good_cmdresult))
+        self.assertFalse(self.output.OutputNotBad.kernel_panic(''))
+        source.read = lambda: []
+        mark = kernellog.mark()
+        self.assertTrue(self.output.OutputNotBad.kernel_panic('', mark))
+
+
+class OutputScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        import dockertest.output
+        self.output = dockertest.output
+
+    def test_chunked(self):
+        scanner = self.output.OutputScanner(self.output.OutputGood)
+        for chunk in ('foo\npa', 'nic: runtime er', 'ror\nFAT', 'A[00'):
+            scanner.feed(chunk)
+        self.assertFalse(scanner.results['crash_check'])
+        self.assertTrue(scanner.results['fata_check'])  # still partial
+        results = scanner.close()
+        self.assertFalse(results['fata_check'])
+        self.assertFalse(results['error_check'])
+        self.assertTrue(results['usage_check'])
+        self.assertTrue(results['nonprintables_check'])
+
+    def test_no_cross_line(self):
+        scanner = self.output.OutputScanner(self.output.OutputGood)
+        results = scanner.check("panic:\nerror")
+        self.assertTrue(results['crash_check'])
+        self.assertFalse(results['error_check'])
+
+    def test_skip(self):
+        scanner = self.output.OutputScanner(self.output.OutputGood,
+                                            ['error_check'])
+        self.assertFalse('error_check' in scanner.check("error\n"))
+
+    def test_prescanned(self):
+        scanner = self.output.OutputScanner(self.output.OutputGood)
+        scanner.check('FATA[0000] streamed')
+        scanners = {'stdout': scanner}
+        cmdresult = FakeCmdResult('docker', 0, "preview", "")
+        good = self.output.OutputGood(cmdresult, True, scanners=scanners)
+        self.assertFalse(good.results['fata_check_stdout'])
+        self.assertTrue(good.results['fata_check_stderr'])
+
 
 class DockerVersionTest(unittest.TestCase):
 
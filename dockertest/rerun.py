@@ -0,0 +1,103 @@
+"""
+Failed subtests and sub-subtests of a previous run, from it's status file
+
+A subtest which ran sub-subtests fails with the message
+``Sub-subtest failures: {...}``, naming those which did not complete
+(``start_subsubtests - final_subsubtests``).  Rerunning just those, plus
+any subtests which failed without such details, confirms or dismisses
+flakes in minutes rather than re-running everything.
+
+Resuming an interrupted run instead skips the steps it completed.
+"""
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os.path
+import re
+from .runtimes import subtest_name
+
+#: Statuses of END lines which are not failures
+PASSED = ('GOOD', 'TEST_NA')
+
+#: Matches message of SubSubtestCaller failure, capturing names set repr
+SUBSUBTEST_REGEX = re.compile(r'Sub-subtest failures: \{(?P<names>[^}]*)\}')
+
+
+def failed_tests(path):
+    """
+    Return list of (status name, messages) for tests failed in status file
+
+    Tests which started but never ended (e.g. job crashed) count as failed.
+
+    :param path: Path to autotest ``status`` file
+    :return: List in run order, messages from all status lines of test
+    """
+    messages = {}
+    order = []
+    failed = set()
+    with open(path) as status:
+        for line in status:
+            fields = line.strip().split('\t')
+            if len(fields) < 3 or fields[1] == '----':
+                continue
+            what, name = fields[0], fields[1]
+            if what == 'START':
+                order.append(name)
+                messages[name] = []
+                failed.add(name)  # Until END says otherwise
+            elif what.startswith('END '):
+                if what[4:] in PASSED:
+                    failed.discard(name)
+            elif name in messages:
+                messages[name] += fields[5:]
+    return [(name, messages[name]) for name in order if name in failed]
+
+
+def failed_subthings(resultdir, subtests='subtests'):
+    """
+    Return list of failed subtests, each followed by failed sub-subtests
+
+    :param resultdir: Results directory of a previous run
+    :param subtests: Name of subtests directory, as in control.ini
+    :raise IOError: If resultdir has no ``status`` file
+    """
+    subthings = []
+    for status_name, messages in failed_tests(os.path.join(resultdir,
+                                                           'status')):
+        name = subtest_name(status_name, subtests)
+        if name is None or name in subthings:
+            continue
+        subthings.append(name)
+        for message in messages:
+            mobj = SUBSUBTEST_REGEX.search(message)
+            if mobj is None:
+                continue
+            for subsub in sorted(re.findall(r"'([^']+)'",
+                                            mobj.group('names'))):
+                subthings.append('%s/%s' % (name, subsub))
+    return subthings
+
+
+def resume_skips(steps, completed, always=()):
+    """
+    Return list of step names to skip when resuming a run
+
+    Steps ran in order, so skipping stops at the first one not completed.
+    Steps in ``always`` (e.g. pretests setting up the daemon, images and
+    samplers, whose effects don't outlive the interrupted job) are run
+    again, and don't stop skipping of steps after them.
+
+    :param steps: Step names in run order
+    :param completed: Container of step names completed by resumed run
+    :param always: Container of step names which always run again
+    :return: Step names, in run order
+    """
+    skips = []
+    for step in steps:
+        if step in always:
+            continue
+        if step not in completed:
+            break
+        skips.append(step)
+    return skips
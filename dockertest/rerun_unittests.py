@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import os
+import shutil
+import tempfile
+import unittest
+
+STATUS = """START\t----\t----\ttimestamp=100\tlocaltime=Nov 14 15:19:08
+\tSTART\tdocker/pretests/log_versions.1\tdocker/pretests/log_versions.1\ttimestamp=100\tlocaltime=x
+\tEND FAIL\tdocker/pretests/log_versions.1\tdocker/pretests/log_versions.1\ttimestamp=101\tlocaltime=x
+\tSTART\tdocker/subtests/docker_cli/abc.2\tdocker/subtests/docker_cli/abc.2\ttimestamp=101\tlocaltime=x
+\t\tGOOD\tdocker/subtests/docker_cli/abc.2\tdocker/subtests/docker_cli/abc.2\ttimestamp=102\tlocaltime=x\tcompleted successfully
+\tEND GOOD\tdocker/subtests/docker_cli/abc.2\tdocker/subtests/docker_cli/abc.2\ttimestamp=102\tlocaltime=x
+\tSTART\tdocker/subtests/docker_cli/run.3\tdocker/subtests/docker_cli/run.3\ttimestamp=102\tlocaltime=x
+\t\tFAIL\tdocker/subtests/docker_cli/run.3\tdocker/subtests/docker_cli/run.3\ttimestamp=103\tlocaltime=x\tSub-subtest failures: {'run_true', 'run_names'}
+\tEND FAIL\tdocker/subtests/docker_cli/run.3\tdocker/subtests/docker_cli/run.3\ttimestamp=103\tlocaltime=x
+\tSTART\tdocker/intratests/garbage_check.3\tdocker/intratests/garbage_check.3\ttimestamp=103\tlocaltime=x
+\tEND GOOD\tdocker/intratests/garbage_check.3\tdocker/intratests/garbage_check.3\ttimestamp=103\tlocaltime=x
+\tSTART\tdocker/subtests/docker_cli/na.4\tdocker/subtests/docker_cli/na.4\ttimestamp=103\tlocaltime=x
+\tEND TEST_NA\tdocker/subtests/docker_cli/na.4\tdocker/subtests/docker_cli/na.4\ttimestamp=104\tlocaltime=x
+\tSTART\tdocker/subtests/docker_cli/build.5\tdocker/subtests/docker_cli/build.5\ttimestamp=104\tlocaltime=x
+\t\tERROR\tdocker/subtests/docker_cli/build.5\tdocker/subtests/docker_cli/build.5\ttimestamp=105\tlocaltime=x\tTimeout
+\tEND ERROR\tdocker/subtests/docker_cli/build.5\tdocker/subtests/docker_cli/build.5\ttimestamp=105\tlocaltime=x
+\tSTART\tdocker/subtests/docker_cli/crash.6\tdocker/subtests/docker_cli/crash.6\ttimestamp=105\tlocaltime=x
+"""
+
+
+class RerunTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import rerun
+        self.rerun = rerun
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        with open(os.path.join(self.tmpdir, 'status'), 'w') as status:
+            status.write(STATUS)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_failed_tests(self):
+        failed = self.rerun.failed_tests(os.path.join(self.tmpdir, 'status'))
+        self.assertEqual([name for name, _ in failed],
+                         ['docker/pretests/log_versions.1',
+                          'docker/subtests/docker_cli/run.3',
+                          'docker/subtests/docker_cli/build.5',
+                          'docker/subtests/docker_cli/crash.6'])
+        self.assertEqual(failed[2][1], ['Timeout'])
+
+    def test_failed_subthings(self):
+        self.assertEqual(self.rerun.failed_subthings(self.tmpdir),
+                         ['docker_cli/run',
+                          'docker_cli/run/run_names',
+                          'docker_cli/run/run_true',
+                          'docker_cli/build',
+                          'docker_cli/crash'])
+
+    def test_missing_status(self):
+        os.unlink(os.path.join(self.tmpdir, 'status'))
+        self.assertRaises(IOError, self.rerun.failed_subthings, self.tmpdir)
+
+    def test_resume_reruns_pretests(self):
+        steps = ['daemon_instance_start_1', 'docker_test_images_2',
+                 'abc_3', 'garbage_check_3', 'run_4', 'garbage_check_4',
+                 'build_5', 'garbage_check_5', 'log_runtimes_6']
+        pretests = steps[:2]
+        completed = steps[:5] + ['build_5']
+        skips = self.rerun.resume_skips(steps, completed, pretests)
+        self.assertEqual(skips, ['abc_3', 'garbage_check_3', 'run_4'])
+        queued = [step for step in steps if step not in skips]
+        self.assertEqual(queued[:2], pretests)
+
+    def test_resume_nothing_completed(self):
+        self.assertEqual(self.rerun.resume_skips(['a_1', 'b_2'], [], ['a_1']),
+                         [])
+
+
+if __name__ == '__main__':
+    unittest.main()
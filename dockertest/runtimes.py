@@ -0,0 +1,238 @@
+"""
+Historical runtime database of subtests, and balanced sharding by runtime
+
+After every run, durations of each subtest (from the job's ``status`` file)
+and each of it's sub-subtests (from ``SUBSUBTEST_FILE`` in the subtest's
+results directory) are merged into a small JSON database.  Those let
+a run's subtests be partitioned into shards of nearly equal total runtime,
+using longest-processing-time-first: subtests are taken longest first,
+each onto the shard with the least total so far.  Given identical
+databases and arguments, every node computes the same partition.
+
+:Note: This module must _NOT_ depend on anything in dockertest package or
+       in autotest!
+"""
+
+import json
+import os
+import re
+
+#: Name of file in subtest's results directory holding sub-subtest durations
+SUBSUBTEST_FILE = 'subsubtest_durations.json'
+
+#: Number of most recent durations kept per subtest/sub-subtest
+HISTORY = 5
+
+#: Seconds assumed for subtests without any recorded duration
+DEFAULT_SECONDS = 60.0
+
+#: Matches START/END lines of status file, with test name and timestamp
+STATUS_REGEX = re.compile(r'^\s*(?P<what>START|END \w+)\t(?P<name>[^\t]+)\t'
+                          r'.*\btimestamp=(?P<timestamp>\d+)')
+
+
+def subtest_name(status_name, subtests='subtests'):
+    """
+    Return subtest name from status file test name, or None if not a subtest
+
+    e.g. ``docker/subtests/docker_cli/version.3`` -> ``docker_cli/version``
+    """
+    marker = '/%s/' % subtests.strip('/')
+    if marker not in status_name:
+        return None
+    name = status_name.split(marker, 1)[1]
+    return name.rsplit('.', 1)[0]
+
+
+def parse_status(path):
+    """
+    Return list of (status name, seconds) for each test ended in status file
+    """
+    started = {}
+    durations = []
+    with open(path) as status:
+        for line in status:
+            mobj = STATUS_REGEX.match(line)
+            if mobj is None or mobj.group('name') == '----':
+                continue
+            name = mobj.group('name')
+            timestamp = int(mobj.group('timestamp'))
+            if mobj.group('what') == 'START':
+                started[name] = timestamp
+            elif name in started:
+                durations.append((name, timestamp - started.pop(name)))
+    return durations
+
+
+def parse_shard(args):
+    """
+    Return (K, N) from ``shard=K/N`` in args list, None if absent
+
+    :raise ValueError: If shard argument is malformed or K not in 1..N
+    """
+    for arg in args:
+        if not arg.startswith('shard='):
+            continue
+        index, _, count = arg[6:].partition('/')
+        index, count = int(index), int(count)
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError("Shard '%s' not in 1..%d" % (arg, count))
+        return index, count
+    return None
+
+
+def parse_pinned(csv):
+    """
+    Return mapping of subtest name to shard number from CSV of name:K
+    """
+    pinned = {}
+    for item in csv.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, index = item.partition(':')
+        pinned[name.strip()] = int(index or 1)
+    return pinned
+
+
+class RuntimeDB(object):
+
+    """
+    Recent durations of subtests and sub-subtests, persisted as JSON
+
+    :param path: Path to database file, created on ``save()``
+    """
+
+    def __init__(self, path):
+        self.path = path
+        #: Mapping of subtest name to list of recent seconds
+        self.subtests = {}
+        #: Mapping of sub-subtest name to list of recent seconds
+        self.subsubtests = {}
+        try:
+            with open(path) as dbfile:
+                content = json.load(dbfile)
+            self.subtests = content['subtests']
+            self.subsubtests = content['subsubtests']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        """
+        Atomically replace database file with current content
+        """
+        tmp_path = '%s.%d' % (self.path, os.getpid())
+        with open(tmp_path, 'w') as dbfile:
+            json.dump({'subtests': self.subtests,
+                       'subsubtests': self.subsubtests}, dbfile, indent=1,
+                      sort_keys=True)
+        os.rename(tmp_path, self.path)
+
+    @staticmethod
+    def record(durations, name, seconds):
+        """
+        Add seconds to history of name in durations mapping
+        """
+        history = durations.setdefault(name, [])
+        history.append(round(float(seconds), 3))
+        del history[:-HISTORY]
+
+    def record_run(self, resultdir, subtests='subtests'):
+        """
+        Record durations of all subtests and sub-subtests run in resultdir
+
+        :return: Number of durations recorded
+        """
+        count = 0
+        for status_name, seconds in parse_status(os.path.join(resultdir,
+                                                              'status')):
+            name = subtest_name(status_name, subtests)
+            if name is None:
+                continue
+            self.record(self.subtests, name, seconds)
+            count += 1
+            try:
+                with open(os.path.join(resultdir, status_name, 'results',
+                                       SUBSUBTEST_FILE)) as subsubfile:
+                    subsubs = json.load(subsubfile)
+            except (IOError, OSError, ValueError):
+                continue
+            for subsub, subsub_seconds in sorted(subsubs.items()):
+                self.record(self.subsubtests, '%s/%s' % (name, subsub),
+                            subsub_seconds)
+                count += 1
+        return count
+
+    @staticmethod
+    def seconds(durations, name):
+        """
+        Return mean recent duration of name, or None if never recorded
+        """
+        history = durations.get(name)
+        if not history:
+            return None
+        return sum(history) / len(history)
+
+    def estimate(self, subtest, excluded=(), default=None):
+        """
+        Return expected seconds for subtest, minus excluded sub-subtests
+
+        :param subtest: Subtest name
+        :param excluded: Sub-subtest names which will not run
+        :param default: Seconds when unknown, None for median of all
+                        known subtests (or ``DEFAULT_SECONDS``)
+        """
+        seconds = self.seconds(self.subtests, subtest)
+        if seconds is None:
+            if default is not None:
+                return default
+            return self.median()
+        prefix = subtest + '/'
+        for subsub in excluded:
+            if subsub.startswith(prefix):
+                seconds -= self.seconds(self.subsubtests, subsub) or 0.0
+        return max(seconds, 0.0)
+
+    def median(self):
+        """
+        Return median mean-duration of all subtests, or DEFAULT_SECONDS
+        """
+        known = sorted(self.seconds(self.subtests, name)
+                       for name in self.subtests)
+        if not known:
+            return DEFAULT_SECONDS
+        return known[len(known) // 2]
+
+    def shards(self, subtests, count, pinned=None, excluded=()):
+        """
+        Partition subtests into count lists of nearly equal total runtime
+
+        Pinned subtests are placed on their designated shard first, the
+        rest longest first onto the shard with the smallest total.  Each
+        shard keeps the order subtests were given in.
+
+        :param subtests: List of subtest names in run order
+        :param count: Number of shards
+        :param pinned: Mapping of subtest name to shard number (1..count)
+        :param excluded: Sub-subtest names which will not run
+        :return: List of count lists of subtest names
+        """
+        if pinned is None:
+            pinned = {}
+        order = dict((name, index) for index, name in enumerate(subtests))
+        totals = [0.0] * count
+        assigned = [[] for _ in range(count)]
+        estimates = dict((name, self.estimate(name, excluded))
+                         for name in subtests)
+        for name in subtests:
+            if name in pinned:
+                index = (pinned[name] - 1) % count
+                totals[index] += estimates[name]
+                assigned[index].append(name)
+        # Ties broken by run order, so partition is deterministic
+        for name in sorted((name for name in subtests if name not in pinned),
+                           key=lambda name: (-estimates[name], order[name])):
+            index = totals.index(min(totals))
+            totals[index] += estimates[name]
+            assigned[index].append(name)
+        return [sorted(names, key=order.get) for names in assigned]
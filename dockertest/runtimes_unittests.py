@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+# Pylint runs from a different directory, it's fine to import this way
+# pylint: disable=W0403
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+STATUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                      'test_results2junit.d', '02complete', 'status')
+
+
+class RuntimesTest(unittest.TestCase):
+
+    def setUp(self):
+        from dockertest import runtimes
+        self.runtimes = runtimes
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.db_path = os.path.join(self.tmpdir, 'runtimes.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_subtest_name(self):
+        name = self.runtimes.subtest_name
+        self.assertEqual(name('docker/subtests/docker_cli/version.3'),
+                         'docker_cli/version')
+        self.assertEqual(name('docker/pretests/docker_test_images.1'), None)
+
+    def test_parse_status(self):
+        self.assertEqual(self.runtimes.parse_status(STATUS),
+                         [('docker/subtests/docker_cli/abc.1', 240),
+                          ('docker/subtests/docker_cli/failtest.2', 30),
+                          ('docker/subtests/docker_cli/na.3', 2)])
+
+    def test_parse_shard(self):
+        parse_shard = self.runtimes.parse_shard
+        self.assertEqual(parse_shard(['x=foo', 'shard=2/3']), (2, 3))
+        self.assertEqual(parse_shard(['docker_cli/version']), None)
+        for bad in ('shard=0/3', 'shard=4/3', 'shard=1/0', 'shard=1',
+                    'shard=a/b'):
+            self.assertRaises(ValueError, parse_shard, [bad])
+
+    def test_parse_pinned(self):
+        self.assertEqual(self.runtimes.parse_pinned(' a/b:2, c/d ,'),
+                         {'a/b': 2, 'c/d': 1})
+
+    def test_record_run(self):
+        resultdir = os.path.join(self.tmpdir, 'results')
+        abc = os.path.join(resultdir, 'docker/subtests/docker_cli/abc.1',
+                           'results')
+        os.makedirs(abc)
+        shutil.copy(STATUS, resultdir)
+        with open(os.path.join(abc, self.runtimes.SUBSUBTEST_FILE),
+                  'w') as subsubs:
+            json.dump({'one': 200.0, 'two': 30.0}, subsubs)
+        rtdb = self.runtimes.RuntimeDB(self.db_path)
+        self.assertEqual(rtdb.record_run(resultdir), 5)
+        rtdb.save()
+        rtdb = self.runtimes.RuntimeDB(self.db_path)
+        self.assertEqual(rtdb.subtests['docker_cli/abc'], [240.0])
+        self.assertEqual(rtdb.subsubtests['docker_cli/abc/one'], [200.0])
+        self.assertEqual(rtdb.estimate('docker_cli/abc'), 240.0)
+        self.assertEqual(rtdb.estimate('docker_cli/abc',
+                                       ['docker_cli/abc/one']), 40.0)
+        # Median of 2, 30 and 240
+        self.assertEqual(rtdb.estimate('docker_cli/unknown'), 30.0)
+        self.assertEqual(rtdb.estimate('docker_cli/unknown', default=1), 1)
+
+    def test_history(self):
+        rtdb = self.runtimes.RuntimeDB(self.db_path)
+        for seconds in range(self.runtimes.HISTORY + 3):
+            rtdb.record(rtdb.subtests, 'a', seconds)
+        self.assertEqual(len(rtdb.subtests['a']), self.runtimes.HISTORY)
+        self.assertEqual(rtdb.subtests['a'][-1],
+                         self.runtimes.HISTORY + 2)
+
+    def test_empty_median(self):
+        rtdb = self.runtimes.RuntimeDB(self.db_path)
+        self.assertEqual(rtdb.median(), self.runtimes.DEFAULT_SECONDS)
+
+    def test_shards_balanced(self):
+        rtdb = self.runtimes.RuntimeDB(self.db_path)
+        seconds = dict(a=50, b=40, c=30, d=20, e=10, f=10)
+        for name, value in seconds.items():
+            rtdb.record(rtdb.subtests, name, value)
+        names = sorted(seconds)
+        shards = rtdb.shards(names, 2)
+        self.assertEqual(sorted(sum(shards, [])), names)
+        totals = [sum(seconds[name] for name in shard) for shard in shards]
+        self.assertEqual(totals, [80, 80])
+        # Run order kept, result deterministic
+        for shard in shards:
+            self.assertEqual(shard, sorted(shard))
+        self.assertEqual(rtdb.shards(names, 2), shards)
+
+    def test_shards_pinned(self):
+        rtdb = self.runtimes.RuntimeDB(self.db_path)
+        for name in 'abcd':
+            rtdb.record(rtdb.subtests, name, 10)
+        shards = rtdb.shards(list('abcd'), 2, pinned={'a': 2, 'b': 2})
+        self.assertEqual(shards, [['c', 'd'], ['a', 'b']])
+
+    def test_shards_more_than_subtests(self):
+        rtdb = self.runtimes.RuntimeDB(self.db_path)
+        shards = rtdb.shards(['a'], 3)
+        self.assertEqual(sorted(shards), [[], [], ['a']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,11 @@ loading the specified configuration section (see `configuration module`_)
 # Pylint runs from a different directory, it's fine to import this way
 # pylint: disable=W0403
 
+import time
+#: Private, time this module started importing, see ``IMPORT_SECONDS``
+_IMPORT_STARTED = time.time()
+# pylint: disable=C0413
+import json
 import tempfile
 import os.path
 import imp
@@ -23,12 +28,17 @@ from autotest.client import test
 from . import version
 from . import config
 from . import subtestbase
+from . import runtimes
+from . import catalog
+from . import kernellog
+from . import daemonsampler
 from .xceptions import DockerTestFail
 from .xceptions import DockerTestNAError
 from .xceptions import DockerTestError
 from .xceptions import DockerSubSubtestNAError
 from dockertest.environment import selinux_is_enforcing
 import dockertest.docker_daemon as docker_daemon
+# pylint: enable=C0413
 
 
 class Subtest(subtestbase.SubBase, test.test):
@@ -68,6 +78,12 @@ class Subtest(subtestbase.SubBase, test.test):
                 bases.add(cini.get('pretests', 'pretests'))
                 bases.add(cini.get('intratests', 'intratests'))
                 bases.add(cini.get('posttests', 'posttests'))
+            # Precomputed, unless any test module or config changed
+            kinds = sorted(bases) or catalog.KINDS
+            found = catalog.load(config.PARENTDIR, kinds).name_of(self.bindir)
+            if found is not None:
+                return found[1]
+            # Not a cataloged test (e.g. outside control file's tree)
             testpath = os.path.abspath(self.bindir)
             testpath = os.path.normpath(testpath)
             dirlist = testpath.split('/')
@@ -101,12 +117,21 @@ class Subtest(subtestbase.SubBase, test.test):
             if self.version is None:
                 # Version number used by one-time setup() test.test method
                 self.version = version.str2int(self.config['config_version'])
+            # Point docker client at this job's private daemon, if any
+            instance = docker_daemon.current_instance()
+            if instance is not None:
+                self.config['docker_options'] = instance.client_options(
+                    self.config['docker_options'])
 
         def _init_logging():  # private, no docstring pylint: disable=C0111
             # Log original key/values before subtest could modify them
             self.write_test_keyval(self.config)
 
         super(Subtest, self).__init__(*args, **dargs)
+        # Kernel log marks are valid across all steps of the job
+        kernellog.configure(os.path.join(self.job.resultdir,
+                                         kernellog.STATE_FILENAME))
+        daemonsampler.configure(self.job.resultdir)
         _init_config()
         _init_logging()
         # Optionally setup different iterations if option exists
@@ -134,13 +159,21 @@ class Subtest(subtestbase.SubBase, test.test):
         self.log_step_msg('setup')
 
     def initialize(self):
+        started = time.time()
         super(Subtest, self).initialize()
+        # Neither changes during a job, only check them once for all steps
+        memo_path = os.path.join(self.job.resultdir, version.MEMO_FILENAME)
         # Fail test if autotest is too old
-        version.check_autotest_version(self.config, get_version())
+        version.check_autotest_version(self.config,
+                                       version.memoized(memo_path,
+                                                        'autotest_version',
+                                                        get_version))
         # Fail test if configuration being used doesn't match dockertest API
         version.check_version(self.config)
         # Fail test if dockertest API does not match documentation version
-        version.check_doc_version()
+        version.check_doc_version(memo_path)
+        # First step starts kernel log monitoring for whole job
+        kernellog.start()
         # These two are unique to subtest & runtime state
         self.step_log_msgs['setup'] = ("setup() for subtest version %s"
                                        % self.version)
@@ -149,9 +182,33 @@ class Subtest(subtestbase.SubBase, test.test):
             % (self.iteration, self.iterations))
         mode = selinux_is_enforcing()
         if mode and self.config.get('verify_enforcing', True):
-            self.failif(not selinux_is_enforcing(),
+            self.failif(not mode,
                         "SELinux mode != Enforcing and"
                         " verify_enforcing is set")
+        self.check_startup(time.time() - started)
+
+    def check_startup(self, initialize_seconds):
+        """
+        Record startup profile, fail if over ``startup_budget`` (when set)
+
+        :param initialize_seconds: Time taken by ``initialize()`` (so far)
+        """
+        profile = {'startup_import_seconds': round(IMPORT_SECONDS, 3),
+                   'startup_initialize_seconds': round(initialize_seconds,
+                                                       3)}
+        self.write_test_keyval(profile)
+        total = IMPORT_SECONDS + initialize_seconds
+        self.logdebug("Startup took %0.3f seconds (%0.3f importing, %0.3f "
+                      "initializing)", total, IMPORT_SECONDS,
+                      initialize_seconds)
+        budget = self.config.get('startup_budget')
+        if budget in (None, ''):
+            return
+        self.failif(total > float(budget),
+                    "Startup took %0.3f seconds (%0.3f importing, %0.3f "
+                    "initializing), over startup_budget of %s seconds"
+                    % (total, IMPORT_SECONDS, initialize_seconds, budget),
+                    DockerTestError)
 
     def postprocess_iteration(self):
         """
@@ -352,6 +409,8 @@ class SubSubtestCaller(Subtest):
         self.start_subsubtests = {}
         self.final_subsubtests = set()
         self.exception_info = {}
+        #: Mapping of subsubtest name to seconds spent on all it's stages
+        self.subsubtest_durations = {}
 
     def initialize(self):
         """
@@ -465,6 +524,7 @@ class SubSubtestCaller(Subtest):
             # pylint: disable=W0703
             # Guarantee cleanup() runs even if autotest exception
             self.start_subsubtests[name] = subsubtest
+            started = time.time()
             try:
                 self.try_all_stages(name, subsubtest)
             except Exception:
@@ -479,6 +539,8 @@ class SubSubtestCaller(Subtest):
                                       detail)
                     raise TestError("Sub-subtest %s cleanup"
                                     " failures: %s" % (name, detail))
+                finally:
+                    self.subsubtest_durations[name] = time.time() - started
         else:
             pass  # Assume a message was already logged
 
@@ -496,8 +558,24 @@ class SubSubtestCaller(Subtest):
             self.logwarning("No sub-subtests configured to run "
                             "for subtest %s" % self.config_section)
         else:
-            for name in self.subsubtest_names:
-                self.run_all_stages(name, self.new_subsubtest(name))
+            try:
+                for name in self.subsubtest_names:
+                    self.run_all_stages(name, self.new_subsubtest(name))
+            finally:
+                self.write_subsubtest_durations()
+
+    def write_subsubtest_durations(self):
+        """
+        Save ``subsubtest_durations`` for the run-time database (see
+        ``runtimes`` module)
+        """
+        path = os.path.join(self.resultsdir, runtimes.SUBSUBTEST_FILE)
+        try:
+            with open(path, 'w') as durations:
+                json.dump(self.subsubtest_durations, durations)
+        except (IOError, OSError) as xcept:
+            self.logwarning("Could not save sub-subtest durations: %s",
+                            xcept)
 
     def postprocess(self):
         """
@@ -756,3 +834,7 @@ class SubSubtestCallerSimultaneous(SubSubtestCaller):
         if cleanup_failures:
             raise DockerTestError("Sub-subtest cleanup failures: %s"
                                   % cleanup_failures)
+
+
+#: Seconds taken to import this module, including any modules it needed
+IMPORT_SECONDS = time.time() - _IMPORT_STARTED
@@ -15,6 +15,8 @@ from .xceptions import DockerTestFail
 from .xceptions import DockerTestNAError
 from .config import CONFIGCUSTOMS, get_as_list
 from .environment import docker_rpm
+from . import kernellog
+from . import daemonsampler
 
 
 def known_failures_file():
@@ -233,7 +235,13 @@ class SubBase(object):
     def log_step_msg(self, stepname):
         """
         Send message stored in ``step_log_msgs`` key ``stepname`` to loginfo
+
+        Also notes the step as current activity, for kernel log attribution
+        and tagging of docker daemon resource samples.
         """
+        label = "%s %s" % (self.__class__.__name__, stepname)
+        kernellog.note(label)
+        daemonsampler.note(label)
         msg = self.step_log_msgs.get(stepname)
         if msg:
             self.loginfo(msg)
@@ -281,6 +289,21 @@ class SubBase(object):
         spec = "{}: expected " + arg + "; got " + arg
         raise xcept(spec.format(reason, expected, actual))
 
+    @staticmethod
+    def failif_kernel_problems(mark=0, xcept=DockerTestFail):
+        """
+        Convenience method for subtests and intratests to fail if kernel
+        oops/panic/hung-task messages were logged since mark.  Nothing
+        checks the (host-wide) kernel log unless this is called.
+
+        :param mark: Value from ``kernellog.mark()``, 0 for since job start
+        :raise DockerTestFail: If any kernel problems were logged
+        """
+        problems = kernellog.new_kernel_problems_since(mark)
+        if problems:
+            raise xcept("Kernel problems logged: %s"
+                        % '; '.join([str(problem) for problem in problems]))
+
     @staticmethod
     def failif_not_in(needle, haystack, description=None,
                       xcept=DockerTestFail):
@@ -15,6 +15,7 @@ also match (less the REVIS number).
 # Pylint runs from a different directory, it's fine to import this way
 # pylint: disable=W0403
 
+import json
 import sys
 import os.path
 import logging
@@ -53,6 +54,9 @@ MYDIR = os.path.dirname(sys.modules[__name__].__file__)
 #: Parent directory of directory containing this module
 PARENTDIR = os.path.dirname(MYDIR)
 
+#: Name of file (in job's results directory) memoizing checks for the run
+MEMO_FILENAME = 'version_checks.json'
+
 def cmp(a, b):
     return (a > b) - (a < b)
 
@@ -124,6 +128,37 @@ def compare(lhs, rhs):
                          "tuple, or number")
 
 
+def memoized(memo_path, key, function):
+    """
+    Return ``function()``, or it's result stored under key in memo_path
+
+    Results are only stored when memo_path can be written, steps of the same
+    job then share them instead of each repeating the work.
+
+    :param memo_path: Path to JSON file of stored results, None to not store
+    :param key: String identifying function and everything it depends on
+    :param function: Callable returning a JSON-able result
+    """
+    if memo_path is None:
+        return function()
+    try:
+        with open(memo_path) as memo_file:
+            memo = json.load(memo_file)
+    except (IOError, OSError, ValueError):
+        memo = {}
+    if key in memo:
+        return memo[key]
+    memo[key] = result = function()
+    tmp_path = '%s.%d' % (memo_path, os.getpid())
+    try:
+        with open(tmp_path, 'w') as memo_file:
+            json.dump(memo, memo_file, indent=1, sort_keys=True)
+        os.rename(tmp_path, memo_path)
+    except (IOError, OSError):
+        pass
+    return result
+
+
 def get_doc_version():
     """
     Parse version string from conf.py module w/o importing it.
@@ -139,11 +174,24 @@ def get_doc_version():
     return None
 
 
-def check_doc_version():
+def check_doc_version(memo_path=None):
     """
     Compare Dockertest API version to documentation version, fail if greater
+
+    :param memo_path: Optional ``memoized()`` file, re-parsing ``conf.py``
+                      only when it changed.
     """
-    doc_version = get_doc_version()
+    conf_path = os.path.join(PARENTDIR, 'conf.py')
+    try:
+        stat = os.stat(conf_path)
+        key = 'doc_version %s %d %d' % (conf_path, stat.st_mtime_ns,
+                                        stat.st_size)
+    except OSError:
+        key = None
+    if key is None:
+        doc_version = get_doc_version()
+    else:
+        doc_version = memoized(memo_path, key, get_doc_version)
     msg = ("Dockertest API version %s is greater than "
            "documentation version %s" % (STRING, doc_version))
     # OK if docs are later version than API
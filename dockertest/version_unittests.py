@@ -3,7 +3,10 @@
 # Pylint runs from a different directory, it's fine to import this way
 # pylint: disable=W0403
 
+import os
+import shutil
 import sys
+import tempfile
 import types
 import unittest
 
@@ -137,5 +140,48 @@ class VersionTest(VersionTestBase):
         self.assertEqual(self.__counter, 1, "logging.warn was not used while "
                          "checking version with NOVERSIONCHECK")
 
+
+class MemoizedTest(VersionTestBase):
+
+    def setUp(self):
+        super(MemoizedTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp(self.__class__.__name__)
+        self.memo_path = os.path.join(self.tmpdir,
+                                      self.version.MEMO_FILENAME)
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def function(self):
+        self.calls += 1
+        return self.version.STRING
+
+    def test_memoized(self):
+        for _ in range(3):
+            self.assertEqual(self.version.memoized(self.memo_path, 'key',
+                                                   self.function),
+                             self.version.STRING)
+        self.assertEqual(self.calls, 1)
+        self.version.memoized(self.memo_path, 'other', self.function)
+        self.assertEqual(self.calls, 2)
+
+    def test_not_stored(self):
+        for memo_path in (None, os.path.join(self.tmpdir, 'no', 'dir')):
+            self.version.memoized(memo_path, 'key', self.function)
+            self.version.memoized(memo_path, 'key', self.function)
+        self.assertEqual(self.calls, 4)
+
+    def test_check_doc_version(self):
+        get_doc_version = self.version.get_doc_version
+        try:
+            self.version.get_doc_version = self.function
+            self.version.check_doc_version(self.memo_path)
+            self.version.check_doc_version(self.memo_path)
+        finally:
+            self.version.get_doc_version = get_doc_version
+        self.assertEqual(self.calls, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
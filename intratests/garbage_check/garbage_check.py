@@ -8,19 +8,33 @@ images from the local registry.
 Operational Summary
 ----------------------
 
-#. Check for unexpected running containers
-#. Kill unexpected running containers
-#. Remove unexpected containers
-#. Remove unexpected images
+#. List containers and images once
+#. Compare against inventory saved after the previous check, anything
+   new (and not preserved) is attributed to the subtest just run.
+#. Remove unexpected containers (one command)
+#. Remove unexpected images (one command)
+#. Remove unexpected <none> images (one command)
+#. List again only if anything was removed, save as inventory for the
+   next check.  Leftovers which couldn't be removed are saved with the
+   subtest they came from, every later check retries removing them and
+   warns they're still present.
+#. Fail if kernel oops/panic/hung-task messages were logged since the
+   previous check (or job start).
 
 Prerequisites
 ---------------
 
 Customized configuration listing expected containers and images.
+Idle ``ContainerPool`` containers are always expected.
 """
 
+import json
+import os.path
+from autotest.client.shared import error
+from dockertest import kernellog
 from dockertest.subtest import SubSubtestCaller
 from dockertest.subtest import SubSubtest
+from dockertest.containers import ContainerPool
 from dockertest.containers import DockerContainers
 from dockertest.images import DockerImage
 from dockertest.images import DockerImages
@@ -31,10 +45,15 @@ class DockerImageIncomplete(DockerImage):
 
     """Instances may have long_id, created, or size set to cls.UNKNOWN"""
 
+    __slots__ = ()
+
     UNKNOWN = "unknown"
 
+    # Overriding __eq__ would otherwise make instances unhashable
+    __hash__ = DockerImage.__hash__
+
     def __init__(self, repo, tag, long_id, created, size,
-                 repo_addr=None, user=None):
+                 repo_addr=None, user=None, short_id=None):
         dargs = {'long_id': long_id, 'created': created, 'size': size}
         for key, value in list(dargs.items()):
             if value is None:
@@ -45,6 +64,9 @@ class DockerImageIncomplete(DockerImage):
         dargs['repo_addr'] = repo_addr
         dargs['user'] = user
         super(DockerImageIncomplete, self).__init__(**dargs)
+        # Possible only short ID is available
+        if short_id is not None and self.long_id == self.UNKNOWN:
+            object.__setattr__(self, '_short_id', short_id)
 
     def cmp_id(self, image_id):
         if self.long_id == self.__class__.UNKNOWN:
@@ -60,7 +82,7 @@ class DockerImageIncomplete(DockerImage):
                 return self.cmp_greedy(other.repo, other.tag,
                                        other.repo_addr, other.user)
             return False
-        return super(DockerImageIncomplete, self.__eq__(other))
+        return super(DockerImageIncomplete, self).__eq__(other)
 
     @classmethod
     def prob_is_fqin(cls, fqin_or_id):
@@ -84,23 +106,139 @@ class DockerImageIncomplete(DockerImage):
         return fqin_score > 0
 
 
+class Inventory(object):
+
+    """
+    Container names and images from one listing, re-listed only when stale
+
+    :param dc: DockerContainers instance
+    :param di: DockerImages instance
+    """
+
+    def __init__(self, dc, di):
+        self.dc = dc
+        self.di = di
+        self._cnames = None
+        self._images = None
+
+    @property
+    def cnames(self):
+        """
+        List of all container names
+        """
+        if self._cnames is None:
+            self._cnames = self.dc.list_container_names()
+        return self._cnames
+
+    @property
+    def images(self):
+        """
+        List of all DockerImage-like instances
+        """
+        if self._images is None:
+            self._images = self.di.list_imgs()
+        return self._images
+
+    def stale(self, cnames=False, images=False):
+        """
+        Mark container names and/or images as changed since listing
+        """
+        if cnames:
+            self._cnames = None
+        if images:
+            self._images = None
+
+    @staticmethod
+    def image_key(img):
+        """
+        Return string uniquely identifying image name and ID
+        """
+        return "%s@%s" % (img.full_name, img.long_id)
+
+    def snapshot(self):
+        """
+        Return JSON-compatible representation of current inventory
+        """
+        return {'cnames': sorted(self.cnames),
+                'images': sorted(self.image_key(img) for img in self.images)}
+
+
 class garbage_check(SubSubtestCaller):
     # This runs between EVERY subtest, okay, to be more quiet.
     step_log_msgs = {}
 
+    #: Name of inventory file in job results directory
+    snapshot_name = 'garbage_check_inventory.json'
+
     def initialize(self):
         super(garbage_check, self).initialize()
         # Some runtime messages are added
         self.step_log_msgs = {}
-
-
-class Base(SubSubtest):
-
-    # This runs between EVERY subtest, okay, to be more quiet.
-    step_log_msgs = {}
+        self.stuff['dc'] = dc = DockerContainers(self)
+        self.stuff['di'] = di = DockerImages(self)
+        di.DICLS = DockerImageIncomplete
+        self.stuff['inventory'] = Inventory(dc, di)
+        default_image = self.fuzzy_img(di.default_image)
+        self.stuff['default_image'] = default_image
+        preserve_images = [default_image]
+        for fqin_or_id in get_as_list(self.config['preserve_fqins']):
+            preserve_images.append(self.fuzzy_img(fqin_or_id))
+        self.stuff['preserve_images'] = preserve_images
+        # Images found in inventory are matched exactly by hash, only those
+        # with an unknown ID need (greedy) comparison to every image.
+        self.stuff['preserve_fuzzy'] = [img for img in preserve_images
+                                        if img.long_id == img.UNKNOWN]
+        self.stuff['preserve_exact'] = set(img for img in preserve_images
+                                           if img.long_id != img.UNKNOWN)
+        preserve_cnames = set(get_as_list(self.config['preserve_cnames']))
+        self.stuff['preserve_cnames'] = preserve_cnames
+        self.stuff['previous'] = previous = self.load_snapshot()
+        # Sub-subtest name to mapping of unremoved leftover to culprit
+        if previous is None:
+            self.stuff['garbage'] = {}
+        else:
+            self.stuff['garbage'] = previous['garbage']
+        self.stuff['culprit'] = self.culprit()
+
+    @property
+    def snapshot_path(self):
+        """
+        Path to inventory saved by previous check (in same job)
+        """
+        return os.path.join(self.job.resultdir, self.snapshot_name)
+
+    def load_snapshot(self):
+        """
+        Return inventory saved by previous check, or None on first check
+        """
+        try:
+            with open(self.snapshot_path) as snapshot_file:
+                previous = json.load(snapshot_file)
+        except (IOError, OSError, ValueError):
+            return None
+        return {'cnames': set(previous['cnames']),
+                'images': set(previous['images']),
+                'garbage': previous.get('garbage', {})}
+
+    def culprit(self):
+        """
+        Return tagged name of subtest run just before this check
+        """
+        # Intratests have the same tag as the subtest they follow
+        tag = getattr(self, 'tagged_testname', '').rpartition('.')[2]
+        if tag:
+            myname = self.__class__.__name__ + '.'
+            for name in sorted(os.listdir(self.job.resultdir)):
+                if name.endswith('.' + tag) and not name.startswith(myname):
+                    return name
+        return "prior test"
 
     def fuzzy_img(self, fqin_or_id):
-        di = self.sub_stuff['di']
+        """
+        Return image from inventory matching fqin_or_id, or an incomplete one
+        """
+        di = self.stuff['di']
+        images = self.stuff['inventory'].images
         repo = None
         tag = None
         repo_addr = None
@@ -111,8 +249,7 @@ class Base(SubSubtest):
         size = None
         if DockerImageIncomplete.prob_is_fqin(fqin_or_id):
             # Greedy match (i.e. doesn't compare None values)
-            imgs = di.filter_list_full_name(di.list_imgs(),
-                                            fqin_or_id)
+            imgs = di.filter_list_full_name(images, fqin_or_id)
             if len(imgs) == 1:  # found it
                 return imgs[0]
             # Retrieve known infos
@@ -120,7 +257,7 @@ class Base(SubSubtest):
              repo_addr,
              user) = DockerImageIncomplete.split_to_component(fqin_or_id)
         else:
-            imgs = di.list_imgs_with_image_id(fqin_or_id)
+            imgs = [img for img in images if img.cmp_id(fqin_or_id)]
             if len(imgs) == 1:  # found it
                 return imgs[0]
             if len(fqin_or_id) == 12:
@@ -128,161 +265,215 @@ class Base(SubSubtest):
             else:
                 long_id = fqin_or_id
         # Create an instance w/ whatever info. is available
-        img = DockerImageIncomplete(repo, tag, long_id, created, size,
-                                    repo_addr, user)
-        # Possible only short ID is available
-        if short_id is not None and img.short_id == img.UNKNOWN:
-            img.short_id = short_id
-        return img
+        return DockerImageIncomplete(repo, tag, long_id, created, size,
+                                     repo_addr, user, short_id)
 
-    def initialize(self):
-        super(Base, self).initialize()
-        self.step_log_msgs = {}
-        self.sub_stuff['dc'] = DockerContainers(self)
-        self.sub_stuff['di'] = di = DockerImages(self)
-        di.DICLS = DockerImageIncomplete
+    def postprocess(self):
+        super(garbage_check, self).postprocess()
+        # Kernel log is host-wide, only checked here between subtests
+        self.failif_kernel_problems(kernellog.checked())
+
+    def cleanup(self):
+        super(garbage_check, self).cleanup()
+        # Starting point for next check (even after failure), listing
+        # again only if anything was removed.
+        if 'inventory' in self.stuff:
+            snapshot = self.stuff['inventory'].snapshot()
+            # Forget leftovers removed since
+            present = set(snapshot['cnames']) | set(snapshot['images'])
+            garbage = self.stuff.get('garbage', {})
+            snapshot['garbage'] = dict(
+                (kind, dict((key, culprit)
+                            for key, culprit in list(leftovers.items())
+                            if key in present))
+                for kind, leftovers in list(garbage.items()))
+            with open(self.snapshot_path, 'w') as snapshot_file:
+                json.dump(snapshot, snapshot_file)
 
-        default_image = self.fuzzy_img(di.default_image)
-        self.sub_stuff['default_image'] = default_image
 
-        # Can't use set of DockerImageIncomplete -> it's mutable
-        preserve_images = [default_image]
-        for fqin_or_id in get_as_list(self.config['preserve_fqins']):
-            preserve_images.append(self.fuzzy_img(fqin_or_id))
-        self.sub_stuff['preserve_images'] = preserve_images
+class Base(SubSubtest):
 
-        preserve_cnames = set(get_as_list(self.config['preserve_cnames']))
-        self.sub_stuff['preserve_cnames'] = preserve_cnames
+    # This runs between EVERY subtest, okay, to be more quiet.
+    step_log_msgs = {}
+
+    def initialize(self):
+        super(Base, self).initialize()
+        self.step_log_msgs = {}
+        # All sub-subtests share parent's inventory
+        self.sub_stuff.update(self.parent_subtest.stuff)
         self.sub_stuff['fail_containers'] = False
         self.sub_stuff['fail_images'] = False
 
-    def postprocess(self):
-        super(Base, self).postprocess()
-        dc = self.sub_stuff['dc']
-        preserve_cnames = self.sub_stuff['preserve_cnames']
-        leftover_containers = set(dc.list_container_names()) - preserve_cnames
-        if leftover_containers:
-            fail_containers = ("Found leftover containers "
-                               "from prior test: %s"
-                               % leftover_containers)
-            self.sub_stuff['fail_containers'] = fail_containers
-
-        di = self.sub_stuff['di']
-        preserve_images = self.sub_stuff['preserve_images']
-        leftover_images = [img for img in di.list_imgs()
-                           if img not in preserve_images]
-        if leftover_images:
-            fail_images = ("Found leftover images "
-                           "from prior test: %s"
-                           % (leftover_images))
-            self.sub_stuff['fail_images'] = fail_images
-        # Let subclasses perform the actual failing (or not)
+    def leftover_cnames(self):
+        """
+        Return set of new container names not preserved, nor idle in pool
+        """
+        cnames = set(name for name in self.sub_stuff['inventory'].cnames
+                     if not ContainerPool.is_idle_name(name))
+        cnames -= self.sub_stuff['preserve_cnames']
+        previous = self.sub_stuff['previous']
+        if previous is not None:
+            cnames -= previous['cnames']
+        return cnames
+
+    def leftover_images(self):
+        """
+        Return list of new images not preserved
+        """
+        previous = self.sub_stuff['previous']
+        preserve_exact = self.sub_stuff['preserve_exact']
+        preserve_fuzzy = self.sub_stuff['preserve_fuzzy']
+        return [img for img in self.sub_stuff['inventory'].images
+                if img not in preserve_exact and
+                not any(fuzzy == img for fuzzy in preserve_fuzzy) and
+                (previous is None or
+                 Inventory.image_key(img) not in previous['images'])]
+
+    def garbage(self):
+        """
+        Return mapping of this kind's unremoved leftovers to their culprit
+        """
+        return self.sub_stuff['garbage'].setdefault(self.__class__.__name__,
+                                                    {})
+
+    def add_garbage(self, keys):
+        """
+        Remember keys as unremoved leftovers from current culprit
+        """
+        for key in keys:
+            self.garbage()[key] = self.sub_stuff['culprit']
+
+    def report_garbage(self, keys, what):
+        """
+        Warn each of keys, unremoved by an earlier check, is still present
+        """
+        for key in sorted(keys):
+            self.logwarning("Leftover %s from %s still present: %s",
+                            what, self.garbage()[key], key)
+
+    def garbage_images(self):
+        """
+        Return list of images unremoved by an earlier check
+        """
+        return [img for img in self.sub_stuff['inventory'].images
+                if Inventory.image_key(img) in self.garbage()]
+
+    @staticmethod
+    def is_none(img):
+        """
+        Return True if img is a <none> (untagged) image
+        """
+        return img.repo is None or not img.repo or img.repo == '<none>'
+
+    def remove(self, subcmd, names, what, garbage=()):
+        """
+        Remove all names with one docker command, logging each
+
+        :param subcmd: ``rm`` or ``rmi`` plus options
+        :param names: List of container/image names or IDs to remove
+        :param what: Description for logging
+        :param garbage: List of names or IDs unremoved by an earlier check,
+                        to try again
+        """
+        if not (names or garbage) or not self.config['remove_garbage']:
+            return False
+        for name in names:
+            self.logwarning("Removing %s from %s: %s", what,
+                            self.sub_stuff['culprit'], name)
+        for name in garbage:
+            self.logdebug("Retrying removal of %s: %s", what, name)
+        try:
+            self.sub_stuff['dc'].docker_cmd("%s %s" % (subcmd, " ".join(
+                list(names) + list(garbage))))
+        except error.CmdError:
+            pass  # Removal was the goal, leftovers are checked after
+        return True
+
+    def fail_or_warn(self, msg):
+        """
+        Fail with msg (if not False), or only warn, as configured
+        """
+        if not msg:
+            return
+        if not self.config['fail_on_unremoved']:
+            # No test failure, but maybe a warning
+            self.logwarning(msg)
+        else:
+            # Value is it's own failure message
+            self.failif(msg, msg)
 
 
 class containers(Base):
 
     def run_once(self):
         super(containers, self).run_once()
-        preserve_cnames = self.sub_stuff['preserve_cnames']
-
-        dc = self.sub_stuff['dc']
-        dc.remove_args = '--force=true --volumes=true'
-        for name in set(dc.list_container_names()) - preserve_cnames:
-            if not self.config['remove_garbage']:
-                continue
-            self.logwarning("Removing left behind container: %s",
-                            name)
-            try:
-                dc.remove_by_name(name)
-            except (ValueError, KeyError):
-                pass  # Removal was the goal
-        # Don't presume what others methods will do with this instance
-        dc.remove_args = DockerContainers.remove_args
+        garbage = sorted(name for name in self.sub_stuff['inventory'].cnames
+                         if name in self.garbage())
+        if self.remove('rm --force=true --volumes=true',
+                       sorted(self.leftover_cnames()), "leftover container",
+                       garbage):
+            self.sub_stuff['inventory'].stale(cnames=True)
 
     def postprocess(self):
-        # identify cleanup failures in base class
         super(containers, self).postprocess()
-        if not self.config['fail_on_unremoved']:
-            if self.sub_stuff['fail_containers']:
-                # No test failure, but maybe a warning
-                self.logwarning(self.sub_stuff['fail_containers'])
-        else:
-            self.failif(self.sub_stuff['fail_containers'],
-                        # Value is it's own failure message
-                        self.sub_stuff['fail_containers'])
+        cnames = self.sub_stuff['inventory'].cnames
+        self.report_garbage([name for name in cnames
+                             if name in self.garbage()], "container")
+        leftover_containers = self.leftover_cnames()
+        self.add_garbage(leftover_containers)
+        if leftover_containers:
+            self.sub_stuff['fail_containers'] = (
+                "Found leftover containers from %s: %s"
+                % (self.sub_stuff['culprit'], leftover_containers))
+        self.fail_or_warn(self.sub_stuff['fail_containers'])
 
 
 class images(Base):
 
     def run_once(self):
         super(images, self).run_once()
-        preserve_images = self.sub_stuff['preserve_images']
-        di = self.sub_stuff['di']
-        di.remove_args = '--force=true'
-        leftover_images = [img for img in di.list_imgs()
-                           if img not in preserve_images]
-        for img in leftover_images:
-            # another sub-subtest will take care of <none> images
-            if img.repo == '' or img.repo is None:
-                continue
-            if not self.config['remove_garbage']:
-                continue
-            self.logwarning("Removing left behind: %s", img)
-            try:
-                di.remove_image_by_image_obj(img)
-            except (ValueError, KeyError):
-                pass  # Removal was the goal
-        # Don't presume what others methods will do with this instance
-        di.remove_args = DockerImages.remove_args
+        # another sub-subtest will take care of <none> images
+        names = [img.full_name for img in self.leftover_images()
+                 if not self.is_none(img)]
+        garbage = [img.full_name for img in self.garbage_images()]
+        if self.remove('rmi --force=true', names, "leftover image", garbage):
+            self.sub_stuff['inventory'].stale(images=True)
 
     def postprocess(self):
-        # identify cleanup failures in base class
         super(images, self).postprocess()
-        if not self.config['fail_on_unremoved']:
-            if self.sub_stuff['fail_images']:
-                self.logwarning(self.sub_stuff['fail_images'])
-        else:
-            self.failif(self.sub_stuff['fail_images'],
-                        # Value is it's own failure message
-                        self.sub_stuff['fail_images'])
+        self.report_garbage([Inventory.image_key(img)
+                             for img in self.garbage_images()], "image")
+        leftover_images = [img for img in self.leftover_images()
+                           if not self.is_none(img)]
+        self.add_garbage(Inventory.image_key(img) for img in leftover_images)
+        if leftover_images:
+            self.sub_stuff['fail_images'] = (
+                "Found leftover images from %s: %s"
+                % (self.sub_stuff['culprit'], leftover_images))
+        self.fail_or_warn(self.sub_stuff['fail_images'])
 
 
 class nones(Base):
 
     def run_once(self):
         super(nones, self).run_once()
-        preserve_images = self.sub_stuff['preserve_images']
-        di = self.sub_stuff['di']
-        di.remove_args = '--force=true'
-        leftover_images = [img for img in di.list_imgs()
-                           if img not in preserve_images]
-        for img in leftover_images:
-            if img.repo is not None and img.repo and img.repo != '<none>':
-                continue
-            if not self.config['remove_garbage']:
-                continue
-            self.logwarning("Removing leftover <none> image: %s", img)
-            try:
-                di.remove_image_by_id(img.short_id)
-            except (ValueError, KeyError):
-                pass  # Removal was the goal
-        # Don't presume what others methods will do with this instance
-        di.remove_args = DockerImages.remove_args
+        ids = sorted(set(img.short_id for img in self.leftover_images()
+                         if self.is_none(img)))
+        garbage = sorted(set(img.short_id for img in self.garbage_images()))
+        if self.remove('rmi --force=true', ids, "leftover <none> image",
+                       garbage):
+            self.sub_stuff['inventory'].stale(images=True)
 
     def postprocess(self):
-        # No super-call, this method is different
-        di = self.sub_stuff['di']
-        preserve_images = self.sub_stuff['preserve_images']
-        leftover_images = [img for img in di.list_imgs()
-                           if (img not in preserve_images and
-                               img.repo == '' or img.repo is None)]
+        super(nones, self).postprocess()
+        self.report_garbage([Inventory.image_key(img)
+                             for img in self.garbage_images()],
+                            "<none> image")
+        leftover_images = [img for img in self.leftover_images()
+                           if self.is_none(img)]
+        self.add_garbage(Inventory.image_key(img) for img in leftover_images)
         if leftover_images:
-            fail_images = ("Found leftover <none>'s "
-                           "from prior test: %s"
-                           % (leftover_images))
-            # Just in case?
-            self.sub_stuff['fail_images'] = fail_images
-            if not self.config['fail_on_unremoved']:
-                self.logwarning(fail_images)
-            else:
-                self.failif(fail_images, fail_images)
+            self.sub_stuff['fail_images'] = (
+                "Found leftover <none>'s from %s: %s"
+                % (self.sub_stuff['culprit'], leftover_images))
+        self.fail_or_warn(self.sub_stuff['fail_images'])
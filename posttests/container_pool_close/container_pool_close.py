@@ -0,0 +1,32 @@
+r"""
+Summary
+-------
+
+Remove all ``ContainerPool`` containers at the end of the run
+
+Operational Summary
+-------------------
+
+#. Wait for any background pool refill to finish
+#. Remove every idle pooled container, running or not
+#. Remove any leased pooled container never released
+
+Prerequisites
+-------------
+
+None, when ``container_pool_size`` is 0 and no subtest leased a
+container there is nothing to remove.
+"""
+
+from dockertest import subtest
+from dockertest.containers import ContainerPool
+
+
+class container_pool_close(subtest.Subtest):
+
+    def run_once(self):
+        super(container_pool_close, self).run_once()
+        removed = ContainerPool(self).close(leased=True)
+        for name in removed:
+            self.logdebug("Removed pooled container %s", name)
+        self.loginfo("Removed %d pooled containers", len(removed))
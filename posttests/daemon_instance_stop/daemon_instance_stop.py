@@ -0,0 +1,36 @@
+r"""
+Summary
+-------
+
+Stop this job's private docker daemon instance, started by the
+``daemon_instance_start`` pretest.
+
+Operational Summary
+-------------------
+
+#. Stop dockerd instance, killing it after a timeout
+#. Remove instance's bridge interface
+
+Prerequisites
+-------------
+
+The ``daemon_instance_start`` pretest ran.
+"""
+
+from dockertest import subtest
+from dockertest import docker_daemon
+from dockertest.xceptions import DockerTestNAError
+
+
+class daemon_instance_stop(subtest.Subtest):
+
+    def run_once(self):
+        super(daemon_instance_stop, self).run_once()
+        instance = docker_daemon.current_instance()
+        if instance is None:
+            raise DockerTestNAError("No private dockerd instance selected")
+        if not instance.stop(self.config['stop_timeout']):
+            self.logwarning("dockerd instance %d was not running",
+                            instance.index)
+        else:
+            self.loginfo("Stopped dockerd instance %d", instance.index)
@@ -0,0 +1,45 @@
+r"""
+Summary
+-------
+
+Stop sampling docker daemon resource usage, and summarize changes
+during each step.
+
+Operational Summary
+-------------------
+
+#. Stop the sampler process started by ``daemon_sampler_start`` pretest
+#. Write per-step deltas of every sampled counter to a sysinfo CSV file
+#. Log steps during which the daemon gained the most threads and
+   file descriptors
+
+Prerequisites
+-------------
+
+The ``daemon_sampler_start`` pretest ran.
+"""
+
+import os.path
+from dockertest import subtest
+from dockertest import daemonsampler
+from dockertest.xceptions import DockerTestNAError
+
+
+class daemon_sampler_stop(subtest.Subtest):
+
+    def run_once(self):
+        super(daemon_sampler_stop, self).run_once()
+        if not daemonsampler.stop():
+            self.logwarning("Sampler process was not running")
+        sysinfodir = self.job.sysinfo.sysinfodir
+        samples = os.path.join(sysinfodir, self.config['samples_filename'])
+        if not os.path.isfile(samples):
+            raise DockerTestNAError("No samples found at %s" % samples)
+        deltas = daemonsampler.write_step_deltas(
+            samples, os.path.join(sysinfodir, self.config['deltas_filename']))
+        for field in ('threads', 'fds'):
+            if not deltas:
+                break
+            worst = max(deltas, key=lambda delta, fld=field: delta[fld])
+            self.loginfo("Largest %s increase %d during %s",
+                         field, worst[field], worst['step'] or 'startup')
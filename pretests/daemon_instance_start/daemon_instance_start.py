@@ -0,0 +1,44 @@
+r"""
+Summary
+-------
+
+Start this job's private docker daemon instance, when one was selected
+with ``--args dockerd=K``.
+
+Operational Summary
+-------------------
+
+#. Stop instance if left running by a previous job
+#. Create instance's bridge interface
+#. Start dockerd with it's own data-root, exec-root, socket and bridge
+#. Wait for it to answer API requests on it's socket
+
+Prerequisites
+-------------
+
+``dockerd`` binary, ``ip`` command, and a bridge subnet
+(``172.31.K.0/24``) not otherwise in use on the host.
+"""
+
+from dockertest import subtest
+from dockertest import docker_daemon
+from dockertest.xceptions import DockerTestNAError
+
+
+class daemon_instance_start(subtest.Subtest):
+
+    def run_once(self):
+        super(daemon_instance_start, self).run_once()
+        instance = docker_daemon.current_instance()
+        if instance is None:
+            raise DockerTestNAError("No private dockerd instance selected, "
+                                    "testing system docker daemon")
+        if instance.stop(remove_bridge=False):
+            self.logwarning("Stopped dockerd instance %d left running by "
+                            "previous job", instance.index)
+        pid = instance.start(self.config['dockerd_path'],
+                             self.config['dockerd_args'].split(),
+                             self.config['start_timeout'])
+        self.loginfo("Started dockerd instance %d (PID %d) on %s, "
+                     "data under %s", instance.index, pid, instance.host,
+                     instance.root)
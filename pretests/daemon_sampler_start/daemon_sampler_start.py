@@ -0,0 +1,46 @@
+r"""
+Summary
+-------
+
+Start sampling docker daemon resource usage, in the background, for
+the entire run.
+
+Operational Summary
+-------------------
+
+#. Find docker daemon process ID
+#. Start detached sampler process, appending to a sysinfo CSV file
+#. Samples are tagged with the step running when they were taken,
+   the ``daemon_sampler_stop`` posttest stops sampling and
+   summarizes changes per step.
+
+Prerequisites
+-------------
+
+Readable ``/proc/<pid>`` for the docker daemon process.
+"""
+
+import os.path
+from dockertest import subtest
+from dockertest import daemonsampler
+from dockertest import docker_daemon
+
+
+class daemon_sampler_start(subtest.Subtest):
+
+    def run_once(self):
+        super(daemon_sampler_start, self).run_once()
+        if daemonsampler.stop():
+            self.logwarning("Stopped sampler left running by previous run")
+        try:
+            pid = docker_daemon.pid()
+        except (RuntimeError, ValueError) as xcept:
+            self.logwarning("Docker daemon PID unknown, sampler will look "
+                            "for a dockerd process: %s", xcept)
+            pid = None
+        output = os.path.join(self.job.sysinfo.sysinfodir,
+                              self.config['samples_filename'])
+        sampler_pid = daemonsampler.start(output, pid,
+                                          self.config['interval'])
+        self.loginfo("Sampler process %d writing to %s every %s seconds",
+                     sampler_pid, output, self.config['interval'])
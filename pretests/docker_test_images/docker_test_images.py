@@ -8,9 +8,16 @@ Operational Summary
 ----------------------
 
 #. Parse the default test image into FQIN format
-#. Pull the default, and any configured ``extra_fqins_csv`` images
-#. Build any ``build_dockerfile`` w/ ``build_name`` images.
-#. Log a listing of all current images to debug and a sysinfo file
+#. Restore any missing images from ``image_cache_dir`` (if configured)
+#. Pull the default, and any configured ``extra_fqins_csv`` images,
+   up to ``pull_workers`` at a time.
+#. Build any ``build_dockerfile`` w/ ``build_name`` images, each starting
+   as soon as the images it's ``Dockerfile`` is ``FROM`` are pulled
+   (after all pulls, if the ``Dockerfile`` isn't local).
+#. Save pulled images to ``image_cache_dir`` (if configured)
+#. Log a listing of all current images to debug and a sysinfo file,
+   and the seconds taken and resulting image size (as reported by
+   ``docker inspect``, not bytes transferred) for each pull/build to another.
 #. Optionally, update ``config_defaults/defaults.ini`` (if it exists)
    to preserve all pulled images.  Configured by ``update_defaults_ini``
    option (default: False)
@@ -23,11 +30,16 @@ within the testing timeout period.  If it is to be updated with pulled images,
 the file ``config_defaults/defaults.ini`` must exist.
 """
 
+import asyncio
+import collections
 import os.path
+import time
 from dockertest.subtest import SubSubtestCaller
 from dockertest.subtest import SubSubtest
 from dockertest.images import DockerImages
+from dockertest.images import ImageCache
 from dockertest.dockercmd import DockerCmd
+from dockertest.dockercmd import DockerCmdEngine
 from dockertest.config import Config
 from dockertest.config import get_as_list
 from dockertest.config import CONFIGCUSTOMS
@@ -35,6 +47,105 @@ from dockertest.config import ConfigSection
 from dockertest.output.validate import mustpass
 
 
+def dockerfile_bases(dockerfile):
+    """
+    Return set of images a local Dockerfile (or it's directory) is FROM
+
+    :param dockerfile: Path or URL given to ``docker build``
+    :return: set of image names, or None if they can't be determined
+    """
+    if os.path.isdir(dockerfile):
+        dockerfile = os.path.join(dockerfile, 'Dockerfile')
+    if not os.path.isfile(dockerfile):
+        return None  # URL, tarball, git repository, etc.
+    bases = set()
+    with open(dockerfile) as dockerfile_file:
+        for line in dockerfile_file:
+            words = line.split()
+            if len(words) > 1 and words[0].upper() == 'FROM':
+                bases.add(words[1])
+    return bases
+
+
+class ImagePipeline(object):
+
+    """
+    Pull and build images concurrently, builds waiting for their base images
+
+    :param subtest: A subtest.SubBase or subclass instance
+    :param fqins: List of image names to pull
+    :param builds: Mapping of image name to build to it's dockerfile
+    :param build_opts: List of extra ``docker build`` options
+    :param workers: Max number of pulls/builds to run at once
+    """
+
+    def __init__(self, subtest, fqins, builds, build_opts, workers):
+        self.subtest = subtest
+        self.fqins = fqins
+        self.builds = builds
+        self.build_opts = build_opts
+        self.engine = DockerCmdEngine(workers)
+        #: Mapping of image name to (command, DockerCmd, seconds)
+        self.results = collections.OrderedDict()
+        self._done = None
+
+    async def _execute(self, name, command, subargs):
+        dkrcmd = DockerCmd(self.subtest, command, subargs)
+        start = time.time()
+        try:
+            await self.engine.run(dkrcmd)
+        finally:
+            seconds = time.time() - start
+            self.results[name] = (command, dkrcmd, seconds)
+            self._done[name].set()
+        if dkrcmd.cmdresult is None:
+            exit_status = None
+        else:
+            exit_status = dkrcmd.cmdresult.exit_status
+        self.subtest.loginfo("Finished %s %s in %0.2f seconds (exit %s)",
+                             command, name, seconds, exit_status)
+
+    async def pull(self, fqin):
+        """
+        Coroutine pulling fqin
+        """
+        await self._execute(fqin, 'pull', [fqin])
+
+    async def build(self, name, dockerfile):
+        """
+        Coroutine building name once all it's (known) bases are present
+        """
+        bases = dockerfile_bases(dockerfile)
+        if bases is None:  # Wait for everything
+            bases = set(self.fqins)
+        waitfor = [base for base in bases
+                   if base in self._done and base != name]
+        self.subtest.logdebug("Build of %s waiting for %s", name, waitfor)
+        for base in waitfor:
+            await self._done[base].wait()
+        await self._execute(name, 'build',
+                            self.build_opts + ['-t', name, dockerfile])
+
+    async def run_all(self):
+        """
+        Coroutine running all pulls and builds concurrently
+        """
+        self._done = dict((name, asyncio.Event())
+                          for name in list(self.fqins) + list(self.builds))
+        await asyncio.gather(*([self.pull(fqin) for fqin in self.fqins] +
+                               [self.build(name, dockerfile)
+                                for name, dockerfile
+                                in list(self.builds.items())]))
+
+    def execute(self):
+        """
+        Run all pulls and builds, return list of their ``CmdResult``
+        """
+        asyncio.run(self.run_all())
+        return [dkrcmd.cmdresult
+                for _, dkrcmd, _ in list(self.results.values())]
+
+
 class docker_test_images(SubSubtestCaller):
     """
     Pull, optionally build, log present image details, then update defaults.ini
@@ -54,6 +165,21 @@ class docker_test_images(SubSubtestCaller):
         # Optional, could be {None: None}
         self.stuff['build'] = {self.config.get('build_name'):
                                self.config.get('build_dockerfile')}
+        # Mapping of image name to (command, seconds, inspect Size)
+        self.stuff['timing'] = collections.OrderedDict()
+
+    def write_timing(self):
+        """
+        Write seconds and resulting image size for each pull/build to sysinfo
+        """
+        with open(os.path.join(self.job.sysinfo.sysinfodir,
+                               'docker_images_timing'), 'w') as info_file:
+            for name, (command, seconds, size) in list(
+                    self.stuff['timing'].items()):
+                line = ("%s %s: %0.2f seconds, image size %s bytes"
+                        % (command, name, seconds, size))
+                info_file.write("%s\n" % line)
+                self.loginfo(line)
 
     def postprocess(self):
         # File in top-level 'results/default/sysinfo' directory
@@ -62,6 +188,7 @@ class docker_test_images(SubSubtestCaller):
             for img in self.stuff['di'].list_imgs():
                 info_file.write("%s\n" % str(img))
                 self.loginfo(str(img))
+        self.write_timing()
         # Hopefully not a TOCTOU race with initialize()
         if self.stuff['update'] and self.stuff['fqins']:
             # These /are/ the customized defaults, don't re-default them
@@ -89,31 +216,87 @@ class docker_test_images(SubSubtestCaller):
         super(docker_test_images, self).postprocess()
 
 
-class puller(SubSubtest):
-    """Pull the default docker image if not present on system"""
+def pending_builds(stuff):
+    """
+    Return mapping of images to build, not already in stuff['timing']
+    """
+    return dict((name, dockerfile)
+                for name, dockerfile in list(stuff['build'].items())
+                if name is not None and name not in stuff['timing'])
+
+
+class pipeline_base(SubSubtest):
+    """Common code for running an ``ImagePipeline``"""
+
+    def run_pipeline(self, fqins, builds):
+        """
+        Pull fqins and build builds, recording timing in parent's stuff
+        """
+        subopts = get_as_list(self.config.get('build_opts_csv', ''))
+        pipeline = ImagePipeline(self, fqins, builds, subopts,
+                                 int(self.config.get('pull_workers', 4)))
+        try:
+            cmdresults = pipeline.execute()
+        finally:
+            self.record_timing(pipeline.results)
+        for cmdresult in cmdresults:
+            mustpass(cmdresult)
+
+    def record_timing(self, results):
+        """
+        Add seconds and image size for each of results to parent's stuff
+
+        :note: Size is the image's ``docker inspect`` ``.Size``, which
+               includes any layers already present before the pull/build.
+        """
+        stuff = self.parent_subtest.stuff
+        names = [name for name, (_, dkrcmd, _) in list(results.items())
+                 if dkrcmd.cmdresult is not None and
+                 dkrcmd.cmdresult.exit_status == 0]
+        sizes = {}
+        if names:
+            # One line per image, in argument order
+            cmdresult = DockerCmd(self, 'inspect',
+                                  ["--format='{{.Size}}'"] + names).execute()
+            if cmdresult.exit_status == 0:
+                sizes = dict(list(zip(names, cmdresult.stdout.split())))
+        for name, (command, _, seconds) in list(results.items()):
+            stuff['timing'][name] = (command, seconds, sizes.get(name, '?'))
+            if command == 'build' and name in sizes:
+                stuff['fqins'].append(name)
+
+
+class puller(pipeline_base):
+    """
+    Pull images if not present on system, concurrently, also starting
+    any builds as soon as the images they're based on are pulled.
+    """
 
     def run_once(self):
         super(puller, self).run_once()
         # Using parent instance's stuff, not sub_stuff for simplicity
-        for fqin in self.parent_subtest.stuff['fqins']:
-            if not fqin:
-                continue
-            self.loginfo("Pulling %s", fqin)
-            # TODO: Support pulling/verifying with atomic command
-            mustpass(DockerCmd(self, 'pull', [fqin]).execute())
+        stuff = self.parent_subtest.stuff
+        fqins = [fqin for fqin in stuff['fqins'] if fqin]
+        cache = None
+        if self.config.get('image_cache_dir', '').strip():
+            cache = ImageCache(self)
+            restored = cache.restore(fqins)
+            self.loginfo("Restored %s from image cache", restored)
+            pull_fqins = [fqin for fqin in fqins if fqin not in restored]
+        else:
+            pull_fqins = fqins
+        self.loginfo("Pulling %s", pull_fqins)
+        # TODO: Support pulling/verifying with atomic command
+        self.run_pipeline(pull_fqins, pending_builds(stuff))
+        if cache is not None:
+            self.loginfo("Saved %s to image cache", cache.save(fqins))
 
 
-class builder(SubSubtest):
-    """Build ``build_dockerfile`` with tag ``build_name`` if defined"""
+class builder(pipeline_base):
+    """Build ``build_dockerfile`` with tag ``build_name`` if not yet built"""
 
     def run_once(self):
         super(builder, self).run_once()
-        if None in self.parent_subtest.stuff['build']:
-            return
-        subopts = get_as_list(self.config.get('build_opts_csv', []))
-        stuff = self.parent_subtest.stuff
-        # Someday we might support building more than one
-        for name, dockerfile in list(stuff['build'].items()):
-            this_subopts = subopts + ['-t', name, dockerfile]
-            mustpass(DockerCmd(self, 'build', this_subopts).execute())
-            stuff['fqins'] += list(stuff['build'].keys())
+        builds = pending_builds(self.parent_subtest.stuff)
+        if builds:
+            self.run_pipeline([], builds)
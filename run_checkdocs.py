@@ -2,10 +2,15 @@
 """
 Verify all subtests contain required minimum sections, ini's doc all options
 """
+import collections
 import os
 import re
 import sys
 import docutils.nodes
+from dockertest import catalog
+from dockertest import doccache
+from dockertest import docdeps
+from dockertest import documentation
 from dockertest.documentation import SubtestDoc
 from dockertest.documentation import PretestDoc
 from dockertest.documentation import IntratestDoc
@@ -57,6 +62,7 @@ def make_USCI(base_class):
 
         def __init__(self, subtest_path):
             self.docitems = tuple()
+            self.unconfigured = False
             self.defaults = DefaultDoc()
             super(UndocSubtestConfigItems, self).__init__(subtest_path)
 
@@ -76,8 +82,7 @@ def make_USCI(base_class):
 
         def conv(self, input_string):
             if not isinstance(self.docitems, ConfigINIParser):
-                print('Warning: No configuration found for: %s'
-                       % self.name(self.subtest_path))
+                self.unconfigured = True  # Reported by caller
                 return ''
             # Supplied by tuple-subclass
             undoc_option_doc = self.docitems.undoc_option_doc
@@ -109,6 +114,28 @@ def make_USCI(base_class):
     return UndocSubtestConfigItems
 
 
+#: Outcome of checking one test module, as cached
+CheckResult = collections.namedtuple('CheckResult',
+                                     ['sections', 'undoc_options',
+                                      'unconfigured'])
+
+
+def check_module(args):
+    """
+    Return JSON-able check results of one test module (for process pools)
+
+    :param args: Tuple of ``SubtestDoc`` (sub)class and test module path
+    """
+    cls, subtest_path = args
+    subtestdocsec = make_SDS(cls)(subtest_path)
+    # Output doesn't matter, only sections instance attr. value
+    str(subtestdocsec)
+    undoc_subtest_config_items = make_USCI(cls)(subtest_path)
+    undocumented = str(undoc_subtest_config_items)
+    return [subtestdocsec.sections, undocumented or None,
+            undoc_subtest_config_items.unconfigured]
+
+
 class SubtestsDocumented(object):
 
     """
@@ -118,8 +145,15 @@ class SubtestsDocumented(object):
     sec_order = ('summary', 'operational summary', 'operational detail',
                  'prerequisites')
 
-    def __init__(self, path='.'):
-        """ Location of the subtests.rst directory """
+    def __init__(self, path='.', cache_dir=None, processes=None):
+        """
+        Location of the subtests.rst directory, directory to cache each
+        module's results (None to check all) and number of processes
+        checking modules (None for number of CPUs).
+        """
+        self.path = path
+        self.cache_dir = cache_dir
+        self.processes = processes
         try:
             self.doc = open(os.path.join(path, 'subtests.rst')).read()
         except IOError:
@@ -145,16 +179,20 @@ class SubtestsDocumented(object):
         """ Check directories found by cls """
         dir_tests = cls.module_filenames()
         err = False
-        for dir_item in dir_tests:
+        checked = [dir_item for dir_item in dir_tests
+                   if cls.name(dir_item).find('example') == -1]
+        jobs = [(self.cache_key(cls, dir_item), (cls, dir_item))
+                for dir_item in checked]
+        if self.cache_dir is None:
+            cache = None
+        else:
+            cache = doccache.FragmentCache(self.cache_dir)
+        results = doccache.render_all(check_module, jobs, cache,
+                                      self.processes)
+        for dir_item, result in zip(checked, results):
             # Order of checks (below) is significant
             name = cls.name(dir_item)
-            if name.find('example') > -1:
-                continue
-            SDS_class = make_SDS(cls)
-            subtestdocsec = SDS_class(dir_item)
-            # Output doesn't matter, only sections instance attr. value
-            str(subtestdocsec)
-
+            subtestdocsec = CheckResult(*result)
             missing_sections = self.missing_sections(subtestdocsec)
             if missing_sections is not None:
                 err = True
@@ -176,13 +214,30 @@ class SubtestsDocumented(object):
                        % (name, out_of_order,
                           # Index is zero-based
                           self.sec_order.index(out_of_order) + 1))
-            undoc_options = self.undoc_options(dir_item, cls)
+            if subtestdocsec.unconfigured:
+                print('Warning: No configuration found for: %s' % name)
+            undoc_options = subtestdocsec.undoc_options
             if undoc_options is not None:
                 err = True
                 print("%s: Undocumented configuration option(s): %s"
                        % (name, undoc_options))
         return err, dir_tests
 
+    def cache_key(self, cls, subtest_path):
+        """
+        Return key identifying every source check results of module depend on
+        """
+        base_path = os.path.abspath(self.path)
+        ini_path = catalog.load(base_path).ini(cls.name(subtest_path))
+        defaults_path = os.path.join(base_path, 'config_defaults',
+                                     'defaults.ini')
+        sources = [subtest_path, ini_path, defaults_path,
+                   os.path.abspath(__file__)]
+        sources += [os.path.splitext(module.__file__)[0] + '.py'
+                    for module in (docdeps, documentation)]
+        return doccache.content_hash(sources, 'checkdocs', cls.__name__,
+                                     self.sec_order)
+
     def check_missing_tests(self, dir_tests):
         """ Checks missing tests """
         doc_tests = set(re.findall(r'``([^`\n]+)`` Sub-test\n===', self.doc))
@@ -242,18 +297,9 @@ class SubtestsDocumented(object):
                 del sectidx[sec]  # Remove from min()
         return None
 
-    @staticmethod
-    def undoc_options(subtest_path, cls):
-        USCI_class = make_USCI(cls)
-        undoc_subtest_config_items = USCI_class(subtest_path)
-        undocumented = str(undoc_subtest_config_items)
-        if undocumented:
-            return undocumented
-        else:
-            return None
-
 
 if __name__ == "__main__":
-    STATUS = SubtestsDocumented().check()
+    STATUS = SubtestsDocumented(
+        cache_dir=os.path.join('docs_build', 'doccache')).check()
     if STATUS:
         sys.exit(-1)
@@ -5,7 +5,9 @@ Summary
 Simple tests that check the the ``docker cp`` command.  The ``simple``
 subtest verifies content creation and exact match after cp.  The
 ``every_last`` subtest verifies copying many hundreds of files from a
-stopped container to the host.  The ``volume_mount`` subtest verifies
+stopped container to the host.  It's ``copy_mode`` and ``copy_workers``
+options select per-file ``docker cp`` (optionally in parallel) or one
+streamed archive of all files.  The ``volume_mount`` subtest verifies
 https://github.com/docker/docker/issues/27773
 
 Operational Summary
@@ -21,7 +23,6 @@ Prerequisites
    structure.
 """
 
-from io import BytesIO
 import pickle
 import hashlib
 import inspect
@@ -31,6 +32,8 @@ from dockertest.subtest import SubSubtest
 from dockertest.subtest import SubSubtestCaller
 from dockertest.output import mustpass, OutputGood
 from dockertest.dockercmd import DockerCmd, AsyncDockerCmd
+from dockertest.dockercmd import StreamDockerCmd
+from dockertest.bulkcopy import BulkCopy
 from dockertest.images import DockerImage
 from dockertest.images import DockerImages
 from dockertest.containers import DockerContainers
@@ -113,8 +116,11 @@ class simple(CpBase):
 # Turned into code string by every_last.container_files()
 # Must re-import needed modules and be top-level because
 # inspect.getsource() preserves indentation)
-def all_files(exclude_paths, exclude_symlinks=False):
+def all_files(exclude_paths, exclude_symlinks=False, max_files=None,
+              exclude_mounts=False):
+    from hashlib import md5
     from os import walk
+    from os.path import isfile
     from os.path import islink
     from os.path import join
     from pickle import dump
@@ -132,39 +138,76 @@ def all_files(exclude_paths, exclude_symlinks=False):
                       for fi in fl
                       if not islink(join(dp, fi))]
             data.append((dp, dn, fl))
+    # Files mounted into the container differ from the exported filesystem
+    mounts = set()
+    if exclude_mounts:
+        mounts.update(["/etc/hosts", "/etc/hostname", "/etc/resolv.conf"])
+        try:
+            with open("/proc/self/mounts") as mountsfile:
+                mounts.update(line.split()[1] for line in mountsfile)
+        except (IOError, OSError):
+            pass
+    # Size and md5 of only the files to be copied (last one of directories)
+    sums = {}
+    lastfiles = [join(dp, fl[-1]) for (dp, _, fl) in data if fl]
+    for path in lastfiles[:max_files]:
+        if path in mounts or not isfile(path) or islink(path):
+            continue
+        digest = md5()
+        size = 0
+        try:
+            with open(path, "rb") as infile:
+                for chunk in iter(lambda: infile.read(65536), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+        except (IOError, OSError):
+            continue
+        sums[path] = (size, digest.hexdigest())
     # python3: stdout is str-only, we need a binary-capable file object
     outfile = stdout
     if hasattr(stdout, "buffer"):
         outfile = stdout.buffer
-    dump(data, outfile, 2)
+    dump((data, sums), outfile, 2)
 
 
 class every_last(CpBase):
 
     def container_files(self, fqin):
         """
-        Returns a list of tuples as from os.walk() inside fqin
+        Returns a list of tuples as from os.walk() inside fqin, and mapping
+        of the files to copy (last file in each directory, up to
+        ``max_files``) to their (size, md5).  Mount points are left out in
+        ``archive`` mode, it copies what's underneath them.
         """
         python_path = self.config['python_path']
-        code = ('%s\nall_files([%s], %s)'
+        code = ('%s\nall_files([%s], %s, %d, %s)'
                 % (inspect.getsource(all_files),
                    self.config['exclude_paths'],
-                   self.config['exclude_symlinks']))
+                   self.config['exclude_symlinks'],
+                   self.config['max_files'],
+                   self.config['copy_mode'] == 'archive'))
         subargs = ["--net=none",
                    "--name=%s" % self.sub_stuff['container_name'],
                    "--attach=stdout",
                    fqin,
                    "%s -c '%s'" % (python_path, code)]
-        nfdc = DockerCmd(self, "run", subargs)
-        nfdc.quiet = True
-        self.logdebug("Executing %s", nfdc.command)
-        mustpass(nfdc.execute())
-        return pickle.load(BytesIO(nfdc.stdout.encode('latin-1')))
+        pickle_path = os.path.join(self.tmpdir, 'container_files.pickle')
+        with open(pickle_path, 'w+b') as pickle_file:
+            # Pickled walk can be huge, don't hold it as a string
+            nfdc = StreamDockerCmd(self, "run", subargs, sink=pickle_file,
+                                   preview_size=0)
+            nfdc.quiet = True
+            self.logdebug("Executing %s", nfdc.command)
+            mustpass(nfdc.execute())
+            pickle_file.seek(0)
+            return pickle.load(pickle_file)
 
     def initialize(self):
         super(every_last, self).initialize()
         # list of tuples as generated by os.walk('/') inside container
-        oswalk = self.container_files(self.sub_stuff['fqin'])
+        oswalk, sums = self.container_files(self.sub_stuff['fqin'])
+        # Every copied file is verified against these
+        self.sub_stuff['expected'] = sums
         # Grab the last filename entry from each directory
         self.sub_stuff['lastfiles'] = [os.path.join(dp, fl[-1])
                                        for (dp, _, fl) in oswalk
@@ -179,26 +222,22 @@ class every_last(CpBase):
                     "exceeds container total has : %d"
                     % (self.config['max_files'], total))
         self.loginfo("Testing copy of %d files from container" % total)
-        self.sub_stuff['results'] = {}  # cont_path -> cmdresult
-        nfdc = DockerCmd(self, 'cp')
-        nfdc.quiet = True
-        nfiles = 0
-        for index, srcfile in enumerate(self.sub_stuff['lastfiles']):
-            if index % 100 == 0:
-                self.loginfo("Copied %d of %d", nfiles, total)
-            cont_path = "%s:%s" % (self.sub_stuff['container_name'], srcfile)
-            host_path = self.tmpdir
-            host_fullpath = os.path.join(host_path, os.path.basename(srcfile))
-            nfdc.subargs = [cont_path, host_path]
-            mustpass(nfdc.execute())
-            self.failif(not os.path.isfile(host_fullpath),
-                        "Not a file: '%s'" % host_fullpath)
-            nfiles += 1
-            self.sub_stuff['nfiles'] = nfiles
-            if nfiles >= self.config['max_files']:
-                self.loginfo("Configuration max %d, Copied %d of %d"
-                             % (self.config['max_files'], nfiles, total))
-                break
+        lastfiles = self.sub_stuff['lastfiles'][:self.config['max_files']]
+        bulk = BulkCopy(self, self.sub_stuff['container_name'], self.tmpdir,
+                        mode=self.config['copy_mode'],
+                        workers=self.config['copy_workers'],
+                        expected=self.sub_stuff['expected'])
+        self.loginfo("Copying %d files using %s mode with %d worker(s)",
+                     len(lastfiles), bulk.mode, bulk.workers)
+        self.sub_stuff['results'] = bulk.copy(lastfiles)
+        failures = bulk.failures
+        for failure in failures:
+            self.logwarning("Failed to copy '%s': %s",
+                            failure.container_path, failure.error)
+        self.sub_stuff['nfiles'] = len(lastfiles) - len(failures)
+        self.loginfo("Configuration max %d, Copied %d of %d"
+                     % (self.config['max_files'], self.sub_stuff['nfiles'],
+                        total))
 
     def postprocess(self):
         super(every_last, self).postprocess()
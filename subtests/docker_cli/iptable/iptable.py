@@ -68,11 +68,10 @@ class iptable_base(SubSubtest):
         # map container eth0 ifindex's to names
         dc = DockerContainers(self)
         names = dc.list_container_names()
-        jsons = [dc.json_by_name(name)[0] for name in names]
-        njs = dict(list(zip(names, jsons)))
+        njs = dc.inspect_many(names)
         result = {}
-        for name in [_ for _ in njs
-                     if njs[_]["NetworkSettings"]["IPAddress"] != ""]:
+        for name in [_ for _ in njs if njs[_] is not None and
+                     njs[_]["NetworkSettings"]["IPAddress"] != ""]:
             result[name] = njs[name]["NetworkSettings"]["IPAddress"]
             self.logdebug("%s -> %s", name, result[name])
         return result
@@ -15,8 +15,8 @@ Operational Detail
 ------------------
 
 Our test container outputs a string (it doesn't matter what) every
-second. We check that it's running by running `docker logs` repeatedly
-until we get a new line; timing out at five seconds.
+second. We check that it's running by following `docker logs` until
+we get a new line; timing out at five seconds.
 
 We *restart* the docker daemon, not separate stop and then start.
 (The latter would give us more testing options, such as confirming
@@ -44,10 +44,10 @@ from autotest.client import utils
 import dockertest.docker_daemon as docker_daemon
 from dockertest import subtest
 from dockertest.containers import DockerContainers
-from dockertest.dockercmd import AsyncDockerCmd, DockerCmd
+from dockertest.dockercmd import AsyncDockerCmd
 from dockertest.images import DockerImage
+from dockertest.logfollower import ContainerLogFollower
 from dockertest.output import DockerInfo
-from dockertest.output.validate import mustpass
 from dockertest.xceptions import DockerTestNAError
 
 
@@ -126,33 +126,20 @@ class liverestore(subtest.Subtest):
         dkrcmd.execute()
         dkrcmd.wait_for_ready(c_name)
         self.stuff['container_name'] = c_name
+        # Survives daemon restart, by resuming after last line seen
+        self.stuff['log_follower'] = ContainerLogFollower(self, c_name)
 
     def _verify_that_container_is_running(self):
         """
-        Verify that container process is running, by running 'docker log'
-        on it sequentially and making sure that we get new output lines.
+        Verify that container process is running, by following its log
+        and making sure that we get new output lines.
         """
-        log_0 = self._container_log()
-
-        # Wait up to 5 seconds for output to change
-        end_at = time.time() + 5
-        while time.time() <= end_at:
-            log_1 = self._container_log()
-            if log_1 != log_0:
-                break
-            time.sleep(1)
-
-        self.failif(len(log_0) == len(log_1),
+        follower = self.stuff['log_follower']
+        # Wait for output already logged to arrive
+        follower.wait_for_growth(0, 5)
+        self.failif(not follower.wait_for_growth(len(follower), 5),
                     "Container log line count did not grow")
 
-    def _container_log(self):
-        """
-        Returns container log as a list of strings
-        """
-        c_name = self.stuff['container_name']
-        result = mustpass(DockerCmd(self, "logs", [c_name]).execute())
-        return result.stdout.strip().split("\n")
-
     def _container_pid(self):
         dc = self.stuff['dc']
         inspect = dc.json_by_name(self.stuff['container_name'])
@@ -183,6 +170,8 @@ class liverestore(subtest.Subtest):
 
     def cleanup(self):
         super(liverestore, self).cleanup()
+        if 'log_follower' in self.stuff:
+            self.stuff['log_follower'].stop()
         if self.config['remove_after_test']:
             if 'container_name' in self.stuff:
                 self.stuff['dc'].clean_all([self.stuff['container_name']])
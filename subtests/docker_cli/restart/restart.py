@@ -16,13 +16,13 @@ Operational Summary
 #. analyze results
 """
 
-import time
 from dockertest import config, subtest, xceptions
 from dockertest.containers import DockerContainers
 from dockertest.images import DockerImage
 from dockertest.subtest import SubSubtest
 from dockertest.output import mustpass
 from dockertest.dockercmd import DockerCmd
+from dockertest.logfollower import ContainerLogFollower
 
 
 class restart(subtest.SubSubtestCaller):
@@ -43,6 +43,7 @@ class restart_base(SubSubtest):
         self.sub_stuff['stop_cmd'] = None
         self.sub_stuff['restart_result'] = None
         self.sub_stuff['stop_result'] = None
+        self.sub_stuff['log_follower'] = None
 
         containers = DockerContainers(self)
 
@@ -64,6 +65,7 @@ class restart_base(SubSubtest):
         if container == []:
             raise xceptions.DockerTestNAError("Fail to get docker with id: %s"
                                               % cont_id)
+        self.sub_stuff['log_follower'] = ContainerLogFollower(self, cont_id)
 
         # Prepare the "restart" command
         if self.config.get('restart_options_csv'):
@@ -93,32 +95,7 @@ class restart_base(SubSubtest):
         :raise xceptions.DockerTestFail: In case of bad output or timeout
         :warning: It doesn't wait for input when only bad_lines are given!
         """
-        endtime = time.time() + timeout
-        container_id = self.sub_stuff['container_id']
-        while time.time() < endtime:
-            log_results = mustpass(DockerCmd(self, 'logs',
-                                             [container_id]).execute())
-            log = log_results.stdout.splitlines()
-            i = 0   # (good) lines idx
-            exp = lines[i]
-            for act in log:
-                if act in bad_lines:
-                    msg = ("Check output fail; all lines present, but "
-                           "bad_lines too:\nlines:\n%s\nbad_lines:\n%s\n"
-                           "output:\n%s" % (lines, bad_lines, log))
-                    raise xceptions.DockerTestFail(msg)
-                if exp == act:
-                    i += 1
-                    if i < len(lines):
-                        exp = lines[i]
-                    else:
-                        exp = None  # lines are done, check only bad_lines...
-            if i >= len(lines):
-                break
-        else:
-            msg = ("Check output fail:\ncheck_lines:\n%s\nbad_lines:\n%s\n"
-                   "docker_output:\n%s" % (lines, bad_lines, log))
-            raise xceptions.DockerTestFail(msg)
+        self.sub_stuff['log_follower'].expect(lines, bad_lines, timeout)
 
     def run_once(self):
         super(restart_base, self).run_once()
@@ -153,6 +130,8 @@ class restart_base(SubSubtest):
 
     def cleanup(self):
         super(restart_base, self).cleanup()
+        if self.sub_stuff.get('log_follower') is not None:
+            self.sub_stuff['log_follower'].stop()
         if self.config['remove_after_test']:
             dc = DockerContainers(self)
             dc.clean_all([self.sub_stuff.get('container_id')])
@@ -213,43 +192,6 @@ class stopped(restart_base):
     7) analyze results
     """
 
-    def check_output(self, lines, bad_lines, timeout=5):
-        """
-        Wait $timeout for all good lines presence in sub_stuff['container_id']
-        :param lines: list of expected lines in given order. All other lines
-                      in between are ignored.
-        :param bad_lines: list of lines, which musn't be present in the output
-        :param timeout: operation deadline
-        :raise xceptions.DockerTestFail: In case of bad output or timeout
-        :warning: It doesn't wait for input when only bad_lines are given!
-        """
-        endtime = time.time() + timeout
-        container_id = self.sub_stuff['container_id']
-        while time.time() < endtime:
-            log_results = mustpass(DockerCmd(self, 'logs',
-                                             [container_id]).execute())
-            log = log_results.stdout.splitlines()
-            i = 0   # (good) lines idx
-            exp = lines[i]
-            for act in log:
-                if act in bad_lines:
-                    msg = ("Check output fail; all lines present, but "
-                           "bad_lines too:\nlines:\n%s\nbad_lines:\n%s\n"
-                           "output:\n%s" % (lines, bad_lines, log))
-                    raise xceptions.DockerTestFail(msg)
-                if exp == act:
-                    i += 1
-                    if i < len(lines):
-                        exp = lines[i]
-                    else:
-                        exp = None  # lines are done, check only bad_lines...
-            if i >= len(lines):
-                break
-        else:
-            msg = ("Check output fail:\ncheck_lines:\n%s\nbad_lines:\n%s\n"
-                   "docker_output:\n%s" % (lines, bad_lines, log))
-            raise xceptions.DockerTestFail(msg)
-
     def postprocess(self):
         # Check if execution took the right time (SIGTERM 0s vs. SIGKILL 10s)
         super(stopped, self).postprocess()
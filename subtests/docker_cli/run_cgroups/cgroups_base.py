@@ -3,12 +3,14 @@ Base class for cgroups testing
 """
 
 import os
+import time
 from dockertest import xceptions
 from dockertest.output import mustpass
 from dockertest.dockercmd import DockerCmd
 from dockertest.containers import DockerContainers
 from dockertest.subtest import SubSubtest
 from dockertest.config import get_as_list
+from dockertest.cgroupsampler import CgroupSampler
 
 
 class cgroups_base(SubSubtest):
@@ -56,6 +58,38 @@ class cgroups_base(SubSubtest):
 
         return content_value
 
+    def sampler(self, long_ids):
+        """
+        Return ``CgroupSampler`` for containers, configured from config
+        :param long_ids: list of running containers' long ids
+        """
+        return CgroupSampler(long_ids, self.config['sample_interval'],
+                             self.config['cgroup_root'])
+
+    def run_sampled(self, subargs_list):
+        """
+        Start a detached container per subargs, sample their usage for
+        sample_seconds (or until all exit).  Return list of long ids
+        (None for any which failed to start) and the sampler.
+        :param subargs_list: list of ``docker run`` argument lists
+        """
+        long_ids = []
+        for subargs in subargs_list:
+            dkrcmd = DockerCmd(self, 'run', ['--detach'] + subargs)
+            cmdresult = dkrcmd.execute()
+            if cmdresult.exit_status != 0:
+                self.logerror("Container failed to start: %s", cmdresult)
+                long_ids.append(None)
+            else:
+                long_ids.append(cmdresult.stdout.strip().splitlines()[-1])
+        sampler = self.sampler([long_id for long_id in long_ids
+                                if long_id is not None])
+        with sampler:
+            endtime = time.time() + self.config['sample_seconds']
+            while sampler.paths and time.time() < endtime:
+                time.sleep(self.config['sample_interval'])
+        return long_ids, sampler
+
     def initialize(self):
         super(cgroups_base, self).initialize()
         self.sub_stuff['docker_containers'] = DockerContainers(self)
@@ -6,6 +6,7 @@ properly.
 """
 
 from dockertest import xceptions
+from dockertest.config import get_as_list
 from dockertest.dockercmd import DockerCmd
 from dockertest.images import DockerImage
 from cgroups_base import cgroups_base
@@ -109,3 +110,53 @@ class cpu_base(cgroups_base):
         # Expects list of names to remove
         self.sub_stuff['name'] = [self.sub_stuff['name']]
         super(cpu_base, self).cleanup()
+
+
+class cpu_ratio_base(cgroups_base):
+
+    """
+    Verify actual CPU time split between busy containers sharing one CPU
+    follows their --cpu-shares ratio, by sampling their cgroups
+    """
+
+    def initialize(self):
+        super(cpu_ratio_base, self).initialize()
+        dc = self.sub_stuff['docker_containers']
+        image = DockerImage.full_name_from_defaults(self.config)
+        shares = [int(value) for value in
+                  get_as_list(self.config['cpushares_values'])]
+        subargs_list = []
+        for value in shares:
+            name = dc.get_unique_name()
+            self.sub_stuff['name'].append(name)
+            subargs_list.append(['--name=%s' % name,
+                                 '--cpu-shares=%d' % value,
+                                 '--cpuset-cpus=%s' % self.config['cpuset'],
+                                 image, '/bin/sh', '-c',
+                                 "'while :; do :; done'"])
+        self.sub_stuff['shares'] = shares
+        self.sub_stuff['subargs_list'] = subargs_list
+
+    def run_once(self):
+        super(cpu_ratio_base, self).run_once()
+        long_ids, sampler = self.run_sampled(self.sub_stuff['subargs_list'])
+        self.sub_stuff['long_ids'] = long_ids
+        self.sub_stuff['sampler'] = sampler
+
+    def postprocess(self):
+        super(cpu_ratio_base, self).postprocess()
+        long_ids = self.sub_stuff['long_ids']
+        self.failif(None in long_ids, "Not all containers started")
+        measured = self.sub_stuff['sampler'].cpu_shares()
+        shares = self.sub_stuff['shares']
+        tolerance = self.config['ratio_tolerance']
+        failed = []
+        for long_id, value in zip(long_ids, shares):
+            expected = value / float(sum(shares))
+            self.loginfo("Container %s with %d shares used %.1f%% of CPU "
+                         "time, expected %.1f%%", long_id[:12], value,
+                         measured[long_id] * 100, expected * 100)
+            if abs(measured[long_id] - expected) > tolerance:
+                failed.append(long_id[:12])
+        self.failif(failed, "CPU time of %s differs from --cpu-shares "
+                            "ratio by more than %s" % (failed, tolerance))
@@ -235,3 +235,48 @@ class memory_base(cgroups_base):
                 self.postprocess_negative(this_result,
                                           memory_container, passed)
         self.failif(not all(passed), "One or more checks failed")
+
+
+class memory_load_base(cgroups_base):
+
+    """
+    Verify memory usage of a container consuming memory without bound
+    never exceeds it's -m limit, by sampling it's cgroup
+    """
+
+    def initialize(self):
+        super(memory_load_base, self).initialize()
+        dc = self.sub_stuff['docker_containers']
+        image = DockerImage.full_name_from_defaults(self.config)
+        name = dc.get_unique_name()
+        self.sub_stuff['name'].append(name)
+        # tail buffers it's input looking for newlines, forever
+        subargs = ['--name=%s' % name, '-m %s' % self.config['memory_value'],
+                   image, 'tail', '/dev/zero']
+        self.sub_stuff['subargs_list'] = [subargs]
+
+    def run_once(self):
+        super(memory_load_base, self).run_once()
+        long_ids, sampler = self.run_sampled(self.sub_stuff['subargs_list'])
+        self.sub_stuff['long_ids'] = long_ids
+        self.sub_stuff['sampler'] = sampler
+
+    def postprocess(self):
+        super(memory_load_base, self).postprocess()
+        long_id = self.sub_stuff['long_ids'][0]
+        self.failif(long_id is None, "Container failed to start")
+        summary = self.sub_stuff['sampler'].summary()[long_id]
+        self.loginfo("Memory usage over %d samples: max %s mean %.0f, "
+                     "limit %s", summary['samples'], summary['memory_max'],
+                     summary['memory_mean'] or 0, summary['memory_limit'])
+        self.failif(not summary['samples'], "No memory usage sampled")
+        limit = int(self.config['memory_value'])
+        self.failif(summary['memory_limit'] != limit,
+                    "cgroup memory limit %s, expected %d"
+                    % (summary['memory_limit'], limit))
+        self.failif(summary['memory_max'] > limit,
+                    "Memory usage %d exceeded limit %d"
+                    % (summary['memory_max'], limit))
+        if summary['memory_max'] < limit // 2:
+            self.logwarning("Memory usage never reached half the limit, "
+                            "container may not have been under load")
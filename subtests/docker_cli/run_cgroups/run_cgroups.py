@@ -12,6 +12,8 @@ Operational Summary
 
 #. Start container with non-default cgroup-related option.
 #. Verify docker inspect matches param value matches actual cgroup value
+#. Sample cgroup usage of busy containers, verify CPU time follows
+   ``--cpu-shares`` ratio and memory usage stays within ``-m`` limit.
 
 Prerequisites
 ------------------------------------------
@@ -21,8 +23,8 @@ Prerequisites
 """
 
 from dockertest.subtest import SubSubtestCallerSimultaneous
-from cpushares import cpu_base
-from memory import memory_base
+from cpushares import cpu_base, cpu_ratio_base
+from memory import memory_base, memory_load_base
 
 
 class run_cgroups(SubSubtestCallerSimultaneous):
@@ -55,3 +57,11 @@ class memory_no_cgroup(memory_base):
 
 class memory_negative(memory_base):
     pass
+
+
+class cpu_ratio(cpu_ratio_base):
+    pass
+
+
+class memory_load(memory_load_base):
+    pass
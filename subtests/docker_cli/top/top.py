@@ -44,7 +44,9 @@ class base(SubSubtest):
     # TODO: Make cntnr_state part of container module?
     def cntnr_state(self, name):
         dc = self.sub_stuff['dc']
-        json = dc.json_by_name(name)[0]
+        json = dc.inspect_many([name])[name]
+        if json is None:
+            raise ValueError("Container not found with name %s" % name)
         state = json['State']
         # Separate representation from implementation
         # (really should use a named tuple)